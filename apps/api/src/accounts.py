@@ -0,0 +1,175 @@
+"""Shared account resolution by ``auth_sub`` with per-worker and Redis caching."""
+import os
+import uuid
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import event, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+
+from .models import Account
+from .cache import get_cache, set_cache, delete_cache, LocalTTLCache
+from .logging_config import setup_logging
+
+logger = setup_logging()
+
+# Account cache (per worker, in front of Redis and the database)
+ACCOUNT_CACHE_SIZE = int(os.getenv("ACCOUNT_CACHE_SIZE", "10000"))
+ACCOUNT_CACHE_TTL = int(os.getenv("ACCOUNT_CACHE_TTL", "30"))
+ACCOUNT_REDIS_TTL = int(os.getenv("ACCOUNT_REDIS_TTL", "300"))
+
+ACCOUNT_UUID_FIELDS = ("id",)
+ACCOUNT_DATETIME_FIELDS = ("subscription_current_period_end", "created_at", "updated_at")
+ACCOUNT_FIELDS = (
+    "id", "email", "auth_sub", "plan", "stripe_customer_id", "stripe_subscription_id",
+    "subscription_status", "subscription_current_period_end", "created_at", "updated_at"
+)
+
+account_cache = LocalTTLCache(maxsize=ACCOUNT_CACHE_SIZE, ttl=ACCOUNT_CACHE_TTL)
+
+
+def account_cache_key(auth_sub: str) -> str:
+    """Redis key for a cached account."""
+    return f"account:{auth_sub}"
+
+
+def _to_json(data: dict) -> dict:
+    return {
+        key: value.isoformat() if isinstance(value, datetime) else str(value) if isinstance(value, UUID) else value
+        for key, value in data.items()
+    }
+
+
+def _from_json(data: dict) -> dict:
+    data = dict(data)
+    for key in ACCOUNT_UUID_FIELDS:
+        data[key] = UUID(data[key])
+    for key in ACCOUNT_DATETIME_FIELDS:
+        if data.get(key):
+            data[key] = datetime.fromisoformat(data[key])
+    return data
+
+
+def _cache_account(account: Account) -> None:
+    data = {field: getattr(account, field) for field in ACCOUNT_FIELDS}
+    account_cache.set(account.auth_sub, data)
+    set_cache(account_cache_key(account.auth_sub), _to_json(data), ttl=ACCOUNT_REDIS_TTL)
+
+
+def _cached_account_data(auth_sub: str) -> Optional[dict]:
+    data = account_cache.get(auth_sub)
+    if data is not None:
+        return data
+    cached = get_cache(account_cache_key(auth_sub))
+    if isinstance(cached, dict) and set(ACCOUNT_FIELDS) <= set(cached):
+        data = _from_json(cached)
+        account_cache.set(auth_sub, data)
+        return data
+    return None
+
+
+def _detached_account(data: dict) -> Account:
+    """Build a detached ``Account`` from cached column values, ready for ``merge(load=False)``."""
+    account = Account(**data)
+    make_transient_to_detached(account)
+    return account
+
+
+def invalidate_account(auth_sub: str) -> None:
+    """Drop a cached account from both cache tiers."""
+    if auth_sub:
+        account_cache.delete(auth_sub)
+        delete_cache(account_cache_key(auth_sub))
+
+
+def _insert_account_statement(db, auth_sub: str, email: str):
+    """``INSERT ... ON CONFLICT DO NOTHING`` for a new free account."""
+    dialect = db.get_bind().dialect.name
+    values = {"id": uuid.uuid4(), "auth_sub": auth_sub, "email": email, "plan": "free", "subscription_status": "free"}
+    if dialect == "postgresql":
+        return postgresql.insert(Account).values(**values).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(Account).values(**values).on_conflict_do_nothing()
+    return insert(Account).values(**values)
+
+
+def resolve_account(db: Session, user: dict, create: bool = True) -> Account:
+    """Return the caller's account, attached to ``db``.
+
+    Served from the per-worker cache, then Redis, then the database. With
+    ``create`` a missing account is inserted race-safely (concurrent first
+    requests for the same user cannot collide); otherwise a missing account
+    raises 404.
+    """
+    auth_sub = user.get("sub")
+    data = _cached_account_data(auth_sub)
+    if data is not None:
+        return db.merge(_detached_account(data), load=False)
+
+    account = db.query(Account).filter(Account.auth_sub == auth_sub).first()
+    if not account and create:
+        email = user.get("email", f"{auth_sub}@auth0.local")
+        db.execute(_insert_account_statement(db, auth_sub, email))
+        db.commit()
+        account = db.query(Account).filter(Account.auth_sub == auth_sub).first()
+        if not account:
+            raise HTTPException(status_code=409, detail="Account email already in use")
+        logger.info({"event": "account_created", "account_id": str(account.id)})
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+
+    _cache_account(account)
+    return account
+
+
+async def resolve_account_async(db: AsyncSession, user: dict, create: bool = True) -> Account:
+    """Async counterpart of ``resolve_account``."""
+    auth_sub = user.get("sub")
+    data = _cached_account_data(auth_sub)
+    if data is not None:
+        return await db.merge(_detached_account(data), load=False)
+
+    account = await db.scalar(select(Account).where(Account.auth_sub == auth_sub))
+    if not account and create:
+        email = user.get("email", f"{auth_sub}@auth0.local")
+        await db.execute(_insert_account_statement(db, auth_sub, email))
+        await db.commit()
+        account = await db.scalar(select(Account).where(Account.auth_sub == auth_sub))
+        if not account:
+            raise HTTPException(status_code=409, detail="Account email already in use")
+        logger.info({"event": "account_created", "account_id": str(account.id)})
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+
+    _cache_account(account)
+    return account
+
+
+def get_account_cache_stats() -> dict:
+    """Counters for the per-worker account cache."""
+    return account_cache.stats()
+
+
+# Plan/status changes (billing webhooks, checkout) invalidate on write and again on commit
+@event.listens_for(Account, "after_update")
+@event.listens_for(Account, "after_delete")
+def _account_changed(mapper, connection, target):
+    invalidate_account(target.auth_sub)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("stale_accounts", set()).add(target.auth_sub)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_accounts(session):
+    for auth_sub in session.info.pop("stale_accounts", ()):
+        invalidate_account(auth_sub)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_stale_accounts(session):
+    session.info.pop("stale_accounts", None)
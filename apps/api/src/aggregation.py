@@ -0,0 +1,71 @@
+"""Single-scan conditional aggregation over event and rollup tables."""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+
+# Event type -> plural name used in analytics responses
+EVENT_TYPES = {"create": "creates", "export": "exports", "scan": "scans"}
+
+
+def window_count_columns(type_column, time_column, windows: Dict[str, Optional[datetime]], value=None) -> list:
+    """Build one ``FILTER``-ed aggregate per (window, event type).
+
+    ``windows`` maps a window name to its lower time bound (None = all time).
+    Rows are counted, or ``value`` is summed when aggregating rollups.
+    """
+    columns = []
+    for window, since in windows.items():
+        for event_type in EVENT_TYPES:
+            condition = type_column == event_type
+            if since is not None:
+                condition = and_(condition, time_column >= since)
+            if value is None:
+                aggregate = func.count().filter(condition)
+            else:
+                aggregate = func.coalesce(func.sum(value).filter(condition), 0)
+            columns.append(aggregate.label(f"{window}__{event_type}"))
+    return columns
+
+
+def _unpack(mapping, windows) -> Dict[str, Dict[str, int]]:
+    return {
+        window: {event_type: int(mapping[f"{window}__{event_type}"] or 0) for event_type in EVENT_TYPES}
+        for window in windows
+    }
+
+
+def count_events_by_window(
+    db: Session,
+    type_column,
+    time_column,
+    criteria: list,
+    windows: Dict[str, Optional[datetime]],
+    value=None
+) -> Dict[str, Dict[str, int]]:
+    """Count every event type in every window with a single query.
+
+    Returns ``{window: {event_type: count}}``.
+    """
+    row = db.query(*window_count_columns(type_column, time_column, windows, value)).filter(*criteria).one()
+    return _unpack(row._mapping, windows)
+
+
+def count_events_by_group(
+    db: Session,
+    group_expr,
+    type_column,
+    criteria: list,
+    value=None
+) -> List[Tuple[object, Dict[str, int]]]:
+    """Count every event type per ``group_expr`` value (e.g. a date bucket) in one query.
+
+    Returns ``[(group, {event_type: count}), ...]`` ordered by group.
+    """
+    windows = {"all": None}
+    group = group_expr.label("grp")
+    rows = db.query(group, *window_count_columns(type_column, None, windows, value)).filter(
+        *criteria
+    ).group_by(group).order_by(group).all()
+    return [(row.grp, _unpack(row._mapping, windows)["all"]) for row in rows]
@@ -2,23 +2,51 @@
 from typing import List, Optional
 from datetime import datetime, timedelta
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import RedirectResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy import func, event, inspect, select, tuple_
 from pydantic import BaseModel
+from collections import Counter
+import csv
 import hashlib
+import io
+import json
+import os
 import time
+import zlib
 
-from .database import get_db
-from .models import QREvent, Shortlink, QRItem, Account
+from .database import get_read_db, get_async_db, get_async_read_db, get_read_db_context
+from .models import QREvent, Shortlink, QRItem, QREventRollupDaily, QREventRollupHourly
 from .auth import get_current_user, require_auth
+from .accounts import resolve_account, resolve_account_async
 from .logging_config import setup_logging
-from .cache import get_cache, set_cache
+from .cache import get_cache, set_cache, delete_cache, get_or_compute_async, LocalTTLCache
+from . import tracking
+from . import rollups
+from .aggregation import EVENT_TYPES, count_events_by_window, count_events_by_group
+from .pagination import encode_cursor, decode_timestamp_cursor
 
 logger = setup_logging()
 router = APIRouter(tags=["analytics"])
 
+# Shortlink resolution cache (per worker, in front of Redis and the database)
+SHORTLINK_CACHE_SIZE = int(os.getenv("SHORTLINK_CACHE_SIZE", "10000"))
+SHORTLINK_CACHE_TTL = int(os.getenv("SHORTLINK_CACHE_TTL", "60"))
+SHORTLINK_REDIS_TTL = int(os.getenv("SHORTLINK_REDIS_TTL", "3600"))
+
+# Streaming export tuning
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", "2000"))
+EXPORT_CHUNK_ROWS = 500
+EXPORT_FIELDS = ("id", "type", "user_id", "item_id", "meta", "created_at")
+
+# Seconds an expired analytics summary is still served while one request refreshes it
+ANALYTICS_SUMMARY_STALE_TTL = int(os.getenv("ANALYTICS_SUMMARY_STALE_TTL", "60"))
+
+shortlink_cache = LocalTTLCache(maxsize=SHORTLINK_CACHE_SIZE, ttl=SHORTLINK_CACHE_TTL)
+shortlink_lookup_stats = Counter()
+
 
 # Pydantic schemas
 class EventSchema(BaseModel):
@@ -69,27 +97,33 @@ def record_event(
     item_id: Optional[UUID] = None,
     meta: dict = None,
     ip_address: Optional[str] = None,
-    user_agent: Optional[str] = None
+    user_agent: Optional[str] = None,
+    owner_id: Optional[UUID] = None
 ) -> QREvent:
     """Record an event with deduplication."""
-    # Create event record
-    event = QREvent(
-        type=event_type,
+    # Create event record (id and timestamp are assigned client-side, so no refresh is needed)
+    row = tracking.build_event_row(
+        event_type,
         user_id=user_id,
         item_id=item_id,
-        meta=meta or {},
+        owner_id=owner_id,
+        meta=meta,
         ip_address=ip_address,
         user_agent=user_agent
     )
+    rollups.assign_event_owners(db, [row])
+    event = QREvent(**row)
     
     db.add(event)
     db.commit()
-    db.refresh(event)
+    
+    # Rollups are coalesced per worker and upserted in bulk by the scan counter
+    tracking.scan_counter.add_rollups([row])
     
     logger.info({
         "event": "event_recorded",
         "event_type": event_type,
-        "event_id": str(event.id),
+        "event_id": str(row["id"]),
         "user_id": str(user_id) if user_id else None,
         "item_id": str(item_id) if item_id else None
     })
@@ -97,11 +131,115 @@ def record_event(
     return event
 
 
+def shortlink_cache_key(code: str) -> str:
+    """Redis key for a cached shortlink resolution."""
+    return f"shortlink:{code}"
+
+
+def resolve_shortlink(db: Session, code: str) -> Optional[dict]:
+    """Resolve a shortlink code to its target.
+
+    Looks up the per-worker cache first, then Redis, then the database.
+    Returns a dict with ``target_url``, ``qr_item_id`` and ``owner_id`` or
+    None if the code does not exist.
+    """
+    entry = shortlink_cache.get(code)
+    if entry is not None:
+        return entry
+
+    entry = get_cache(shortlink_cache_key(code))
+    if isinstance(entry, dict):
+        shortlink_lookup_stats["redis_hits"] += 1
+        shortlink_cache.set(code, entry)
+        return entry
+    shortlink_lookup_stats["redis_misses"] += 1
+
+    row = db.query(Shortlink.target_url, Shortlink.qr_item_id, QRItem.owner_id).join(
+        QRItem, QRItem.id == Shortlink.qr_item_id
+    ).filter(Shortlink.code == code).first()
+    if not row:
+        shortlink_lookup_stats["not_found"] += 1
+        return None
+
+    entry = {
+        "target_url": row.target_url,
+        "qr_item_id": str(row.qr_item_id),
+        "owner_id": str(row.owner_id)
+    }
+    shortlink_cache.set(code, entry)
+    set_cache(shortlink_cache_key(code), entry, ttl=SHORTLINK_REDIS_TTL)
+    return entry
+
+
+def shortlink_owner_id(entry: dict) -> Optional[UUID]:
+    """Owner account of a resolved shortlink (None for entries cached before owner_id existed)."""
+    owner_id = entry.get("owner_id")
+    return UUID(owner_id) if owner_id else None
+
+
+def invalidate_shortlinks(codes) -> None:
+    """Drop cached resolutions for the given codes from both cache tiers."""
+    for code in codes:
+        shortlink_cache.delete(code)
+        delete_cache(shortlink_cache_key(code))
+
+
+def get_shortlink_cache_stats() -> dict:
+    """Hit/miss counters for the shortlink resolution cache tiers."""
+    return {"local": shortlink_cache.stats(), **shortlink_lookup_stats}
+
+
+def _mark_stale_shortlinks(target, codes) -> None:
+    """Invalidate codes now and again once the surrounding transaction commits."""
+    codes = {code for code in codes if code}
+    if not codes:
+        return
+    invalidate_shortlinks(codes)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("stale_shortlinks", set()).update(codes)
+
+
+@event.listens_for(Shortlink, "after_update")
+def _shortlink_updated(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[attr].history.has_changes() for attr in ("code", "target_url", "qr_item_id")):
+        return
+    _mark_stale_shortlinks(target, [target.code, *state.attrs.code.history.deleted])
+
+
+@event.listens_for(Shortlink, "after_delete")
+def _shortlink_deleted(mapper, connection, target):
+    _mark_stale_shortlinks(target, [target.code])
+
+
+@event.listens_for(QRItem, "after_update")
+@event.listens_for(QRItem, "after_delete")
+def _qr_item_changed(mapper, connection, target):
+    codes = connection.execute(
+        select(Shortlink.code).where(Shortlink.qr_item_id == target.id)
+    ).scalars().all()
+    _mark_stale_shortlinks(target, codes)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_shortlinks(session):
+    # Re-invalidate after commit so a concurrent miss cannot re-cache pre-commit rows.
+    codes = session.info.pop("stale_shortlinks", None)
+    if codes:
+        invalidate_shortlinks(codes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_stale_shortlinks(session):
+    session.info.pop("stale_shortlinks", None)
+
+
 @router.get("/r/{code}")
 async def redirect_shortlink(
     code: str,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Redirect shortlink and record scan event."""
     trace_id = hashlib.sha256(f"{code}{time.time()}".encode()).hexdigest()[:16]
@@ -112,8 +250,8 @@ async def redirect_shortlink(
         "trace_id": trace_id
     })
     
-    # Find shortlink
-    shortlink = db.query(Shortlink).filter(Shortlink.code == code).first()
+    # Resolve shortlink (local cache -> Redis -> database)
+    shortlink = await db.run_sync(resolve_shortlink, code)
     
     if not shortlink:
         logger.warning({
@@ -127,27 +265,37 @@ async def redirect_shortlink(
     ip_address = request.client.host if request.client else None
     user_agent = request.headers.get("user-agent")
     
+    # Async mode: hand the scan to the background buffer and redirect immediately
+    if tracking.async_tracking_enabled():
+        tracking.enqueue_scan(
+            code=code,
+            item_id=UUID(shortlink["qr_item_id"]),
+            owner_id=shortlink_owner_id(shortlink),
+            target_url=shortlink["target_url"],
+            ip_address=ip_address,
+            user_agent=user_agent
+        )
+        return RedirectResponse(url=shortlink["target_url"], status_code=302)
+    
     # Record scan event (idempotent with timestamp-based deduplication)
     try:
-        record_event(
-            db=db,
+        await db.run_sync(
+            record_event,
             event_type="scan",
-            item_id=shortlink.qr_item_id,
-            meta={"code": code, "target_url": shortlink.target_url},
+            item_id=UUID(shortlink["qr_item_id"]),
+            owner_id=shortlink_owner_id(shortlink),
+            meta={"code": code, "target_url": shortlink["target_url"]},
             ip_address=ip_address,
             user_agent=user_agent
         )
         
-        # Update shortlink scan count
-        shortlink.scan_count += 1
-        shortlink.last_scanned_at = datetime.utcnow()
-        db.commit()
+        # Coalesce the scan_count update; flushed in bulk by the scan counter
+        tracking.scan_counter.increment(code)
         
         logger.info({
             "event": "shortlink_redirected",
             "code": code,
-            "target_url": shortlink.target_url,
-            "scan_count": shortlink.scan_count,
+            "target_url": shortlink["target_url"],
             "trace_id": trace_id
         })
     except Exception as e:
@@ -160,107 +308,91 @@ async def redirect_shortlink(
         # Continue with redirect even if tracking fails
     
     # Redirect with 302 status
-    return RedirectResponse(url=shortlink.target_url, status_code=302)
+    return RedirectResponse(url=shortlink["target_url"], status_code=302)
+
+
+def build_summary(counts: dict) -> AnalyticsSummary:
+    """Map ``{"total"|"week"|"month": {event_type: n}}`` onto ``AnalyticsSummary``."""
+    fields = {}
+    for event_type, plural in EVENT_TYPES.items():
+        fields[f"total_{plural}"] = counts["total"][event_type]
+        fields[f"{plural}_this_week"] = counts["week"][event_type]
+        fields[f"{plural}_this_month"] = counts["month"][event_type]
+    return AnalyticsSummary(**fields)
+
+
+def owned_events_filter(account_id: UUID):
+    """Raw-event filter for events attributed to the account (index range on owner_id)."""
+    return QREvent.owner_id == account_id
+
+
+def summary_from_rollups(db: Session, account_id: UUID, week_ago: datetime, month_ago: datetime) -> AnalyticsSummary:
+    """Build the analytics summary from the rollup tables instead of raw events.
+
+    Totals come from the daily rollup; the week and month windows come from
+    the hourly rollup, so they are accurate to the hour.
+    """
+    daily, hourly = QREventRollupDaily, QREventRollupHourly
+    counts = count_events_by_window(
+        db, daily.type, daily.bucket, [daily.account_id == account_id], {"total": None}, value=daily.count
+    )
+    counts.update(count_events_by_window(
+        db, hourly.type, hourly.bucket,
+        [hourly.account_id == account_id, hourly.bucket >= rollups.hour_bucket(month_ago)],
+        {"week": rollups.hour_bucket(week_ago), "month": rollups.hour_bucket(month_ago)},
+        value=hourly.count
+    ))
+    return build_summary(counts)
+
+
+def summary_from_events(db: Session, account_id: UUID, week_ago: datetime, month_ago: datetime) -> AnalyticsSummary:
+    """Build the analytics summary from raw events in a single scan."""
+    counts = count_events_by_window(
+        db, QREvent.type, QREvent.created_at, [owned_events_filter(account_id)],
+        {"total": None, "week": week_ago, "month": month_ago}
+    )
+    return build_summary(counts)
 
 
 @router.get("/analytics/summary", response_model=AnalyticsSummary)
 async def get_analytics_summary(
     user: dict = Depends(require_auth),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    """Get analytics summary for the current user."""
+    """Get analytics summary for the current user.
+
+    Cached for 5 minutes; concurrent misses for the same user are coalesced
+    into one computation and an expired summary is served for up to
+    ``ANALYTICS_SUMMARY_STALE_TTL`` seconds while it is refreshed.
+    """
     user_id = UUID(user.get("sub"))
-    
-    # Check cache first
     cache_key = f"analytics:summary:{user_id}"
-    cached = get_cache(cache_key)
-    if cached:
-        logger.info({"event": "analytics_summary_cache_hit", "user_id": str(user_id)})
-        return cached
-    
-    # Calculate date boundaries
-    now = datetime.utcnow()
-    week_ago = now - timedelta(days=7)
-    month_ago = now - timedelta(days=30)
-    
-    # Get account to filter by owned items
-    account = db.query(Account).filter(Account.auth_sub == user.get("sub")).first()
-    if not account:
-        raise HTTPException(status_code=404, detail="Account not found")
     
-    # Get owned QR item IDs
-    owned_item_ids = db.query(QRItem.id).filter(QRItem.owner_id == account.id).all()
-    owned_item_ids = [item[0] for item in owned_item_ids]
-    
-    # Build filters
-    user_filter = or_(
-        QREvent.user_id == account.id,
-        QREvent.item_id.in_(owned_item_ids) if owned_item_ids else False
-    )
-    
-    # Query totals
-    total_creates = db.query(func.count(QREvent.id)).filter(
-        and_(QREvent.type == "create", user_filter)
-    ).scalar() or 0
-    
-    total_exports = db.query(func.count(QREvent.id)).filter(
-        and_(QREvent.type == "export", user_filter)
-    ).scalar() or 0
-    
-    total_scans = db.query(func.count(QREvent.id)).filter(
-        and_(QREvent.type == "scan", user_filter)
-    ).scalar() or 0
-    
-    # Query weekly
-    creates_this_week = db.query(func.count(QREvent.id)).filter(
-        and_(QREvent.type == "create", QREvent.created_at >= week_ago, user_filter)
-    ).scalar() or 0
-    
-    exports_this_week = db.query(func.count(QREvent.id)).filter(
-        and_(QREvent.type == "export", QREvent.created_at >= week_ago, user_filter)
-    ).scalar() or 0
-    
-    scans_this_week = db.query(func.count(QREvent.id)).filter(
-        and_(QREvent.type == "scan", QREvent.created_at >= week_ago, user_filter)
-    ).scalar() or 0
-    
-    # Query monthly
-    creates_this_month = db.query(func.count(QREvent.id)).filter(
-        and_(QREvent.type == "create", QREvent.created_at >= month_ago, user_filter)
-    ).scalar() or 0
-    
-    exports_this_month = db.query(func.count(QREvent.id)).filter(
-        and_(QREvent.type == "export", QREvent.created_at >= month_ago, user_filter)
-    ).scalar() or 0
-    
-    scans_this_month = db.query(func.count(QREvent.id)).filter(
-        and_(QREvent.type == "scan", QREvent.created_at >= month_ago, user_filter)
-    ).scalar() or 0
-    
-    summary = AnalyticsSummary(
-        total_creates=total_creates,
-        total_exports=total_exports,
-        total_scans=total_scans,
-        creates_this_week=creates_this_week,
-        exports_this_week=exports_this_week,
-        scans_this_week=scans_this_week,
-        creates_this_month=creates_this_month,
-        exports_this_month=exports_this_month,
-        scans_this_month=scans_this_month
-    )
-    
-    # Cache for 5 minutes
-    set_cache(cache_key, summary.model_dump(), ttl=300)
-    
-    logger.info({
-        "event": "analytics_summary_generated",
-        "user_id": str(user_id),
-        "total_creates": total_creates,
-        "total_exports": total_exports,
-        "total_scans": total_scans
-    })
+    async def compute() -> dict:
+        # Calculate date boundaries
+        now = datetime.utcnow()
+        week_ago = now - timedelta(days=7)
+        month_ago = now - timedelta(days=30)
+        
+        # Get account to filter by owned items
+        account = await resolve_account_async(db, user, create=False)
+        
+        if rollups.ANALYTICS_USE_ROLLUPS:
+            summary = await db.run_sync(summary_from_rollups, account.id, week_ago, month_ago)
+        else:
+            summary = await db.run_sync(summary_from_events, account.id, week_ago, month_ago)
+        
+        logger.info({
+            "event": "analytics_summary_generated",
+            "user_id": str(user_id),
+            "source": "rollups" if rollups.ANALYTICS_USE_ROLLUPS else "events",
+            "total_creates": summary.total_creates,
+            "total_exports": summary.total_exports,
+            "total_scans": summary.total_scans
+        })
+        return summary.model_dump()
     
-    return summary
+    return await get_or_compute_async(cache_key, compute, ttl=300, stale_ttl=ANALYTICS_SUMMARY_STALE_TTL)
 
 
 @router.get("/analytics/timeseries", response_model=AnalyticsTimeSeriesResponse)
@@ -268,7 +400,7 @@ async def get_analytics_timeseries(
     period: str = Query("daily", pattern="^(daily|weekly)$"),
     days: int = Query(30, ge=1, le=365),
     user: dict = Depends(require_auth),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get time series analytics data."""
     user_id = UUID(user.get("sub"))
@@ -281,56 +413,33 @@ async def get_analytics_timeseries(
         return cached
     
     # Get account and owned items
-    account = db.query(Account).filter(Account.auth_sub == user.get("sub")).first()
-    if not account:
-        raise HTTPException(status_code=404, detail="Account not found")
-    
-    owned_item_ids = db.query(QRItem.id).filter(QRItem.owner_id == account.id).all()
-    owned_item_ids = [item[0] for item in owned_item_ids]
-    
-    user_filter = or_(
-        QREvent.user_id == account.id,
-        QREvent.item_id.in_(owned_item_ids) if owned_item_ids else False
-    )
+    account = await resolve_account_async(db, user, create=False)
     
     # Calculate date range
     end_date = datetime.utcnow()
     start_date = end_date - timedelta(days=days)
     
-    # Query events grouped by date
-    if period == "daily":
-        date_format = func.date(QREvent.created_at)
-    else:  # weekly
-        # Group by week (ISO week)
-        date_format = func.date_trunc('week', QREvent.created_at)
-    
-    # Get aggregated data
-    results = db.query(
-        date_format.label('date'),
-        QREvent.type,
-        func.count(QREvent.id).label('count')
-    ).filter(
-        and_(QREvent.created_at >= start_date, user_filter)
-    ).group_by('date', QREvent.type).all()
-    
-    # Organize data by date
-    data_by_date = {}
-    for row in results:
-        date_str = row.date.strftime('%Y-%m-%d') if hasattr(row.date, 'strftime') else str(row.date)
-        if date_str not in data_by_date:
-            data_by_date[date_str] = {"creates": 0, "exports": 0, "scans": 0}
+    if rollups.ANALYTICS_USE_ROLLUPS:
+        results = await db.run_sync(rollups.rollup_timeseries, account.id, start_date, period)
+    else:
+        # Group by day or ISO week
+        if period == "daily":
+            date_format = func.date(QREvent.created_at)
+        else:  # weekly
+            date_format = func.date_trunc('week', QREvent.created_at)
         
-        if row.type == "create":
-            data_by_date[date_str]["creates"] = row.count
-        elif row.type == "export":
-            data_by_date[date_str]["exports"] = row.count
-        elif row.type == "scan":
-            data_by_date[date_str]["scans"] = row.count
-    
-    # Convert to list of TimeSeriesPoint
+        results = await db.run_sync(
+            count_events_by_group, date_format, QREvent.type,
+            [QREvent.created_at >= start_date, owned_events_filter(account.id)]
+        )
+    
+    # Convert to list of TimeSeriesPoint (one row per date, already ordered)
     data = [
-        TimeSeriesPoint(date=date_str, **values)
-        for date_str, values in sorted(data_by_date.items())
+        TimeSeriesPoint(
+            date=date.strftime('%Y-%m-%d') if hasattr(date, 'strftime') else str(date),
+            **{plural: counts[event_type] for event_type, plural in EVENT_TYPES.items()}
+        )
+        for date, counts in results
     ]
     
     response = AnalyticsTimeSeriesResponse(data=data, period=period)
@@ -351,45 +460,157 @@ async def get_analytics_timeseries(
 
 @router.get("/analytics/events", response_model=List[EventSchema])
 async def get_analytics_events(
+    response: Response,
     event_type: Optional[str] = Query(None, pattern="^(create|export|scan)$"),
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor; replaces offset"),
     user: dict = Depends(require_auth),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    """Get detailed event list for the current user."""
+    """Get detailed event list for the current user.
+
+    Pages are ordered by (created_at, id) descending. When a page is full the
+    ``X-Next-Cursor`` response header carries a cursor for the next page;
+    cursor pages cost the same at any depth, unlike ``offset``.
+    """
     # Get account
-    account = db.query(Account).filter(Account.auth_sub == user.get("sub")).first()
-    if not account:
-        raise HTTPException(status_code=404, detail="Account not found")
-    
-    # Get owned items
-    owned_item_ids = db.query(QRItem.id).filter(QRItem.owner_id == account.id).all()
-    owned_item_ids = [item[0] for item in owned_item_ids]
+    account = await resolve_account_async(db, user, create=False)
     
     # Build query
-    query = db.query(QREvent).filter(
-        or_(
-            QREvent.user_id == account.id,
-            QREvent.item_id.in_(owned_item_ids) if owned_item_ids else False
-        )
-    )
+    query = select(QREvent).where(owned_events_filter(account.id))
     
     # Filter by type if specified
     if event_type:
-        query = query.filter(QREvent.type == event_type)
+        query = query.where(QREvent.type == event_type)
+    
+    # Keyset: continue strictly after the last (created_at, id) of the previous page
+    if cursor:
+        cursor_created_at, cursor_id = decode_timestamp_cursor(cursor)
+        query = query.where(tuple_(QREvent.created_at, QREvent.id) < tuple_(cursor_created_at, cursor_id))
     
-    # Order by created_at desc
-    query = query.order_by(QREvent.created_at.desc())
+    # Order by created_at desc (id breaks ties so pages are stable)
+    query = query.order_by(QREvent.created_at.desc(), QREvent.id.desc())
     
     # Apply pagination
-    events = query.offset(offset).limit(limit).all()
+    if not cursor:
+        query = query.offset(offset)
+    events = (await db.scalars(query.limit(limit))).all()
+    
+    if len(events) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(events[-1].created_at, events[-1].id)
     
     logger.info({
         "event": "analytics_events_retrieved",
         "user_id": str(account.id),
         "event_type": event_type,
+        "mode": "cursor" if cursor else "offset",
         "count": len(events)
     })
     
     return events
+
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def iter_event_export(
+    account_id: UUID,
+    export_format: str,
+    event_type: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """Yield an account's events as NDJSON or CSV text chunks.
+
+    Rows are fetched through a server-side cursor ``EXPORT_FETCH_SIZE`` at a
+    time, so memory stays flat regardless of how many events are exported.
+    Uses its own session because request-scoped sessions are closed before
+    a streaming body is sent.
+    """
+    with get_read_db_context() as db:
+        query = db.query(*(getattr(QREvent, field) for field in EXPORT_FIELDS)).filter(
+            owned_events_filter(account_id)
+        )
+        if event_type:
+            query = query.filter(QREvent.type == event_type)
+        if start:
+            query = query.filter(QREvent.created_at >= start)
+        if end:
+            query = query.filter(QREvent.created_at < end)
+        rows = query.order_by(QREvent.created_at, QREvent.id).execution_options(
+            yield_per=EXPORT_FETCH_SIZE
+        )
+        
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if export_format == "csv" else None
+        if writer:
+            writer.writerow(EXPORT_FIELDS)
+        
+        pending = 0
+        for row in rows:
+            values = [_export_value(value) for value in row]
+            if writer:
+                writer.writerow([json.dumps(value) if isinstance(value, dict) else value for value in values])
+            else:
+                buffer.write(json.dumps(dict(zip(EXPORT_FIELDS, values)), separators=(",", ":")) + "\n")
+            pending += 1
+            if pending >= EXPORT_CHUNK_ROWS:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+        
+        if buffer.tell():
+            yield buffer.getvalue()
+
+
+def gzip_chunks(chunks):
+    """Gzip-compress a stream of text chunks on the fly."""
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@router.get("/analytics/events/export")
+def export_analytics_events(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    event_type: Optional[str] = Query(None, pattern="^(create|export|scan)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    compress: bool = Query(False, description="Gzip the export on the fly"),
+    user: dict = Depends(require_auth),
+    db: Session = Depends(get_read_db)
+):
+    """Stream every event for the current user as NDJSON or CSV."""
+    account = resolve_account(db, user, create=False)
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"events.{format}"
+    body = iter_event_export(account.id, format, event_type, start, end)
+    if compress:
+        body = gzip_chunks(body)
+        media_type = "application/gzip"
+        filename += ".gz"
+    
+    logger.info({
+        "event": "analytics_events_export_started",
+        "user_id": str(account.id),
+        "format": format,
+        "event_type": event_type,
+        "compress": compress
+    })
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,156 @@
+"""Audit logging staged in the caller's transaction, with an optional batched outbox."""
+import os
+import uuid
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from .database import get_db_context
+from .models import AuditLog
+from .tracking import EventBuffer, BufferFlusher
+from .logging_config import setup_logging
+
+logger = setup_logging()
+
+# transactional: audit rows are written in the same transaction as the change (default)
+# outbox: rows are queued once the change commits and written in batches by a background worker
+AUDIT_MODE = os.getenv("AUDIT_MODE", "transactional")
+AUDIT_BUFFER_SIZE = int(os.getenv("AUDIT_BUFFER_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))
+AUDIT_INSERT_CHUNK = int(os.getenv("AUDIT_INSERT_CHUNK", "1000"))
+
+
+def audit_outbox_enabled() -> bool:
+    """Whether audit rows go through the outbox instead of the caller's transaction."""
+    return AUDIT_MODE == "outbox"
+
+
+def audit_row(
+    user_id: Optional[UUID],
+    action: str,
+    resource_type: str,
+    resource_id: UUID,
+    extra_data: dict = None
+) -> dict:
+    """Build a complete ``audit_log`` row with client-side id and timestamp."""
+    return {
+        "id": uuid.uuid4(),
+        "user_id": user_id,
+        "action": action,
+        "resource_type": resource_type,
+        "resource_id": resource_id,
+        "extra_data": extra_data or {},
+        "created_at": datetime.utcnow()
+    }
+
+
+def write_audit_rows(db: Session, rows: List[dict]) -> None:
+    """Insert audit rows with one multi-row ``INSERT`` per ``AUDIT_INSERT_CHUNK`` rows."""
+    for start in range(0, len(rows), AUDIT_INSERT_CHUNK):
+        db.execute(insert(AuditLog).values(rows[start:start + AUDIT_INSERT_CHUNK]))
+
+
+def stage_audit_rows(db: Session, rows: List[dict]) -> None:
+    """Record audit rows as part of the caller's pending transaction.
+
+    Nothing is committed here: in transactional mode the rows are inserted
+    on ``db`` and commit or roll back with the change; in outbox mode they
+    are queued when ``db`` commits and discarded if it rolls back.
+    """
+    if not rows:
+        return
+    if audit_outbox_enabled():
+        db.info.setdefault("pending_audit", []).extend(rows)
+    else:
+        write_audit_rows(db, rows)
+
+
+def stage_audit(
+    db: Session,
+    user_id: UUID,
+    action: str,
+    resource_type: str,
+    resource_id: UUID,
+    extra_data: dict = None
+) -> None:
+    """Stage a single audit entry on ``db`` (see ``stage_audit_rows``)."""
+    stage_audit_rows(db, [audit_row(user_id, action, resource_type, resource_id, extra_data)])
+
+    logger.info({
+        "event": "audit",
+        "user_id": str(user_id),
+        "action": action,
+        "resource_type": resource_type,
+        "resource_id": str(resource_id)
+    })
+
+
+class AuditOutbox:
+    """Buffers committed audit rows and writes each batch in a single transaction."""
+
+    def __init__(self, maxsize: int = 10000, batch_size: int = 500, interval: float = 1.0, name: str = "audit-writer"):
+        self.name = name
+        self.buffer = EventBuffer(maxsize=maxsize, flush_threshold=batch_size)
+        self.flusher = BufferFlusher(self.buffer, self.write, batch_size=batch_size, interval=interval, name=name)
+
+    def add(self, row: dict) -> bool:
+        """Queue a row built with ``audit_row``. Returns False if it was dropped."""
+        accepted = self.buffer.put(row)
+        if not accepted and self.buffer.dropped % 1000 == 1:
+            logger.warning({"event": "audit_buffer_full", "dropped_total": self.buffer.dropped})
+        return accepted
+
+    def write(self, batch: List[dict]) -> None:
+        """Persist one batch in its own transaction."""
+        with get_db_context() as db:
+            write_audit_rows(db, batch)
+            db.commit()
+        logger.info({"event": "audit_batch_written", "count": len(batch)})
+
+    def start(self) -> None:
+        self.flusher.start()
+
+    def stop(self) -> None:
+        self.flusher.stop()
+
+    def stats(self) -> dict:
+        return self.buffer.stats()
+
+
+audit_outbox = AuditOutbox(
+    maxsize=AUDIT_BUFFER_SIZE,
+    batch_size=AUDIT_BATCH_SIZE,
+    interval=AUDIT_FLUSH_INTERVAL
+)
+
+
+@event.listens_for(Session, "after_commit")
+def _enqueue_committed_audit(session):
+    for row in session.info.pop("pending_audit", ()):
+        audit_outbox.add(row)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_audit(session):
+    session.info.pop("pending_audit", None)
+
+
+def start_audit() -> None:
+    """Start the outbox writer when audit logging runs in outbox mode."""
+    if audit_outbox_enabled():
+        audit_outbox.start()
+
+
+def stop_audit() -> None:
+    """Flush queued audit rows and stop the outbox writer."""
+    if audit_outbox_enabled():
+        audit_outbox.stop()
+
+
+def get_audit_stats() -> dict:
+    """Mode plus outbox depth, throughput and drop counters."""
+    return {"mode": AUDIT_MODE, **audit_outbox.stats()}
@@ -3,14 +3,17 @@ import stripe
 import os
 from datetime import datetime, timedelta
 from typing import Optional
+from uuid import UUID
 from fastapi import APIRouter, HTTPException, Request, Depends
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
 
-from .database import get_db
+from .database import get_async_db, get_async_read_db
 from .models import Account, BillingEvent, UsageQuota
 from .auth import get_current_user
+from .accounts import resolve_account_async
 
 router = APIRouter(prefix="/billing", tags=["billing"])
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY", "")
@@ -82,7 +85,7 @@ def get_plans():
 async def create_checkout_session(
     req: Request,
     user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create Stripe checkout session for plan subscription."""
     body = await req.json()
@@ -95,23 +98,14 @@ async def create_checkout_session(
         raise HTTPException(status_code=400, detail="Invalid plan_id")
     
     # Get or create account
-    account = db.query(Account).filter(Account.auth_sub == user["sub"]).first()
-    if not account:
-        account = Account(
-            email=user.get("email", f"user-{user['sub']}@example.com"),
-            auth_sub=user["sub"],
-            plan="free"
-        )
-        db.add(account)
-        db.commit()
-        db.refresh(account)
+    account = await resolve_account_async(db, user)
     
     try:
         if plan["price"] == 0:
             # Free plan - just update account
             account.plan = "free"
             account.subscription_status = "free"
-            db.commit()
+            await db.commit()
             logger.info({"event": "checkout_free_plan", "account_id": str(account.id)})
             return {"id": "free", "url": success_url}
         
@@ -122,7 +116,7 @@ async def create_checkout_session(
                 metadata={"account_id": str(account.id)}
             )
             account.stripe_customer_id = customer.id
-            db.commit()
+            await db.commit()
         
         # Create checkout session
         session = stripe.checkout.Session.create(
@@ -165,20 +159,18 @@ async def create_checkout_session(
 @router.get("/subscription")
 async def get_subscription(
     user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get current user's subscription status and usage."""
-    account = db.query(Account).filter(Account.auth_sub == user["sub"]).first()
-    if not account:
-        raise HTTPException(status_code=404, detail="Account not found")
+    account = await resolve_account_async(db, user, create=False)
     
     # Get current period usage
     now = datetime.utcnow()
-    current_quota = db.query(UsageQuota).filter(
+    current_quota = await db.scalar(select(UsageQuota).where(
         UsageQuota.account_id == account.id,
         UsageQuota.period_start <= now,
         UsageQuota.period_end >= now
-    ).first()
+    ))
     
     quota_limits = get_quota_for_plan(account.plan)
     
@@ -201,14 +193,14 @@ async def get_subscription(
 async def create_portal_session(
     req: Request,
     user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create Stripe customer portal session for subscription management."""
     body = await req.json()
     return_url = body.get("return_url", "http://localhost:3000/dashboard")
     
-    account = db.query(Account).filter(Account.auth_sub == user["sub"]).first()
-    if not account or not account.stripe_customer_id:
+    account = await resolve_account_async(db, user, create=False)
+    if not account.stripe_customer_id:
         raise HTTPException(status_code=404, detail="No active subscription")
     
     try:
@@ -233,19 +225,17 @@ async def create_portal_session(
 @router.get("/usage")
 async def get_usage(
     user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get detailed usage statistics for the current billing period."""
-    account = db.query(Account).filter(Account.auth_sub == user["sub"]).first()
-    if not account:
-        raise HTTPException(status_code=404, detail="Account not found")
+    account = await resolve_account_async(db, user, create=False)
     
     now = datetime.utcnow()
-    current_quota = db.query(UsageQuota).filter(
+    current_quota = await db.scalar(select(UsageQuota).where(
         UsageQuota.account_id == account.id,
         UsageQuota.period_start <= now,
         UsageQuota.period_end >= now
-    ).first()
+    ))
     
     if not current_quota:
         # Initialize quota for current period
@@ -265,8 +255,8 @@ async def get_usage(
             daily_exports=0
         )
         db.add(current_quota)
-        db.commit()
-        db.refresh(current_quota)
+        await db.commit()
+        await db.refresh(current_quota)
     
     quota_limits = get_quota_for_plan(account.plan)
     
@@ -294,7 +284,7 @@ async def get_usage(
 
 
 @router.post("/webhook")
-async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
+async def stripe_webhook(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Handle Stripe webhook events for subscription lifecycle."""
     payload = await request.body()
     sig = request.headers.get("stripe-signature")
@@ -318,7 +308,7 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
     event_data = event["data"]["object"]
     
     # Check for duplicate events
-    existing_event = db.query(BillingEvent).filter(BillingEvent.stripe_event_id == event_id).first()
+    existing_event = await db.scalar(select(BillingEvent).where(BillingEvent.stripe_event_id == event_id))
     if existing_event:
         logger.info({"event": "webhook_duplicate", "event_id": event_id})
         return JSONResponse(status_code=200, content={"ok": True, "duplicate": True})
@@ -351,7 +341,7 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
             processed=True
         )
         db.add(billing_event)
-        db.commit()
+        await db.commit()
         
         return JSONResponse(status_code=200, content={"ok": True})
         
@@ -371,13 +361,13 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
             error_message=str(e)
         )
         db.add(billing_event)
-        db.commit()
+        await db.commit()
         
         # Return generic error without exposing internal details
         return JSONResponse(status_code=500, content={"ok": False, "error": "Webhook processing error"})
 
 
-async def handle_checkout_completed(db: Session, session_data: dict):
+async def handle_checkout_completed(db: AsyncSession, session_data: dict):
     """Handle successful checkout session completion."""
     customer_id = session_data.get("customer")
     subscription_id = session_data.get("subscription")
@@ -389,7 +379,7 @@ async def handle_checkout_completed(db: Session, session_data: dict):
         logger.error({"event": "checkout_no_account_id", "session": session_data.get("id")})
         return
     
-    account = db.query(Account).filter(Account.id == account_id).first()
+    account = await db.get(Account, UUID(account_id))
     if not account:
         logger.error({"event": "checkout_account_not_found", "account_id": account_id})
         return
@@ -405,7 +395,7 @@ async def handle_checkout_completed(db: Session, session_data: dict):
         subscription = stripe.Subscription.retrieve(subscription_id)
         account.subscription_current_period_end = datetime.fromtimestamp(subscription.current_period_end)
     
-    db.commit()
+    await db.commit()
     
     logger.info({
         "event": "checkout_completed",
@@ -417,12 +407,12 @@ async def handle_checkout_completed(db: Session, session_data: dict):
     # TODO: Send receipt email via Mailhog
 
 
-async def handle_invoice_payment_succeeded(db: Session, invoice_data: dict):
+async def handle_invoice_payment_succeeded(db: AsyncSession, invoice_data: dict):
     """Handle successful invoice payment."""
     customer_id = invoice_data.get("customer")
     subscription_id = invoice_data.get("subscription")
     
-    account = db.query(Account).filter(Account.stripe_customer_id == customer_id).first()
+    account = await db.scalar(select(Account).where(Account.stripe_customer_id == customer_id))
     if not account:
         logger.error({"event": "invoice_account_not_found", "customer_id": customer_id})
         return
@@ -434,7 +424,7 @@ async def handle_invoice_payment_succeeded(db: Session, invoice_data: dict):
         subscription = stripe.Subscription.retrieve(subscription_id)
         account.subscription_current_period_end = datetime.fromtimestamp(subscription.current_period_end)
     
-    db.commit()
+    await db.commit()
     
     logger.info({
         "event": "invoice_payment_succeeded",
@@ -445,18 +435,18 @@ async def handle_invoice_payment_succeeded(db: Session, invoice_data: dict):
     # TODO: Send receipt email via Mailhog
 
 
-async def handle_invoice_payment_failed(db: Session, invoice_data: dict):
+async def handle_invoice_payment_failed(db: AsyncSession, invoice_data: dict):
     """Handle failed invoice payment."""
     customer_id = invoice_data.get("customer")
     
-    account = db.query(Account).filter(Account.stripe_customer_id == customer_id).first()
+    account = await db.scalar(select(Account).where(Account.stripe_customer_id == customer_id))
     if not account:
         logger.error({"event": "invoice_failed_account_not_found", "customer_id": customer_id})
         return
     
     # Update subscription status to past_due
     account.subscription_status = "past_due"
-    db.commit()
+    await db.commit()
     
     logger.warning({
         "event": "invoice_payment_failed",
@@ -467,13 +457,13 @@ async def handle_invoice_payment_failed(db: Session, invoice_data: dict):
     # TODO: Send payment failed email via Mailhog
 
 
-async def handle_subscription_updated(db: Session, subscription_data: dict):
+async def handle_subscription_updated(db: AsyncSession, subscription_data: dict):
     """Handle subscription updates."""
     subscription_id = subscription_data.get("id")
     customer_id = subscription_data.get("customer")
     status = subscription_data.get("status")
     
-    account = db.query(Account).filter(Account.stripe_customer_id == customer_id).first()
+    account = await db.scalar(select(Account).where(Account.stripe_customer_id == customer_id))
     if not account:
         logger.error({"event": "subscription_update_account_not_found", "customer_id": customer_id})
         return
@@ -497,7 +487,7 @@ async def handle_subscription_updated(db: Session, subscription_data: dict):
         elif amount == 2990:
             account.plan = "team"
     
-    db.commit()
+    await db.commit()
     
     logger.info({
         "event": "subscription_updated",
@@ -507,12 +497,12 @@ async def handle_subscription_updated(db: Session, subscription_data: dict):
     })
 
 
-async def handle_subscription_deleted(db: Session, subscription_data: dict):
+async def handle_subscription_deleted(db: AsyncSession, subscription_data: dict):
     """Handle subscription cancellation."""
     subscription_id = subscription_data.get("id")
     customer_id = subscription_data.get("customer")
     
-    account = db.query(Account).filter(Account.stripe_customer_id == customer_id).first()
+    account = await db.scalar(select(Account).where(Account.stripe_customer_id == customer_id))
     if not account:
         logger.error({"event": "subscription_delete_account_not_found", "customer_id": customer_id})
         return
@@ -523,7 +513,7 @@ async def handle_subscription_deleted(db: Session, subscription_data: dict):
     account.stripe_subscription_id = None
     account.subscription_current_period_end = None
     
-    db.commit()
+    await db.commit()
     
     logger.info({
         "event": "subscription_deleted",
@@ -1,12 +1,28 @@
 """Redis cache utilities for template gallery and analytics."""
 import os
 import json
+import time
+import uuid
+import asyncio
+import threading
 import redis
-from typing import Optional, Any
+from collections import OrderedDict
+from contextlib import contextmanager, asynccontextmanager
+from typing import Optional, Any, Awaitable, Callable, Tuple
 from .logging_config import setup_logging
 
 logger = setup_logging()
 
+# Single-flight recomputation: lease of the Redis recompute lock, and how long
+# other requests wait (polling) for the lock holder's result before computing themselves
+CACHE_LOCK_LEASE_MS = int(os.getenv("CACHE_LOCK_LEASE_MS", "5000"))
+CACHE_LOCK_WAIT = float(os.getenv("CACHE_LOCK_WAIT", "3.0"))
+CACHE_LOCK_POLL = float(os.getenv("CACHE_LOCK_POLL", "0.05"))
+
+# Seconds a worker reuses a namespace generation before re-reading it from Redis
+# (bounds how long other workers keep serving a namespace after it is bumped)
+CACHE_GENERATION_TTL = float(os.getenv("CACHE_GENERATION_TTL", "1"))
+
 # Redis client
 _redis_client = None
 
@@ -89,3 +105,345 @@ def delete_cache(pattern: str) -> int:
     except Exception as e:
         logger.warning({"event": "cache_delete_error", "pattern": pattern, "error": str(e)})
         return 0
+
+
+def cache_generation_key(namespace: str) -> str:
+    """Redis key holding the current generation of a cache namespace."""
+    return f"cachegen:{namespace}"
+
+
+def get_cache_generation(namespace: str) -> int:
+    """Current generation of ``namespace`` (0 if never bumped or Redis is unavailable).
+
+    Read from Redis at most once per ``CACHE_GENERATION_TTL`` per worker, so
+    a cached read costs a single Redis round trip for the data itself.
+    """
+    generation = _generation_cache.get(namespace)
+    if generation is not None:
+        return generation
+    
+    client = get_redis_client()
+    if not client:
+        return 0
+    
+    try:
+        generation = int(client.get(cache_generation_key(namespace)) or 0)
+    except Exception as e:
+        logger.warning({"event": "cache_generation_error", "namespace": namespace, "error": str(e)})
+        return 0
+    _generation_cache.set(namespace, generation)
+    return generation
+
+
+def versioned_cache_key(namespace: str, key: str) -> str:
+    """Key for ``key`` within the current generation of ``namespace``."""
+    return f"{namespace}:v{get_cache_generation(namespace)}:{key}"
+
+
+def bump_cache_generation(namespace: str) -> Optional[int]:
+    """Invalidate every key of ``namespace`` with a single ``INCR``.
+
+    Keys of older generations are never read again and expire by TTL, so
+    no keyspace ``SCAN`` is needed. Returns the new generation.
+    """
+    client = get_redis_client()
+    if not client:
+        return None
+    
+    try:
+        generation = client.incr(cache_generation_key(namespace))
+    except Exception as e:
+        logger.warning({"event": "cache_generation_error", "namespace": namespace, "error": str(e)})
+        return None
+    _generation_cache.set(namespace, generation)
+    return generation
+
+
+class LocalTTLCache:
+    """Bounded, thread-safe in-process LRU cache with per-entry TTL.
+
+    Used as a per-worker tier in front of Redis for very hot keys. Entries
+    are evicted least-recently-used once ``maxsize`` is reached and treated
+    as missing once older than ``ttl`` seconds.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return cached value or None if missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store value, evicting the least recently used entry when full."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        """Remove a key. Returns True if it was present."""
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """Return size and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Per-worker copy of namespace generations (see get_cache_generation)
+_generation_cache = LocalTTLCache(maxsize=256, ttl=CACHE_GENERATION_TTL)
+
+
+class KeyedLocks:
+    """Per-key in-process locks, discarded once nobody holds or waits on them."""
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks = {}
+
+    def _checkout(self, key: str, factory) -> list:
+        with self._guard:
+            entry = self._locks.setdefault(key, [factory(), 0])
+            entry[1] += 1
+            return entry
+
+    def _checkin(self, key: str, entry: list) -> None:
+        with self._guard:
+            entry[1] -= 1
+            if not entry[1]:
+                self._locks.pop(key, None)
+
+    @contextmanager
+    def hold(self, key: str):
+        """Hold the thread lock for ``key``."""
+        entry = self._checkout(key, threading.Lock)
+        try:
+            with entry[0]:
+                yield
+        finally:
+            self._checkin(key, entry)
+
+    @asynccontextmanager
+    async def hold_async(self, key: str):
+        """Hold the asyncio lock for ``key`` (use a separate instance from ``hold``)."""
+        entry = self._checkout(key, asyncio.Lock)
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            self._checkin(key, entry)
+
+
+_RELEASE_LOCK_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+_thread_locks = KeyedLocks()
+_task_locks = KeyedLocks()
+_single_flight_lock = threading.Lock()
+_single_flight_stats = {"hits": 0, "stale_hits": 0, "computed": 0, "coalesced": 0, "lock_timeouts": 0}
+
+
+def _count_single_flight(counter: str) -> None:
+    with _single_flight_lock:
+        _single_flight_stats[counter] += 1
+
+
+def _read_entry(client, key: str, raw: bool) -> Tuple[Optional[Any], bool]:
+    """Return ``(value, fresh)`` for a single-flight entry with one ``MGET``."""
+    try:
+        value, fresh = client.mget(key, f"{key}:fresh")
+    except Exception as e:
+        logger.warning({"event": "cache_get_error", "key": key, "error": str(e)})
+        return None, False
+    if value is not None and not raw:
+        try:
+            value = json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            pass
+    return value, fresh is not None
+
+
+def _write_entry(client, key: str, value: Any, ttl: int, stale_ttl: int) -> None:
+    """Store ``value`` for ``ttl + stale_ttl`` seconds with a freshness marker for ``ttl``."""
+    try:
+        serialized = value if isinstance(value, str) else json.dumps(value)
+        pipe = client.pipeline()
+        pipe.set(key, serialized, ex=ttl + stale_ttl)
+        pipe.set(f"{key}:fresh", 1, ex=ttl)
+        pipe.execute()
+    except Exception as e:
+        logger.warning({"event": "cache_set_error", "key": key, "error": str(e)})
+
+
+def _acquire_lock(client, key: str) -> Optional[str]:
+    """Take the Redis recompute lock for ``key`` (``SET NX PX``). Returns its token."""
+    token = uuid.uuid4().hex
+    try:
+        if client.set(f"lock:{key}", token, nx=True, px=CACHE_LOCK_LEASE_MS):
+            return token
+    except Exception as e:
+        logger.warning({"event": "cache_lock_error", "key": key, "error": str(e)})
+    return None
+
+
+def _release_lock(client, key: str, token: Optional[str]) -> None:
+    """Release the lock only if it is still ours (the lease may have expired)."""
+    if not token:
+        return
+    try:
+        client.eval(_RELEASE_LOCK_SCRIPT, 1, f"lock:{key}", token)
+    except Exception as e:
+        logger.warning({"event": "cache_lock_error", "key": key, "error": str(e)})
+
+
+def _compute_and_store(client, key: str, compute: Callable[[], Any], ttl: int, stale_ttl: int, token: Optional[str]) -> Any:
+    try:
+        value = compute()
+        _write_entry(client, key, value, ttl, stale_ttl)
+    finally:
+        _release_lock(client, key, token)
+    _count_single_flight("computed")
+    return value
+
+
+async def _compute_and_store_async(client, key: str, compute, ttl: int, stale_ttl: int, token: Optional[str]) -> Any:
+    try:
+        value = await compute()
+        await asyncio.to_thread(_write_entry, client, key, value, ttl, stale_ttl)
+    finally:
+        await asyncio.to_thread(_release_lock, client, key, token)
+    _count_single_flight("computed")
+    return value
+
+
+def get_or_compute(key: str, compute: Callable[[], Any], ttl: int = 300, stale_ttl: int = 0, raw: bool = False) -> Any:
+    """Return the cached value for ``key``, computing it at most once across workers on a miss.
+
+    Concurrent misses in this process queue on a per-key lock; across
+    processes the first to take a short-lease Redis lock recomputes while
+    the others poll for its result (falling back to computing themselves
+    after ``CACHE_LOCK_WAIT``). With ``stale_ttl``, values past ``ttl`` are
+    still served for up to ``stale_ttl`` seconds while one request
+    refreshes them. ``compute`` must return a string (``raw``) or a
+    JSON-serializable value.
+    """
+    client = get_redis_client()
+    if not client:
+        return compute()
+
+    value, fresh = _read_entry(client, key, raw)
+    if value is not None and fresh:
+        _count_single_flight("hits")
+        return value
+    if value is not None:
+        token = _acquire_lock(client, key)
+        if not token:
+            _count_single_flight("stale_hits")
+            return value
+        return _compute_and_store(client, key, compute, ttl, stale_ttl, token)
+
+    with _thread_locks.hold(key):
+        # Another request of this worker may have filled the key while we queued
+        value, _ = _read_entry(client, key, raw)
+        if value is not None:
+            _count_single_flight("coalesced")
+            return value
+        token = _acquire_lock(client, key)
+        if not token:
+            deadline = time.monotonic() + CACHE_LOCK_WAIT
+            while time.monotonic() < deadline:
+                time.sleep(CACHE_LOCK_POLL)
+                value, _ = _read_entry(client, key, raw)
+                if value is not None:
+                    _count_single_flight("coalesced")
+                    return value
+            _count_single_flight("lock_timeouts")
+        return _compute_and_store(client, key, compute, ttl, stale_ttl, token)
+
+
+async def get_or_compute_async(
+    key: str,
+    compute: Callable[[], Awaitable[Any]],
+    ttl: int = 300,
+    stale_ttl: int = 0,
+    raw: bool = False
+) -> Any:
+    """Async counterpart of ``get_or_compute`` for coroutine ``compute`` functions.
+
+    The Redis client is synchronous, so its calls run in worker threads to
+    keep them off the event loop.
+    """
+    client = await asyncio.to_thread(get_redis_client)
+    if not client:
+        return await compute()
+
+    value, fresh = await asyncio.to_thread(_read_entry, client, key, raw)
+    if value is not None and fresh:
+        _count_single_flight("hits")
+        return value
+    if value is not None:
+        token = await asyncio.to_thread(_acquire_lock, client, key)
+        if not token:
+            _count_single_flight("stale_hits")
+            return value
+        return await _compute_and_store_async(client, key, compute, ttl, stale_ttl, token)
+
+    async with _task_locks.hold_async(key):
+        value, _ = await asyncio.to_thread(_read_entry, client, key, raw)
+        if value is not None:
+            _count_single_flight("coalesced")
+            return value
+        token = await asyncio.to_thread(_acquire_lock, client, key)
+        if not token:
+            deadline = time.monotonic() + CACHE_LOCK_WAIT
+            while time.monotonic() < deadline:
+                await asyncio.sleep(CACHE_LOCK_POLL)
+                value, _ = await asyncio.to_thread(_read_entry, client, key, raw)
+                if value is not None:
+                    _count_single_flight("coalesced")
+                    return value
+            _count_single_flight("lock_timeouts")
+        return await _compute_and_store_async(client, key, compute, ttl, stale_ttl, token)
+
+
+def get_single_flight_stats() -> dict:
+    """Hit, stale-serve, recompute and coalescing counters for ``get_or_compute``."""
+    with _single_flight_lock:
+        return dict(_single_flight_stats)
@@ -0,0 +1,169 @@
+"""Folder hierarchy: recursive tree queries and materialized ancestor paths."""
+import os
+from collections import defaultdict
+from typing import List, Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import String, bindparam, func, literal, select, update
+from sqlalchemy.orm import Session, aliased
+
+from .models import Folder, QRItem
+
+# Recursion limit for folder trees (also guards against cycles in legacy data)
+FOLDER_TREE_MAX_DEPTH = int(os.getenv("FOLDER_TREE_MAX_DEPTH", "32"))
+
+
+def child_path(parent_path: Optional[str], folder_id: UUID) -> str:
+    """Materialized path of ``folder_id`` under a parent with ``parent_path`` (None = root)."""
+    return f"{parent_path or '/'}{folder_id}/"
+
+
+def rebuild_folder_paths(db: Session, owner_id: Optional[UUID] = None) -> int:
+    """Recompute ``path`` for every folder (of one owner), writing only changed rows.
+
+    Folders that cannot be reached from a root (cycles) get a NULL path.
+    Returns the number of rows updated.
+    """
+    query = db.query(Folder.id, Folder.parent_id, Folder.path)
+    if owner_id is not None:
+        query = query.filter(Folder.owner_id == owner_id)
+    rows = query.all()
+
+    children = defaultdict(list)
+    ids = {folder_id for folder_id, _, _ in rows}
+    for folder_id, parent_id, _ in rows:
+        children[parent_id if parent_id in ids else None].append(folder_id)
+
+    paths = {}
+    pending = [(folder_id, None) for folder_id in children[None]]
+    while pending:
+        folder_id, parent_path = pending.pop()
+        paths[folder_id] = child_path(parent_path, folder_id)
+        pending += [(child_id, paths[folder_id]) for child_id in children[folder_id]]
+
+    changed = [
+        {"_id": folder_id, "_path": paths.get(folder_id)}
+        for folder_id, _, path in rows if paths.get(folder_id) != path
+    ]
+    if changed:
+        table = Folder.__table__
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("_id"))
+            .values(path=bindparam("_path"), updated_at=table.c.updated_at),
+            changed
+        )
+    return len(changed)
+
+
+def move_folder(db: Session, folder: Folder, parent: Folder) -> None:
+    """Re-parent ``folder`` under ``parent``, rewriting the subtree's paths with one prefix ``UPDATE``.
+
+    Raises 400 if ``parent`` is the folder itself or one of its descendants.
+    """
+    if folder.path is None or parent.path is None:
+        rebuild_folder_paths(db, folder.owner_id)
+        db.refresh(folder)
+        db.refresh(parent)
+    if parent.id == folder.id or (folder.path and parent.path and parent.path.startswith(folder.path)):
+        raise HTTPException(status_code=400, detail="Cannot move a folder into itself or a subfolder")
+
+    folder.parent_id = parent.id
+    if folder.path is None or parent.path is None:
+        db.flush()
+        rebuild_folder_paths(db, folder.owner_id)
+        return
+
+    old_path, new_path = folder.path, child_path(parent.path, folder.id)
+    table = Folder.__table__
+    db.execute(
+        update(table)
+        .where(table.c.owner_id == folder.owner_id, table.c.path.startswith(old_path))
+        .values(
+            path=literal(new_path, String) + func.substr(table.c.path, len(old_path) + 1),
+            updated_at=table.c.updated_at
+        )
+    )
+    folder.path = new_path
+
+
+def _tree_rows(db: Session, owner_id: UUID, root: Optional[Folder], max_depth: int) -> list:
+    """``(id, parent_id, name, depth, item_count)`` for every folder in the tree, in one query."""
+    counts = select(QRItem.folder_id, func.count().label("item_count")).where(
+        QRItem.owner_id == owner_id,
+        QRItem.deleted_at.is_(None)
+    ).group_by(QRItem.folder_id).subquery()
+
+    if root is not None and root.path is not None:
+        # Subtree as a prefix scan on the materialized path
+        tree = select(
+            Folder.id, Folder.parent_id, Folder.name, Folder.path, literal(0).label("depth")
+        ).where(Folder.owner_id == owner_id, Folder.path.startswith(root.path)).subquery()
+    else:
+        anchor = Folder.id == root.id if root is not None else Folder.parent_id.is_(None)
+        tree = select(
+            Folder.id, Folder.parent_id, Folder.name, Folder.path, literal(0).label("depth")
+        ).where(Folder.owner_id == owner_id, anchor).cte("folder_tree", recursive=True)
+        child = aliased(Folder)
+        tree = tree.union_all(
+            select(child.id, child.parent_id, child.name, child.path, tree.c.depth + 1).where(
+                child.parent_id == tree.c.id,
+                child.owner_id == owner_id,
+                tree.c.depth < max_depth
+            )
+        )
+
+    rows = db.execute(
+        select(tree.c.id, tree.c.parent_id, tree.c.name, tree.c.path, tree.c.depth,
+               func.coalesce(counts.c.item_count, 0))
+        .select_from(tree)
+        .outerjoin(counts, counts.c.folder_id == tree.c.id)
+    ).all()
+
+    if root is not None and root.path is not None:
+        base = root.path.count("/")
+        rows = [
+            (folder_id, parent_id, name, path.count("/") - base, count)
+            for folder_id, parent_id, name, path, _, count in rows
+        ]
+        rows = [row for row in rows if row[3] <= max_depth]
+    else:
+        rows = [(folder_id, parent_id, name, depth, count) for folder_id, parent_id, name, _, depth, count in rows]
+    return sorted(rows, key=lambda row: (row[3], row[2]))
+
+
+def folder_tree(db: Session, owner_id: UUID, root: Optional[Folder] = None,
+                max_depth: int = FOLDER_TREE_MAX_DEPTH) -> List[dict]:
+    """Nested folder tree with per-folder and subtree item counts (deleted items excluded).
+
+    Returns the root folders (or just ``root``) as dicts with ``children``.
+    Subtrees of a backfilled ``root`` are read with a path prefix scan;
+    everything else walks ``parent_id`` with a recursive CTE.
+    """
+    nodes = {}
+    roots = []
+    root_ids = set()
+    for folder_id, parent_id, name, depth, count in _tree_rows(db, owner_id, root, max_depth):
+        if folder_id in nodes:
+            continue
+        node = {
+            "id": folder_id,
+            "name": name,
+            "parent_id": parent_id,
+            "item_count": count,
+            "subtree_item_count": count,
+            "children": []
+        }
+        nodes[folder_id] = node
+        if depth == 0 or parent_id not in nodes:
+            roots.append(node)
+            root_ids.add(folder_id)
+        else:
+            nodes[parent_id]["children"].append(node)
+
+    # Rows are ordered by depth, so children are folded in before their parents
+    for node in reversed(list(nodes.values())):
+        if node["id"] not in root_ids:
+            nodes[node["parent_id"]]["subtree_item_count"] += node["subtree_item_count"]
+    return roots
@@ -1,19 +1,31 @@
 """Library endpoints for QR items, folders, and tags management."""
-from typing import List, Optional
+import os
+import uuid
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 from uuid import UUID
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, desc, asc
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import or_, and_, desc, asc, tuple_, insert, update, delete, bindparam
 from pydantic import BaseModel, Field
-from .database import get_db
-from .models import QRItem, Folder, Tag, AuditLog, Account, QRItemTag
+from .database import get_db, get_read_db
+from .models import QRItem, Folder, Tag, QRItemTag, AuditLog
 from .auth import require_auth
+from .accounts import resolve_account
+from .audit import audit_row, stage_audit, stage_audit_rows
+from .folders import FOLDER_TREE_MAX_DEPTH, child_path, folder_tree, move_folder, rebuild_folder_paths
 from .logging_config import setup_logging
+from .search import apply_item_search
+from .pagination import encode_cursor, decode_sort_cursor, decode_timestamp_cursor, estimate_count
 
 logger = setup_logging()
 router = APIRouter(prefix="/library", tags=["library"])
 
+# Bulk API limits
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "5000"))
+BULK_INSERT_CHUNK = int(os.getenv("BULK_INSERT_CHUNK", "1000"))
+
 
 # Pydantic schemas
 class TagSchema(BaseModel):
@@ -84,54 +96,149 @@ class TagCreate(BaseModel):
 
 class QRItemListResponse(BaseModel):
     items: List[QRItemSchema]
-    total: int
+    total: Optional[int] = None  # None when count=none
     page: int
     per_page: int
+    next_cursor: Optional[str] = None
+
+
+class QRItemBulkUpdate(QRItemUpdate):
+    id: UUID
+
+
+class QRItemBulkRequest(BaseModel):
+    create: List[QRItemCreate] = []
+    update: List[QRItemBulkUpdate] = []
+    delete: List[UUID] = []
+
+
+class QRItemBulkResult(BaseModel):
+    op: str  # create, update, delete
+    index: int  # position within the request's list for that op
+    id: Optional[UUID] = None
+    status: str  # created, updated, deleted, not_found, error
+    error: Optional[str] = None
+
+
+class QRItemBulkResponse(BaseModel):
+    results: List[QRItemBulkResult]
+    created: int = 0
+    updated: int = 0
+    deleted: int = 0
+    failed: int = 0
 
 
 class FolderListResponse(BaseModel):
     folders: List[FolderSchema]
 
 
+class FolderTreeNode(BaseModel):
+    id: UUID
+    name: str
+    parent_id: Optional[UUID] = None
+    item_count: int  # live items directly in this folder
+    subtree_item_count: int  # live items in this folder and all subfolders
+    children: List["FolderTreeNode"] = []
+
+
+class FolderTreeResponse(BaseModel):
+    folders: List[FolderTreeNode]
+
+
 class TagListResponse(BaseModel):
     tags: List[TagSchema]
 
 
+class AuditLogSchema(BaseModel):
+    id: UUID
+    action: str
+    resource_type: str
+    resource_id: UUID
+    extra_data: Optional[dict] = None
+    created_at: datetime
+
+    model_config = {"from_attributes": True}
+
+
+class AuditLogListResponse(BaseModel):
+    entries: List[AuditLogSchema]
+    next_cursor: Optional[str] = None
+
+
+# Sortable columns and how their cursor values are parsed back
+ITEM_SORT_PARSERS = {
+    "name": str,
+    "type": str,
+    "created_at": datetime.fromisoformat,
+    "updated_at": datetime.fromisoformat,
+}
+
+
 # Helper functions
-def get_user_account(db: Session, user: dict) -> Account:
-    """Get or create user account from Auth0 token."""
-    auth_sub = user.get("sub")
-    email = user.get("email", f"{auth_sub}@auth0.local")
-    
-    account = db.query(Account).filter(Account.auth_sub == auth_sub).first()
-    if not account:
-        account = Account(auth_sub=auth_sub, email=email)
-        db.add(account)
-        db.commit()
-        db.refresh(account)
-    
-    return account
-
-
-def log_audit(db: Session, user_id: UUID, action: str, resource_type: str, resource_id: UUID, extra_data: dict = None):
-    """Log audit event."""
-    audit = AuditLog(
-        user_id=user_id,
-        action=action,
-        resource_type=resource_type,
-        resource_id=resource_id,
-        extra_data=extra_data or {}
-    )
-    db.add(audit)
-    db.commit()
-    
-    logger.info({
-        "event": "audit",
-        "user_id": str(user_id),
-        "action": action,
-        "resource_type": resource_type,
-        "resource_id": str(resource_id)
-    })
+def get_owned_folder(db: Session, account_id: UUID, folder_id: UUID, detail: str = "Folder not found") -> Folder:
+    """Load one of the account's folders or raise 404."""
+    folder = db.query(Folder).filter(Folder.id == folder_id, Folder.owner_id == account_id).first()
+    if not folder:
+        raise HTTPException(status_code=404, detail=detail)
+    return folder
+
+
+def resolve_tag_ids(db: Session, account_id: UUID, tag_ids: Iterable[UUID]) -> Set[UUID]:
+    """Return the subset of ``tag_ids`` owned by the account, with one ``IN`` query."""
+    tag_ids = set(tag_ids)
+    if not tag_ids:
+        return set()
+    rows = db.query(Tag.id).filter(Tag.owner_id == account_id, Tag.id.in_(tag_ids)).all()
+    return {tag_id for (tag_id,) in rows}
+
+
+def insert_rows(db: Session, table, rows: List[dict]) -> None:
+    """Insert rows with one multi-row ``INSERT ... VALUES`` per ``BULK_INSERT_CHUNK`` rows."""
+    for start in range(0, len(rows), BULK_INSERT_CHUNK):
+        db.execute(insert(table).values(rows[start:start + BULK_INSERT_CHUNK]))
+
+
+def sync_item_tags(
+    db: Session,
+    account_id: UUID,
+    desired: Dict[UUID, Iterable[UUID]],
+    new_items: bool = False,
+    owned_tags: Optional[Set[UUID]] = None
+) -> Tuple[int, int]:
+    """Make each item's tag links match its requested tags, writing only the difference.
+
+    Requested tags are filtered to those the account owns (one ``IN`` query
+    unless ``owned_tags`` is given), current links are read with one query
+    (skipped for ``new_items``), then added links are bulk-inserted and
+    removed links deleted in a single statement. Returns ``(added, removed)``.
+    """
+    if not desired:
+        return 0, 0
+    if owned_tags is None:
+        owned_tags = resolve_tag_ids(db, account_id, (tag_id for tag_ids in desired.values() for tag_id in tag_ids))
+    
+    current = defaultdict(set)
+    if not new_items:
+        for item_id, tag_id in db.query(QRItemTag.qr_item_id, QRItemTag.tag_id).filter(
+            QRItemTag.qr_item_id.in_(list(desired))
+        ).all():
+            current[item_id].add(tag_id)
+    
+    added, removed = [], {}
+    for item_id, tag_ids in desired.items():
+        wanted = [tag_id for tag_id in dict.fromkeys(tag_ids) if tag_id in owned_tags]
+        added += [{"qr_item_id": item_id, "tag_id": tag_id} for tag_id in wanted if tag_id not in current[item_id]]
+        stale = current[item_id].difference(wanted)
+        if stale:
+            removed[item_id] = stale
+    
+    insert_rows(db, QRItemTag, added)
+    if removed:
+        db.execute(delete(QRItemTag).where(or_(*(
+            and_(QRItemTag.qr_item_id == item_id, QRItemTag.tag_id.in_(tag_ids))
+            for item_id, tag_ids in removed.items()
+        ))))
+    return len(added), sum(len(tag_ids) for tag_ids in removed.values())
 
 
 # QR Items endpoints
@@ -139,17 +246,25 @@ def log_audit(db: Session, user_id: UUID, action: str, resource_type: str, resou
 def list_qr_items(
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
-    sort_by: str = Query("created_at", pattern="^(name|created_at|updated_at|type)$"),
+    sort_by: Optional[str] = Query(None, pattern="^(relevance|name|created_at|updated_at|type)$"),
     sort_order: str = Query("desc", pattern="^(asc|desc)$"),
     folder_id: Optional[UUID] = None,
     tag_id: Optional[UUID] = None,
     search: Optional[str] = None,
     deleted: bool = False,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; replaces page"),
+    count: str = Query("exact", pattern="^(exact|estimate|none)$"),
     user: dict = Depends(require_auth),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """List QR items for authenticated user with pagination, filtering, and sorting."""
-    account = get_user_account(db, user)
+    """List QR items for authenticated user with pagination, filtering, and sorting.
+
+    Column sorts return ``next_cursor`` when the page is full; passing it
+    back as ``cursor`` seeks past the previous page on (sort column, id), so
+    deep pages cost the same as the first. ``count=estimate`` uses the
+    planner's row estimate and ``count=none`` skips counting.
+    """
+    account = resolve_account(db, user)
     
     # Build query
     query = db.query(QRItem).filter(QRItem.owner_id == account.id)
@@ -168,29 +283,55 @@ def list_qr_items(
     if tag_id:
         query = query.join(QRItem.tags).filter(Tag.id == tag_id)
     
-    # Search by name
+    # Search name and payload (ranked where the database supports it)
+    rank = None
     if search:
-        query = query.filter(QRItem.name.ilike(f"%{search}%"))
+        query, rank = apply_item_search(db, query, search)
     
     # Count total
-    total = query.count()
-    
-    # Apply sorting
-    sort_column = getattr(QRItem, sort_by)
-    if sort_order == "desc":
-        query = query.order_by(desc(sort_column))
+    if count == "exact":
+        total = query.count()
+    elif count == "estimate":
+        total = estimate_count(db, query)
     else:
-        query = query.order_by(asc(sort_column))
-    
-    # Paginate
-    offset = (page - 1) * per_page
-    items = query.offset(offset).limit(per_page).all()
+        total = None
+    
+    # Apply sorting (searches default to relevance, newest first on ties)
+    if sort_by is None:
+        sort_by = "relevance" if search else "created_at"
+    if sort_by == "relevance":
+        if cursor:
+            raise HTTPException(status_code=400, detail="Cursor pagination is not available for relevance ordering")
+        if rank is not None:
+            query = query.order_by(desc(rank))
+        query = query.order_by(desc(QRItem.created_at), desc(QRItem.id))
+    else:
+        # id breaks ties so keyset pages are stable
+        sort_column = getattr(QRItem, sort_by)
+        direction = desc if sort_order == "desc" else asc
+        if cursor:
+            cursor_value, cursor_id = decode_sort_cursor(cursor, sort_by, ITEM_SORT_PARSERS[sort_by])
+            key, bound = tuple_(sort_column, QRItem.id), tuple_(cursor_value, cursor_id)
+            query = query.filter(key < bound if sort_order == "desc" else key > bound)
+        query = query.order_by(direction(sort_column), direction(QRItem.id))
+    
+    # Paginate (tags for the whole page are loaded with one extra IN query)
+    if not cursor:
+        query = query.offset((page - 1) * per_page)
+    items = query.options(selectinload(QRItem.tags)).limit(per_page).all()
+    
+    next_cursor = None
+    if sort_by != "relevance" and len(items) == per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(sort_by, getattr(last, sort_by), last.id)
     
     logger.info({
         "event": "list_qr_items",
         "user_id": str(account.id),
         "page": page,
         "per_page": per_page,
+        "mode": "cursor" if cursor else "offset",
+        "count": count,
         "total": total
     })
     
@@ -198,7 +339,8 @@ def list_qr_items(
         "items": items,
         "total": total,
         "page": page,
-        "per_page": per_page
+        "per_page": per_page,
+        "next_cursor": next_cursor
     }
 
 
@@ -209,7 +351,7 @@ def create_qr_item(
     db: Session = Depends(get_db)
 ):
     """Create a new QR item."""
-    account = get_user_account(db, user)
+    account = resolve_account(db, user)
     
     # Create QR item
     qr_item = QRItem(
@@ -225,16 +367,12 @@ def create_qr_item(
     
     # Add tags
     if item.tag_ids:
-        for tag_id in item.tag_ids:
-            tag = db.query(Tag).filter(Tag.id == tag_id, Tag.owner_id == account.id).first()
-            if tag:
-                qr_item.tags.append(tag)
+        sync_item_tags(db, account.id, {qr_item.id: item.tag_ids}, new_items=True)
     
+    stage_audit(db, account.id, "create", "qr_item", qr_item.id, {"name": item.name, "type": item.type})
     db.commit()
     db.refresh(qr_item)
     
-    log_audit(db, account.id, "create", "qr_item", qr_item.id, {"name": item.name, "type": item.type})
-    
     logger.info({
         "event": "create_qr_item",
         "user_id": str(account.id),
@@ -246,6 +384,141 @@ def create_qr_item(
     return qr_item
 
 
+@router.post("/qr-items/bulk", response_model=QRItemBulkResponse)
+def bulk_qr_items(
+    request: QRItemBulkRequest,
+    user: dict = Depends(require_auth),
+    db: Session = Depends(get_db)
+):
+    """Create, update and soft-delete many QR items in one transaction.
+
+    Tags and folders are resolved with one query each, and items, tag links
+    and audit rows are written with multi-row statements. Each operation gets
+    a result; unknown items or folders fail individually without aborting
+    the rest of the batch.
+    """
+    total_ops = len(request.create) + len(request.update) + len(request.delete)
+    if total_ops > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_ITEMS} operations per request")
+    
+    account = resolve_account(db, user)
+    results: List[QRItemBulkResult] = []
+    audit_rows: List[dict] = []
+    
+    # Resolve every referenced tag and folder up front
+    tag_ids = [tag_id for item in request.create for tag_id in item.tag_ids]
+    tag_ids += [tag_id for item in request.update for tag_id in (item.tag_ids or [])]
+    owned_tags = resolve_tag_ids(db, account.id, tag_ids)
+    folder_ids = {item.folder_id for item in [*request.create, *request.update] if item.folder_id}
+    owned_folders = set()
+    if folder_ids:
+        owned_folders = {
+            folder_id for (folder_id,) in
+            db.query(Folder.id).filter(Folder.owner_id == account.id, Folder.id.in_(folder_ids)).all()
+        }
+    
+    # Creates: ids are assigned client-side so links and audit rows need no RETURNING
+    item_rows, new_tags = [], {}
+    for index, item in enumerate(request.create):
+        if item.folder_id and item.folder_id not in owned_folders:
+            results.append(QRItemBulkResult(op="create", index=index, status="error", error="Folder not found"))
+            continue
+        item_id = uuid.uuid4()
+        item_rows.append({
+            "id": item_id,
+            "owner_id": account.id,
+            "name": item.name,
+            "type": item.type,
+            "payload": item.payload,
+            "options": item.options,
+            "folder_id": item.folder_id
+        })
+        new_tags[item_id] = item.tag_ids
+        audit_rows.append(audit_row(account.id, "create", "qr_item", item_id, {"name": item.name, "type": item.type, "bulk": True}))
+        results.append(QRItemBulkResult(op="create", index=index, id=item_id, status="created"))
+    insert_rows(db, QRItem, item_rows)
+    sync_item_tags(db, account.id, new_tags, new_items=True, owned_tags=owned_tags)
+    
+    # Updates: one executemany UPDATE per distinct set of changed fields
+    existing = set()
+    if request.update:
+        existing = {
+            item_id for (item_id,) in db.query(QRItem.id).filter(
+                QRItem.owner_id == account.id,
+                QRItem.id.in_({item.id for item in request.update})
+            ).all()
+        }
+    groups = defaultdict(list)
+    retagged = {}
+    for index, item in enumerate(request.update):
+        if item.id not in existing:
+            results.append(QRItemBulkResult(op="update", index=index, id=item.id, status="not_found", error="QR item not found"))
+            continue
+        if item.folder_id and item.folder_id not in owned_folders:
+            results.append(QRItemBulkResult(op="update", index=index, id=item.id, status="error", error="Folder not found"))
+            continue
+        changes = item.model_dump(include={"name", "payload", "options", "folder_id"}, exclude_none=True)
+        if changes:
+            groups[tuple(sorted(changes))].append({"_id": item.id, **{f"_{key}": value for key, value in changes.items()}})
+        if item.tag_ids is not None:
+            retagged[item.id] = item.tag_ids
+        audit_rows.append(audit_row(account.id, "update", "qr_item", item.id, {"fields": sorted(changes), "bulk": True}))
+        results.append(QRItemBulkResult(op="update", index=index, id=item.id, status="updated"))
+    for fields, params in groups.items():
+        db.execute(
+            update(QRItem.__table__)
+            .where(QRItem.__table__.c.id == bindparam("_id"))
+            .values({field: bindparam(f"_{field}") for field in fields}),
+            params
+        )
+    sync_item_tags(db, account.id, retagged, owned_tags=owned_tags)
+    
+    # Deletes: a single soft-delete UPDATE
+    deleted = set()
+    if request.delete:
+        deleted = {
+            item_id for (item_id,) in db.execute(
+                update(QRItem.__table__)
+                .where(
+                    QRItem.__table__.c.owner_id == account.id,
+                    QRItem.__table__.c.id.in_(set(request.delete)),
+                    QRItem.__table__.c.deleted_at.is_(None)
+                )
+                .values(deleted_at=datetime.utcnow())
+                .returning(QRItem.__table__.c.id)
+            ).all()
+        }
+    for index, item_id in enumerate(request.delete):
+        if item_id in deleted:
+            audit_rows.append(audit_row(account.id, "delete", "qr_item", item_id, {"bulk": True}))
+            results.append(QRItemBulkResult(op="delete", index=index, id=item_id, status="deleted"))
+        else:
+            results.append(QRItemBulkResult(op="delete", index=index, id=item_id, status="not_found", error="QR item not found"))
+    
+    stage_audit_rows(db, audit_rows)
+    db.commit()
+    
+    counts = {status: sum(1 for result in results if result.status == status) for status in ("created", "updated", "deleted")}
+    response = QRItemBulkResponse(
+        results=results,
+        created=counts["created"],
+        updated=counts["updated"],
+        deleted=counts["deleted"],
+        failed=len(results) - sum(counts.values())
+    )
+    
+    logger.info({
+        "event": "bulk_qr_items",
+        "user_id": str(account.id),
+        "created": response.created,
+        "updated": response.updated,
+        "deleted": response.deleted,
+        "failed": response.failed
+    })
+    
+    return response
+
+
 @router.get("/qr-items/{item_id}", response_model=QRItemSchema)
 def get_qr_item(
     item_id: UUID,
@@ -253,9 +526,9 @@ def get_qr_item(
     db: Session = Depends(get_db)
 ):
     """Get QR item by ID."""
-    account = get_user_account(db, user)
+    account = resolve_account(db, user)
     
-    qr_item = db.query(QRItem).filter(
+    qr_item = db.query(QRItem).options(selectinload(QRItem.tags)).filter(
         QRItem.id == item_id,
         QRItem.owner_id == account.id
     ).first()
@@ -274,7 +547,7 @@ def update_qr_item(
     db: Session = Depends(get_db)
 ):
     """Update QR item."""
-    account = get_user_account(db, user)
+    account = resolve_account(db, user)
     
     qr_item = db.query(QRItem).filter(
         QRItem.id == item_id,
@@ -294,19 +567,14 @@ def update_qr_item(
     if item_update.folder_id is not None:
         qr_item.folder_id = item_update.folder_id
     
-    # Update tags
+    # Update tags (only changed links are written)
     if item_update.tag_ids is not None:
-        qr_item.tags.clear()
-        for tag_id in item_update.tag_ids:
-            tag = db.query(Tag).filter(Tag.id == tag_id, Tag.owner_id == account.id).first()
-            if tag:
-                qr_item.tags.append(tag)
+        sync_item_tags(db, account.id, {qr_item.id: item_update.tag_ids})
     
+    stage_audit(db, account.id, "update", "qr_item", qr_item.id, {"name": qr_item.name})
     db.commit()
     db.refresh(qr_item)
     
-    log_audit(db, account.id, "update", "qr_item", qr_item.id, {"name": qr_item.name})
-    
     logger.info({
         "event": "update_qr_item",
         "user_id": str(account.id),
@@ -323,7 +591,7 @@ def delete_qr_item(
     db: Session = Depends(get_db)
 ):
     """Soft delete QR item."""
-    account = get_user_account(db, user)
+    account = resolve_account(db, user)
     
     qr_item = db.query(QRItem).filter(
         QRItem.id == item_id,
@@ -335,10 +603,9 @@ def delete_qr_item(
         raise HTTPException(status_code=404, detail="QR item not found")
     
     qr_item.deleted_at = datetime.utcnow()
+    stage_audit(db, account.id, "delete", "qr_item", qr_item.id, {"name": qr_item.name})
     db.commit()
     
-    log_audit(db, account.id, "delete", "qr_item", qr_item.id, {"name": qr_item.name})
-    
     logger.info({
         "event": "delete_qr_item",
         "user_id": str(account.id),
@@ -353,9 +620,9 @@ def restore_qr_item(
     db: Session = Depends(get_db)
 ):
     """Restore soft-deleted QR item."""
-    account = get_user_account(db, user)
+    account = resolve_account(db, user)
     
-    qr_item = db.query(QRItem).filter(
+    qr_item = db.query(QRItem).options(selectinload(QRItem.tags)).filter(
         QRItem.id == item_id,
         QRItem.owner_id == account.id,
         QRItem.deleted_at.isnot(None)
@@ -365,11 +632,10 @@ def restore_qr_item(
         raise HTTPException(status_code=404, detail="Deleted QR item not found")
     
     qr_item.deleted_at = None
+    stage_audit(db, account.id, "restore", "qr_item", qr_item.id, {"name": qr_item.name})
     db.commit()
     db.refresh(qr_item)
     
-    log_audit(db, account.id, "restore", "qr_item", qr_item.id, {"name": qr_item.name})
-    
     logger.info({
         "event": "restore_qr_item",
         "user_id": str(account.id),
@@ -386,9 +652,9 @@ def duplicate_qr_item(
     db: Session = Depends(get_db)
 ):
     """Duplicate QR item."""
-    account = get_user_account(db, user)
+    account = resolve_account(db, user)
     
-    original = db.query(QRItem).filter(
+    original = db.query(QRItem).options(selectinload(QRItem.tags)).filter(
         QRItem.id == item_id,
         QRItem.owner_id == account.id,
         QRItem.deleted_at.is_(None)
@@ -413,13 +679,12 @@ def duplicate_qr_item(
     for tag in original.tags:
         duplicate.tags.append(tag)
     
-    db.commit()
-    db.refresh(duplicate)
-    
-    log_audit(db, account.id, "duplicate", "qr_item", duplicate.id, {
+    stage_audit(db, account.id, "duplicate", "qr_item", duplicate.id, {
         "original_id": str(item_id),
         "name": duplicate.name
     })
+    db.commit()
+    db.refresh(duplicate)
     
     logger.info({
         "event": "duplicate_qr_item",
@@ -438,7 +703,7 @@ def list_folders(
     db: Session = Depends(get_db)
 ):
     """List all folders for authenticated user."""
-    account = get_user_account(db, user)
+    account = resolve_account(db, user)
     
     folders = db.query(Folder).filter(Folder.owner_id == account.id).order_by(Folder.name).all()
     
@@ -451,6 +716,29 @@ def list_folders(
     return {"folders": folders}
 
 
+@router.get("/folders/tree", response_model=FolderTreeResponse)
+def get_folder_tree(
+    root_id: Optional[UUID] = Query(None, description="Return only this folder's subtree"),
+    max_depth: int = Query(FOLDER_TREE_MAX_DEPTH, ge=0, le=FOLDER_TREE_MAX_DEPTH),
+    user: dict = Depends(require_auth),
+    db: Session = Depends(get_read_db)
+):
+    """Nested folder tree with per-folder and subtree item counts, in a single query."""
+    account = resolve_account(db, user)
+    
+    root = get_owned_folder(db, account.id, root_id) if root_id else None
+    folders = folder_tree(db, account.id, root, max_depth)
+    
+    logger.info({
+        "event": "folder_tree",
+        "user_id": str(account.id),
+        "root_id": str(root_id) if root_id else None,
+        "roots": len(folders)
+    })
+    
+    return {"folders": folders}
+
+
 @router.post("/folders", response_model=FolderSchema, status_code=201)
 def create_folder(
     folder: FolderCreate,
@@ -458,7 +746,7 @@ def create_folder(
     db: Session = Depends(get_db)
 ):
     """Create a new folder."""
-    account = get_user_account(db, user)
+    account = resolve_account(db, user)
     
     # Check for duplicate name
     existing = db.query(Folder).filter(
@@ -470,17 +758,28 @@ def create_folder(
     if existing:
         raise HTTPException(status_code=400, detail="Folder with this name already exists")
     
+    parent = None
+    if folder.parent_id:
+        parent = get_owned_folder(db, account.id, folder.parent_id, detail="Parent folder not found")
+    
     new_folder = Folder(
+        id=uuid.uuid4(),
         owner_id=account.id,
         name=folder.name,
         parent_id=folder.parent_id
     )
+    if parent is None or parent.path is not None:
+        new_folder.path = child_path(parent.path if parent else None, new_folder.id)
     db.add(new_folder)
+    db.flush()
+    if new_folder.path is None:
+        # Parent predates materialized paths: backfill the account's folders
+        rebuild_folder_paths(db, account.id)
+    
+    stage_audit(db, account.id, "create", "folder", new_folder.id, {"name": folder.name})
     db.commit()
     db.refresh(new_folder)
     
-    log_audit(db, account.id, "create", "folder", new_folder.id, {"name": folder.name})
-    
     logger.info({
         "event": "create_folder",
         "user_id": str(account.id),
@@ -499,7 +798,7 @@ def update_folder(
     db: Session = Depends(get_db)
 ):
     """Update folder."""
-    account = get_user_account(db, user)
+    account = resolve_account(db, user)
     
     folder = db.query(Folder).filter(
         Folder.id == folder_id,
@@ -511,14 +810,14 @@ def update_folder(
     
     if folder_update.name is not None:
         folder.name = folder_update.name
-    if folder_update.parent_id is not None:
-        folder.parent_id = folder_update.parent_id
+    if folder_update.parent_id is not None and folder_update.parent_id != folder.parent_id:
+        parent = get_owned_folder(db, account.id, folder_update.parent_id, detail="Parent folder not found")
+        move_folder(db, folder, parent)
     
+    stage_audit(db, account.id, "update", "folder", folder.id, {"name": folder.name})
     db.commit()
     db.refresh(folder)
     
-    log_audit(db, account.id, "update", "folder", folder.id, {"name": folder.name})
-    
     logger.info({
         "event": "update_folder",
         "user_id": str(account.id),
@@ -535,7 +834,7 @@ def delete_folder(
     db: Session = Depends(get_db)
 ):
     """Delete folder."""
-    account = get_user_account(db, user)
+    account = resolve_account(db, user)
     
     folder = db.query(Folder).filter(
         Folder.id == folder_id,
@@ -546,10 +845,9 @@ def delete_folder(
         raise HTTPException(status_code=404, detail="Folder not found")
     
     db.delete(folder)
+    stage_audit(db, account.id, "delete", "folder", folder.id, {"name": folder.name})
     db.commit()
     
-    log_audit(db, account.id, "delete", "folder", folder.id, {"name": folder.name})
-    
     logger.info({
         "event": "delete_folder",
         "user_id": str(account.id),
@@ -564,7 +862,7 @@ def list_tags(
     db: Session = Depends(get_db)
 ):
     """List all tags for authenticated user."""
-    account = get_user_account(db, user)
+    account = resolve_account(db, user)
     
     tags = db.query(Tag).filter(Tag.owner_id == account.id).order_by(Tag.name).all()
     
@@ -584,7 +882,7 @@ def create_tag(
     db: Session = Depends(get_db)
 ):
     """Create a new tag."""
-    account = get_user_account(db, user)
+    account = resolve_account(db, user)
     
     # Check for duplicate name
     existing = db.query(Tag).filter(
@@ -601,11 +899,11 @@ def create_tag(
         color=tag.color
     )
     db.add(new_tag)
+    db.flush()
+    stage_audit(db, account.id, "create", "tag", new_tag.id, {"name": tag.name})
     db.commit()
     db.refresh(new_tag)
     
-    log_audit(db, account.id, "create", "tag", new_tag.id, {"name": tag.name})
-    
     logger.info({
         "event": "create_tag",
         "user_id": str(account.id),
@@ -614,3 +912,58 @@ def create_tag(
     })
     
     return new_tag
+
+
+# Audit trail endpoint
+@router.get("/audit", response_model=AuditLogListResponse)
+def list_audit_log(
+    resource_type: Optional[str] = Query(None, pattern="^(qr_item|folder|tag)$"),
+    resource_id: Optional[UUID] = None,
+    action: Optional[str] = Query(None, max_length=50),
+    start: Optional[datetime] = Query(None, description="Only entries at or after this time"),
+    end: Optional[datetime] = Query(None, description="Only entries before this time"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from next_cursor"),
+    user: dict = Depends(require_auth),
+    db: Session = Depends(get_read_db)
+):
+    """List the current user's audit trail, newest first.
+
+    Pages are keyset-paginated on (created_at, id). Bounding the time range
+    with ``start``/``end`` lets Postgres skip monthly partitions outside it.
+    """
+    account = resolve_account(db, user)
+    
+    query = db.query(AuditLog).filter(AuditLog.user_id == account.id)
+    if resource_type:
+        query = query.filter(AuditLog.resource_type == resource_type)
+    if resource_id:
+        query = query.filter(AuditLog.resource_id == resource_id)
+    if action:
+        query = query.filter(AuditLog.action == action)
+    if start:
+        query = query.filter(AuditLog.created_at >= start)
+    if end:
+        query = query.filter(AuditLog.created_at < end)
+    
+    # Keyset: continue strictly after the last (created_at, id) of the previous page
+    if cursor:
+        cursor_created_at, cursor_id = decode_timestamp_cursor(cursor)
+        query = query.filter(tuple_(AuditLog.created_at, AuditLog.id) < tuple_(cursor_created_at, cursor_id))
+    
+    entries = query.order_by(desc(AuditLog.created_at), desc(AuditLog.id)).limit(limit).all()
+    
+    next_cursor = None
+    if len(entries) == limit:
+        next_cursor = encode_cursor(entries[-1].created_at, entries[-1].id)
+    
+    logger.info({
+        "event": "list_audit_log",
+        "user_id": str(account.id),
+        "resource_type": resource_type,
+        "action": action,
+        "mode": "cursor" if cursor else "first_page",
+        "count": len(entries)
+    })
+    
+    return {"entries": entries, "next_cursor": next_cursor}
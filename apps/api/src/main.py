@@ -2,12 +2,17 @@ from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from .logging_config import setup_logging
-from .auth import require_auth
+from .auth import require_auth, require_admin
 from . import billing
 from . import library
 from . import templates
 from . import analytics
-from .database import init_db
+from . import tracking
+from . import audit
+from .accounts import get_account_cache_stats
+from .cache import get_single_flight_stats
+from .database import init_db, get_db_context, get_pool_stats, start_replica_monitors, stop_replica_monitors
+from .maintenance import ensure_event_partitions, ensure_audit_partitions
 from .rate_limit import RateLimitMiddleware
 
 logger = setup_logging()
@@ -20,13 +25,21 @@ async def lifespan(app: FastAPI):
     try:
         init_db()
         logger.info({"event": "database_initialized"})
+        with get_db_context() as db:
+            ensure_event_partitions(db)
+            ensure_audit_partitions(db)
     except Exception as e:
         logger.error({"event": "database_init_error", "error": str(e)})
+    start_replica_monitors()
+    tracking.start_tracking()
+    audit.start_audit()
     
     yield
     
-    # Shutdown (if needed)
-    pass
+    # Shutdown: persist any buffered scans and audit rows
+    tracking.stop_tracking()
+    audit.stop_audit()
+    stop_replica_monitors()
 
 
 app = FastAPI(title="QR Cloner API", version="0.4.0", lifespan=lifespan)
@@ -46,6 +59,19 @@ def health():
 def secure_ping(user=Depends(require_auth)):
     return {"ok": True, "sub": user.get("sub")}
 
+@app.get("/metrics")
+def metrics(user=Depends(require_admin)):
+    """Per-worker runtime counters (cache tiers, buffers, connection pools) for admins."""
+    return {
+        "db_pool": get_pool_stats(),
+        "account_cache": get_account_cache_stats(),
+        "shortlink_cache": analytics.get_shortlink_cache_stats(),
+        "cache_single_flight": get_single_flight_stats(),
+        "scan_buffer": tracking.get_scan_buffer_stats(),
+        "scan_counter": tracking.get_scan_counter_stats(),
+        "audit": audit.get_audit_stats(),
+    }
+
 app.include_router(billing.router)
 app.include_router(library.router)
 app.include_router(templates.public_router)
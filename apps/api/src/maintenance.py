@@ -0,0 +1,314 @@
+"""Operational maintenance jobs (schema backfills, rollup rebuilds, partitions).
+
+Run from the repository root, e.g.::
+
+    python -m apps.api.src.maintenance backfill-event-owners
+    python -m apps.api.src.maintenance backfill-rollups
+    python -m apps.api.src.maintenance migrate-search-index
+    python -m apps.api.src.maintenance migrate-folder-paths
+    python -m apps.api.src.maintenance ensure-partitions
+    python -m apps.api.src.maintenance apply-retention
+"""
+import argparse
+import os
+import re
+from datetime import datetime
+from typing import List
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .database import get_db_context
+from .rollups import backfill_rollups
+from .folders import rebuild_folder_paths
+from .models import QR_ITEM_SEARCH_EXPRESSION
+from .logging_config import setup_logging
+
+logger = setup_logging()
+
+# Monthly partitions to keep created ahead of the current month
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+# Months of raw events to keep; older partitions are detached and dropped (0 = keep forever)
+EVENT_RETENTION_MONTHS = int(os.getenv("EVENT_RETENTION_MONTHS", "0"))
+# Months of audit history to keep (0 = keep forever)
+AUDIT_RETENTION_MONTHS = int(os.getenv("AUDIT_RETENTION_MONTHS", "0"))
+
+_PARTITION_SUFFIX = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def add_months(month: datetime, count: int) -> datetime:
+    """Return the first day of the month ``count`` months after ``month``."""
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    """Name of the monthly partition of ``table`` holding ``month``."""
+    return f"{table}_p{month.year:04d}{month.month:02d}"
+
+
+def is_partitioned(db: Session, table: str) -> bool:
+    """Whether ``table`` is a declaratively partitioned Postgres table."""
+    return bool(db.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = :table"
+    ), {"table": table}).scalar())
+
+
+def list_partitions(db: Session, table: str) -> List[str]:
+    """Names of the partitions currently attached to ``table``."""
+    return list(db.execute(text(
+        "SELECT child.relname FROM pg_inherits i "
+        "JOIN pg_class parent ON parent.oid = i.inhparent "
+        "JOIN pg_class child ON child.oid = i.inhrelid "
+        "WHERE parent.relname = :table ORDER BY child.relname"
+    ), {"table": table}).scalars())
+
+
+def default_has_rows(db: Session, table: str, start: datetime, end: datetime, key: str = "created_at") -> bool:
+    """Whether ``table``'s DEFAULT partition holds rows in ``[start, end)``."""
+    return bool(db.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM {table}_default WHERE {key} >= :start AND {key} < :end)"
+    ), {"start": start, "end": end}).scalar())
+
+
+def move_default_rows(db: Session, table: str, partition: str, start: datetime, end: datetime,
+                      key: str = "created_at") -> int:
+    """Move rows in ``[start, end)`` from ``table``'s DEFAULT partition into ``partition``.
+
+    Returns the number of rows moved.
+    """
+    result = db.execute(text(
+        f"WITH moved AS (DELETE FROM {table}_default WHERE {key} >= :start AND {key} < :end RETURNING *) "
+        f"INSERT INTO {partition} SELECT * FROM moved"
+    ), {"start": start, "end": end})
+    logger.warning({
+        "event": "partition_default_rows_moved",
+        "table": table,
+        "partition": partition,
+        "rows": result.rowcount
+    })
+    return result.rowcount
+
+
+def ensure_monthly_partitions(db: Session, table: str, months_ahead: int = PARTITION_MONTHS_AHEAD) -> List[str]:
+    """Create this month's and the next ``months_ahead`` monthly partitions, plus a default one.
+
+    Safe to run repeatedly (at startup and from cron). Tables created before
+    partitioning was introduced are skipped with a warning. If rows for a
+    month already landed in the default partition (upkeep fell behind), the
+    month is created detached, the rows are moved into it and it is then
+    attached, since Postgres refuses to create a partition overlapping rows
+    in the default. Returns the names of partitions that were created.
+    """
+    if not is_partitioned(db, table):
+        logger.warning({"event": "partitioning_skipped", "table": table, "reason": "table is not partitioned"})
+        return []
+
+    existing = set(list_partitions(db, table))
+    has_default = f"{table}_default" in existing
+    created = []
+    current = add_months(datetime.utcnow(), 0)
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        name = partition_name(table, month)
+        if name in existing:
+            continue
+        end = add_months(month, 1)
+        bounds = f"FOR VALUES FROM ('{month.date().isoformat()}') TO ('{end.date().isoformat()}')"
+        if has_default and default_has_rows(db, table, month, end):
+            db.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+            move_default_rows(db, table, name, month, end)
+            db.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} {bounds}"))
+        else:
+            db.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} {bounds}"))
+        created.append(name)
+    if not has_default:
+        db.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+    db.commit()
+
+    if created:
+        logger.info({"event": "partitions_created", "table": table, "partitions": created})
+    return created
+
+
+def drop_expired_partitions(db: Session, table: str, retain_months: int, detach_only: bool = False) -> List[str]:
+    """Detach (and unless ``detach_only``, drop) monthly partitions older than ``retain_months``.
+
+    The current month always counts as retained. Rows of an expired month
+    found in the default partition are moved into that month's partition
+    first, so they are archived or dropped with it. Returns the affected
+    partition names. ``retain_months <= 0`` disables retention.
+    """
+    if retain_months <= 0 or not is_partitioned(db, table):
+        return []
+
+    cutoff = add_months(datetime.utcnow(), -(retain_months - 1))
+    partitions = list_partitions(db, table)
+    has_default = f"{table}_default" in partitions
+    expired = []
+    for name in partitions:
+        match = _PARTITION_SUFFIX.search(name)
+        if not match:
+            continue
+        month = datetime(int(match.group(1)), int(match.group(2)), 1)
+        end = add_months(month, 1)
+        if end > cutoff:
+            continue
+        if has_default and default_has_rows(db, table, month, end):
+            move_default_rows(db, table, name, month, end)
+        db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        if not detach_only:
+            db.execute(text(f"DROP TABLE {name}"))
+        expired.append(name)
+    db.commit()
+
+    if expired:
+        logger.info({"event": "partitions_expired", "table": table, "partitions": expired, "dropped": not detach_only})
+    return expired
+
+
+def ensure_event_partitions(db: Session) -> List[str]:
+    """Create upcoming ``qr_events`` partitions."""
+    return ensure_monthly_partitions(db, "qr_events")
+
+
+def apply_event_retention(db: Session, detach_only: bool = False) -> List[str]:
+    """Expire raw ``qr_events`` partitions past ``EVENT_RETENTION_MONTHS``.
+
+    Analytics totals survive because the rollups are maintained at ingest.
+    """
+    return drop_expired_partitions(db, "qr_events", EVENT_RETENTION_MONTHS, detach_only)
+
+
+def ensure_audit_partitions(db: Session) -> List[str]:
+    """Create upcoming ``audit_log`` partitions."""
+    return ensure_monthly_partitions(db, "audit_log")
+
+
+def apply_audit_retention(db: Session, detach_only: bool = False) -> List[str]:
+    """Expire ``audit_log`` partitions past ``AUDIT_RETENTION_MONTHS``.
+
+    Use ``detach_only`` to keep the detached tables for archiving.
+    """
+    return drop_expired_partitions(db, "audit_log", AUDIT_RETENTION_MONTHS, detach_only)
+
+
+def migrate_event_owner_column(db: Session) -> None:
+    """Add ``qr_events.owner_id`` and its index on databases created before it existed."""
+    db.execute(text(
+        "ALTER TABLE qr_events ADD COLUMN IF NOT EXISTS owner_id UUID "
+        "REFERENCES accounts(id) ON DELETE SET NULL"
+    ))
+    db.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_qr_events_owner ON qr_events (owner_id, type, created_at)"
+    ))
+    db.commit()
+
+
+def migrate_qr_item_search(db: Session) -> None:
+    """Add ``qr_items.search_text`` and its trigram index on databases created before search existed.
+
+    Adding the stored generated column rewrites ``qr_items``; run it in a
+    maintenance window on large installations.
+    """
+    db.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    db.execute(text(
+        "ALTER TABLE qr_items ADD COLUMN IF NOT EXISTS search_text TEXT "
+        f"GENERATED ALWAYS AS ({QR_ITEM_SEARCH_EXPRESSION}) STORED"
+    ))
+    db.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_qr_items_search_trgm ON qr_items USING gin (search_text gin_trgm_ops)"
+    ))
+    db.commit()
+    logger.info({"event": "qr_item_search_migrated"})
+
+
+def migrate_folder_paths(db: Session) -> int:
+    """Add ``folders.path`` and its prefix index, then backfill every folder's path.
+
+    Returns the number of folders whose path was written.
+    """
+    db.execute(text("ALTER TABLE folders ADD COLUMN IF NOT EXISTS path TEXT"))
+    db.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_folders_owner_path ON folders (owner_id, path text_pattern_ops)"
+    ))
+    total = rebuild_folder_paths(db)
+    db.commit()
+    logger.info({"event": "folder_paths_migrated", "rows": total})
+    return total
+
+
+def backfill_event_owner_ids(db: Session, batch_size: int = 10000) -> int:
+    """Populate ``owner_id`` on existing events in small committed batches.
+
+    Each batch locks at most ``batch_size`` rows (skipping rows locked by
+    concurrent writers), so the job can run against a live database.
+    Returns the total number of rows updated.
+    """
+    total = 0
+    while True:
+        result = db.execute(text("""
+            WITH batch AS (
+                SELECT e.id
+                FROM qr_events e
+                WHERE e.owner_id IS NULL
+                  AND (e.item_id IS NOT NULL OR e.user_id IS NOT NULL)
+                LIMIT :batch_size
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE qr_events e
+            SET owner_id = COALESCE(
+                (SELECT i.owner_id FROM qr_items i WHERE i.id = e.item_id),
+                e.user_id
+            )
+            FROM batch
+            WHERE e.id = batch.id
+        """), {"batch_size": batch_size})
+        db.commit()
+        if not result.rowcount:
+            break
+        total += result.rowcount
+        logger.info({"event": "event_owner_backfill_batch", "rows": result.rowcount, "total": total})
+    return total
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="QR Cloner API maintenance jobs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    owners = commands.add_parser("backfill-event-owners", help="Add and populate qr_events.owner_id")
+    owners.add_argument("--batch-size", type=int, default=10000)
+
+    commands.add_parser("backfill-rollups", help="Rebuild analytics rollups from qr_events (pause ingest first)")
+
+    commands.add_parser("migrate-search-index", help="Add the qr_items trigram search column and index")
+
+    commands.add_parser("migrate-folder-paths", help="Add and backfill folders.path")
+
+    commands.add_parser("ensure-partitions", help="Create upcoming monthly partitions")
+
+    retention = commands.add_parser("apply-retention", help="Detach/drop partitions past retention")
+    retention.add_argument("--detach-only", action="store_true", help="Detach but keep the tables for archiving")
+
+    args = parser.parse_args(argv)
+    with get_db_context() as db:
+        if args.command == "backfill-event-owners":
+            migrate_event_owner_column(db)
+            total = backfill_event_owner_ids(db, args.batch_size)
+            logger.info({"event": "event_owner_backfill_complete", "rows": total})
+        elif args.command == "backfill-rollups":
+            backfill_rollups(db)
+        elif args.command == "migrate-search-index":
+            migrate_qr_item_search(db)
+        elif args.command == "migrate-folder-paths":
+            migrate_folder_paths(db)
+        elif args.command == "ensure-partitions":
+            ensure_event_partitions(db)
+            ensure_audit_partitions(db)
+        elif args.command == "apply-retention":
+            apply_event_retention(db, args.detach_only)
+            apply_audit_retention(db, args.detach_only)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,17 @@
 """SQLAlchemy models for QR items, folders, tags, and audit log."""
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, ForeignKey, DateTime, Text, CheckConstraint, UniqueConstraint, Index, Boolean, Integer
+from sqlalchemy import Column, String, ForeignKey, DateTime, Text, CheckConstraint, UniqueConstraint, Index, Boolean, Integer, BigInteger, Computed
 from sqlalchemy.dialects.postgresql import UUID, JSONB
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from .database import Base
 
+# Searchable text of a QR item: its name plus the URL/text payload, lower-cased
+QR_ITEM_SEARCH_EXPRESSION = (
+    "lower(name || ' ' || coalesce(payload->>'url', '') || ' ' || coalesce(payload->>'text', ''))"
+)
+
 
 class Account(Base):
     """User account model with billing integration."""
@@ -58,6 +63,8 @@ class QRItem(Base):
     deleted_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Maintained by the database; only referenced by search filters, so not loaded by default
+    search_text = deferred(Column(Text, Computed(QR_ITEM_SEARCH_EXPRESSION, persisted=True)))
 
     # Constraints
     __table_args__ = (
@@ -65,6 +72,11 @@ class QRItem(Base):
         Index("idx_qr_items_owner", "owner_id"),
         Index("idx_qr_items_deleted", "owner_id", "deleted_at"),
         Index("idx_qr_items_folder", "folder_id"),
+        Index("idx_qr_items_owner_created", "owner_id", "created_at", "id"),
+        Index(
+            "idx_qr_items_search_trgm", "search_text",
+            postgresql_using="gin", postgresql_ops={"search_text": "gin_trgm_ops"}
+        ),
     )
 
     # Relationships
@@ -81,6 +93,8 @@ class Folder(Base):
     owner_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id", ondelete="CASCADE"), nullable=False)
     name = Column(String(255), nullable=False)
     parent_id = Column(UUID(as_uuid=True), ForeignKey("folders.id", ondelete="CASCADE"), nullable=True)
+    # Materialized path of ancestor ids ("/<root>/.../<self>/"); NULL until backfilled
+    path = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -88,6 +102,7 @@ class Folder(Base):
     __table_args__ = (
         UniqueConstraint("owner_id", "name", "parent_id", name="unique_folder_name_per_user"),
         Index("idx_folders_owner", "owner_id"),
+        Index("idx_folders_owner_path", "owner_id", "path", postgresql_ops={"path": "text_pattern_ops"}),
     )
 
     # Relationships
@@ -127,7 +142,10 @@ class QRItemTag(Base):
 
 
 class AuditLog(Base):
-    """Audit log for tracking user actions."""
+    """Audit log for tracking user actions.
+
+    Range-partitioned by month on ``created_at`` on Postgres, like ``qr_events``.
+    """
     __tablename__ = "audit_log"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -136,11 +154,13 @@ class AuditLog(Base):
     resource_type = Column(String, nullable=False)  # qr_item, folder, tag
     resource_id = Column(UUID(as_uuid=True), nullable=False)
     extra_data = Column(JSONB, default={})
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
 
     # Indexes
     __table_args__ = (
-        Index("idx_audit_log_user", "user_id", "created_at"),
+        Index("idx_audit_log_user", "user_id", "created_at", "id"),
+        Index("idx_audit_log_resource", "resource_id", "created_at", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
 
 
@@ -282,20 +302,26 @@ class BillingEvent(Base):
 
 
 class QREvent(Base):
-    """Event tracking for QR codes (create, export, scan)."""
+    """Event tracking for QR codes (create, export, scan).
+
+    Range-partitioned by month on ``created_at`` on Postgres, so the primary
+    key includes the partition column (see ``maintenance.ensure_monthly_partitions``).
+    """
     __tablename__ = "qr_events"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     type = Column(String, nullable=False)  # create, export, scan
     user_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id", ondelete="SET NULL"), nullable=True)
     item_id = Column(UUID(as_uuid=True), ForeignKey("qr_items.id", ondelete="SET NULL"), nullable=True)
+    # Account the event is attributed to (item owner, else acting user); denormalized at ingest
+    owner_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id", ondelete="SET NULL"), nullable=True)
     
     # Event metadata
     meta = Column(JSONB, default={})  # Format, location, user agent, etc.
     ip_address = Column(String, nullable=True)
     user_agent = Column(Text, nullable=True)
     
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
 
     # Constraints
     __table_args__ = (
@@ -303,6 +329,40 @@ class QREvent(Base):
         Index("idx_qr_events_type", "type", "created_at"),
         Index("idx_qr_events_user", "user_id", "created_at"),
         Index("idx_qr_events_item", "item_id", "created_at"),
+        Index("idx_qr_events_owner", "owner_id", "type", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+
+class QREventRollupHourly(Base):
+    """Hourly event counts per (account, item, event type), maintained at ingest."""
+    __tablename__ = "qr_event_rollups_hourly"
+
+    account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id", ondelete="CASCADE"), primary_key=True)
+    item_id = Column(UUID(as_uuid=True), primary_key=True)  # Nil UUID for events without an item
+    type = Column(String, primary_key=True)  # create, export, scan
+    bucket = Column(DateTime(timezone=True), primary_key=True)  # Start of the hour
+    count = Column(BigInteger, nullable=False, default=0)
+
+    # Constraints
+    __table_args__ = (
+        Index("idx_qr_event_rollups_hourly_account", "account_id", "bucket"),
+    )
+
+
+class QREventRollupDaily(Base):
+    """Daily event counts per (account, item, event type), maintained at ingest."""
+    __tablename__ = "qr_event_rollups_daily"
+
+    account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id", ondelete="CASCADE"), primary_key=True)
+    item_id = Column(UUID(as_uuid=True), primary_key=True)  # Nil UUID for events without an item
+    type = Column(String, primary_key=True)  # create, export, scan
+    bucket = Column(DateTime(timezone=True), primary_key=True)  # Start of the day
+    count = Column(BigInteger, nullable=False, default=0)
+
+    # Constraints
+    __table_args__ = (
+        Index("idx_qr_event_rollups_daily_account", "account_id", "bucket"),
     )
 
 
@@ -0,0 +1,77 @@
+"""Opaque keyset-pagination cursors."""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Query, Session
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode the sort-key values of the last row on a page as an opaque token."""
+    payload = json.dumps([_encode_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Decode a cursor into its ``size`` raw values. Raises HTTP 400 if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def decode_timestamp_cursor(cursor: str) -> tuple:
+    """Decode a ``(created_at, id)`` cursor. Raises HTTP 400 if malformed."""
+    created_at, row_id = decode_cursor(cursor, 2)
+    try:
+        return datetime.fromisoformat(created_at), UUID(row_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def decode_sort_cursor(cursor: str, sort_key: str, parse: Callable[[Any], Any]) -> tuple:
+    """Decode a ``(sort key, sort value, id)`` cursor issued for ``sort_key``.
+
+    ``parse`` converts the JSON sort value back to the column's type.
+    Raises HTTP 400 if malformed or issued for a different ordering.
+    """
+    key, value, row_id = decode_cursor(cursor, 3)
+    if key != sort_key:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+    try:
+        return parse(value), UUID(row_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def estimate_count(db: Session, query: Query) -> int:
+    """Planner row estimate for ``query`` without executing it.
+
+    Uses ``EXPLAIN (FORMAT JSON)`` on Postgres; other databases get an exact count.
+    """
+    statement = query.order_by(None).statement
+    # Resolve the bind as for the query itself, so read sessions estimate on a replica
+    bind_arguments = {"clause": statement}
+    bind = db.get_bind(**bind_arguments)
+    if bind.dialect.name != "postgresql":
+        return query.count()
+    sql = statement.compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True})
+    plan = db.connection(bind_arguments=bind_arguments).exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
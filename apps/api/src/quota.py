@@ -9,6 +9,7 @@ from loguru import logger
 from .database import get_db
 from .models import Account, UsageQuota
 from .billing import get_quota_for_plan
+from .accounts import resolve_account
 
 
 def get_or_create_quota(db: Session, account: Account) -> UsageQuota:
@@ -154,9 +155,7 @@ def increment_template_quota(account: Account, db: Session):
 
 def enforce_qr_quota(user: dict, db: Session = Depends(get_db)):
     """Dependency to enforce QR generation quota."""
-    account = db.query(Account).filter(Account.auth_sub == user["sub"]).first()
-    if not account:
-        raise HTTPException(status_code=404, detail="Account not found")
+    account = resolve_account(db, user, create=False)
     
     if not check_qr_quota(account, db):
         limits = get_quota_for_plan(account.plan)
@@ -176,9 +175,7 @@ def enforce_qr_quota(user: dict, db: Session = Depends(get_db)):
 
 def enforce_export_quota(user: dict, db: Session = Depends(get_db)):
     """Dependency to enforce export quota."""
-    account = db.query(Account).filter(Account.auth_sub == user["sub"]).first()
-    if not account:
-        raise HTTPException(status_code=404, detail="Account not found")
+    account = resolve_account(db, user, create=False)
     
     if not check_export_quota(account, db):
         limits = get_quota_for_plan(account.plan)
@@ -198,9 +195,7 @@ def enforce_export_quota(user: dict, db: Session = Depends(get_db)):
 
 def enforce_template_quota(user: dict, db: Session = Depends(get_db)):
     """Dependency to enforce template application quota."""
-    account = db.query(Account).filter(Account.auth_sub == user["sub"]).first()
-    if not account:
-        raise HTTPException(status_code=404, detail="Account not found")
+    account = resolve_account(db, user, create=False)
     
     if not check_template_quota(account, db):
         limits = get_quota_for_plan(account.plan)
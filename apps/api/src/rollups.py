@@ -0,0 +1,138 @@
+"""Pre-aggregated analytics rollups maintained incrementally at event ingest."""
+import os
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import List, Tuple
+from uuid import UUID
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from .models import QRItem, QREventRollupHourly, QREventRollupDaily
+from .aggregation import count_events_by_group
+from .logging_config import setup_logging
+
+logger = setup_logging()
+
+# Read /analytics/summary and /analytics/timeseries from rollups instead of raw events.
+# Enable only after `maintenance backfill-rollups` has populated the tables.
+ANALYTICS_USE_ROLLUPS = os.getenv("ANALYTICS_USE_ROLLUPS", "false").lower() == "true"
+
+# Item key used for events that are not tied to a QR item
+NO_ITEM = uuid.UUID(int=0)
+
+def hour_bucket(ts: datetime) -> datetime:
+    """Truncate a timestamp to the start of its hour."""
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(ts: datetime) -> datetime:
+    """Truncate a timestamp to the start of its day."""
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def assign_event_owners(db: Session, rows: List[dict]) -> None:
+    """Fill ``owner_id`` on rows that lack it: the item's owner, else the acting user.
+
+    Item owners are looked up with one query for the whole batch.
+    """
+    missing = {row["item_id"] for row in rows if not row.get("owner_id") and row.get("item_id")}
+    owners = {}
+    if missing:
+        owners = dict(db.query(QRItem.id, QRItem.owner_id).filter(QRItem.id.in_(missing)).all())
+    for row in rows:
+        if not row.get("owner_id"):
+            row["owner_id"] = owners.get(row.get("item_id")) or row.get("user_id")
+
+
+def _upsert_counts(db: Session, model, counts: Counter) -> None:
+    if not counts:
+        return
+    # Sorted keys keep lock order stable across concurrent writers
+    stmt = pg_insert(model).values([
+        {"account_id": account_id, "item_id": item_id, "type": event_type, "bucket": bucket, "count": count}
+        for (account_id, item_id, event_type, bucket), count in sorted(counts.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[model.account_id, model.item_id, model.type, model.bucket],
+        set_={"count": model.count + stmt.excluded.count}
+    )
+    db.execute(stmt)
+
+
+def count_rollups(rows: List[dict]) -> Tuple[Counter, Counter]:
+    """Aggregate event rows into ``(hourly, daily)`` counters keyed by rollup row.
+
+    Events are attributed to their ``owner_id`` (see ``assign_event_owners``);
+    events without an owner are skipped.
+    """
+    hourly, daily = Counter(), Counter()
+    for row in rows:
+        item_id = row.get("item_id")
+        account_id = row.get("owner_id")
+        if not account_id:
+            continue
+        key = (account_id, item_id or NO_ITEM, row["type"])
+        hourly[key + (hour_bucket(row["created_at"]),)] += 1
+        daily[key + (day_bucket(row["created_at"]),)] += 1
+    return hourly, daily
+
+
+def write_rollup_counts(db: Session, hourly: Counter, daily: Counter) -> None:
+    """Upsert pre-aggregated counters, one row per key and bucket."""
+    _upsert_counts(db, QREventRollupHourly, hourly)
+    _upsert_counts(db, QREventRollupDaily, daily)
+
+
+def apply_rollups(db: Session, rows: List[dict]) -> int:
+    """Add a batch of event rows to the hourly and daily rollups in the caller's transaction.
+
+    Meant for batched writes; single events should be accumulated with
+    ``ScanCounter.add_rollups`` instead, so hot keys are not upserted per
+    event. Returns the number of rows rolled up.
+    """
+    hourly, daily = count_rollups(rows)
+    write_rollup_counts(db, hourly, daily)
+    return sum(daily.values())
+
+
+def rollup_timeseries(db: Session, account_id: UUID, start_date: datetime, period: str = "daily"):
+    """Return ``[(date, {event_type: count})]`` from the daily rollup, by day or ISO week."""
+    model = QREventRollupDaily
+    if period == "daily":
+        date_expr = func.date(model.bucket)
+    else:
+        date_expr = func.date_trunc("week", model.bucket)
+    return count_events_by_group(
+        db, date_expr, model.type,
+        [model.account_id == account_id, model.bucket >= day_bucket(start_date)],
+        value=model.count
+    )
+
+
+def backfill_rollups(db: Session) -> None:
+    """Rebuild both rollup tables from raw ``qr_events`` (one-off or repair job).
+
+    Run after the ``owner_id`` backfill so every event is attributed, and with
+    ingest paused: API workers keep rollup increments for committed events in
+    their ``ScanCounter`` until the next flush, and any still pending when the
+    tables are rebuilt would be added on top and double-count. Stopping the
+    workers flushes their counters.
+    """
+    for table, unit in (("qr_event_rollups_hourly", "hour"), ("qr_event_rollups_daily", "day")):
+        db.execute(text(f"DELETE FROM {table}"))
+        db.execute(text(f"""
+            INSERT INTO {table} (account_id, item_id, type, bucket, count)
+            SELECT e.owner_id,
+                   COALESCE(e.item_id, :no_item),
+                   e.type,
+                   date_trunc('{unit}', e.created_at),
+                   count(*)
+            FROM qr_events e
+            WHERE e.owner_id IS NOT NULL
+            GROUP BY 1, 2, 3, 4
+        """), {"no_item": NO_ITEM})
+    db.commit()
+    logger.info({"event": "rollups_backfilled"})
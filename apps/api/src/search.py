@@ -0,0 +1,28 @@
+"""Library item search: trigram-indexed and ranked on Postgres, plain ILIKE elsewhere."""
+from typing import Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Query, Session
+
+from .models import QRItem
+
+
+def trigram_search_available(db: Session) -> bool:
+    """Whether the session's database has the ``search_text`` trigram index (Postgres)."""
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def apply_item_search(db: Session, query: Query, term: str) -> Tuple[Query, Optional[object]]:
+    """Restrict ``query`` to QR items matching ``term``.
+
+    On Postgres the name, URL and text payload are matched through the
+    ``gin_trgm_ops`` index on ``search_text`` and a relevance expression
+    (trigram word similarity) is returned for ordering. Other databases
+    match the name only and return no rank.
+    """
+    if not trigram_search_available(db):
+        return query.filter(QRItem.name.ilike(f"%{term}%")), None
+
+    term = term.lower()
+    rank = func.word_similarity(term, QRItem.search_text)
+    return query.filter(QRItem.search_text.like(f"%{term}%")), rank
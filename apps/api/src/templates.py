@@ -1,22 +1,25 @@
 """Template endpoints for public gallery and admin management."""
+import os
 from typing import List, Optional
 from uuid import UUID
-import json
 import hashlib
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, UploadFile, File, Form
+from sqlalchemy.orm import Session, joinedload, selectinload
 from sqlalchemy import desc, asc
 from pydantic import BaseModel, Field
-from .database import get_db
-from .models import Template, TemplateCategory, TemplateAsset, Account
+from .database import get_db, get_read_db
+from .models import Template, TemplateCategory, TemplateAsset
 from .auth import require_auth
 from .logging_config import setup_logging
 from .storage import upload_file_to_s3, validate_upload_file
-from .cache import get_cache, set_cache, delete_cache
+from .cache import get_or_compute, versioned_cache_key, bump_cache_generation
 
 logger = setup_logging()
 
+# Seconds an expired template page is still served while one request refreshes it
+TEMPLATE_LIST_STALE_TTL = int(os.getenv("TEMPLATE_LIST_STALE_TTL", "60"))
+
 # Public router (no auth required)
 public_router = APIRouter(prefix="/templates", tags=["templates-public"])
 
@@ -110,19 +113,9 @@ class CategoryCreate(BaseModel):
 
 
 # Helper functions
-def get_user_account(db: Session, user: dict) -> Account:
-    """Get or create user account from Auth0 token."""
-    auth_sub = user.get("sub")
-    email = user.get("email", f"{auth_sub}@auth0.local")
-    
-    account = db.query(Account).filter(Account.auth_sub == auth_sub).first()
-    if not account:
-        account = Account(auth_sub=auth_sub, email=email)
-        db.add(account)
-        db.commit()
-        db.refresh(account)
-    
-    return account
+def json_response(body: str) -> Response:
+    """Return an already-serialized JSON body as-is, bypassing response-model validation."""
+    return Response(content=body, media_type="application/json")
 
 
 def check_admin_role(user: dict):
@@ -133,26 +126,17 @@ def check_admin_role(user: dict):
         raise HTTPException(status_code=403, detail="Admin access required")
 
 
-# Public endpoints (no auth required)
-@public_router.get("", response_model=TemplateListResponse)
-def list_templates(
-    page: int = Query(1, ge=1),
-    per_page: int = Query(20, ge=1, le=100),
-    sort_by: str = Query("created_at", pattern="^(name|created_at|updated_at)$"),
-    sort_order: str = Query("desc", pattern="^(asc|desc)$"),
-    category_id: Optional[UUID] = None,
-    tag: Optional[str] = None,
-    search: Optional[str] = None,
-    db: Session = Depends(get_db)
-):
-    """List published templates with pagination, filtering, and sorting (public)."""
-    # Try to get from cache
-    cache_key = f"templates:page={page}:per_page={per_page}:sort={sort_by}:{sort_order}:cat={category_id}:tag={tag}:search={search}"
-    cached = get_cache(cache_key)
-    if cached:
-        logger.info({"event": "list_templates_cache_hit", "cache_key": cache_key})
-        return json.loads(cached)
-    
+def render_template_list(
+    db: Session,
+    page: int,
+    per_page: int,
+    sort_by: str,
+    sort_order: str,
+    category_id: Optional[UUID],
+    tag: Optional[str],
+    search: Optional[str]
+) -> str:
+    """Query one page of published templates and serialize the response body."""
     # Build query - only published templates
     query = db.query(Template).filter(Template.is_published == True)
     
@@ -184,17 +168,16 @@ def list_templates(
     
     # Paginate
     offset = (page - 1) * per_page
-    templates = query.offset(offset).limit(per_page).all()
-    
-    result = {
-        "templates": templates,
-        "total": total,
-        "page": page,
-        "per_page": per_page
-    }
+    templates = query.options(
+        joinedload(Template.category), selectinload(Template.assets)
+    ).offset(offset).limit(per_page).all()
     
-    # Cache for 5 minutes
-    set_cache(cache_key, json.dumps(result, default=str), ttl=300)
+    body = TemplateListResponse(
+        templates=templates,
+        total=total,
+        page=page,
+        per_page=per_page
+    ).model_dump_json()
     
     logger.info({
         "event": "list_templates",
@@ -204,34 +187,61 @@ def list_templates(
         "cached": False
     })
     
-    return result
+    return body
+
+
+# Public endpoints (no auth required)
+@public_router.get("", response_model=TemplateListResponse)
+def list_templates(
+    page: int = Query(1, ge=1),
+    per_page: int = Query(20, ge=1, le=100),
+    sort_by: str = Query("created_at", pattern="^(name|created_at|updated_at)$"),
+    sort_order: str = Query("desc", pattern="^(asc|desc)$"),
+    category_id: Optional[UUID] = None,
+    tag: Optional[str] = None,
+    search: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """List published templates with pagination, filtering, and sorting (public).
+
+    The serialized page is cached for 5 minutes. On a miss only one request
+    renders it while concurrent ones wait for its result, and an expired
+    page keeps being served for ``TEMPLATE_LIST_STALE_TTL`` seconds while
+    it is refreshed.
+    """
+    cache_key = versioned_cache_key(
+        "templates",
+        f"page={page}:per_page={per_page}:sort={sort_by}:{sort_order}:cat={category_id}:tag={tag}:search={search}"
+    )
+    body = get_or_compute(
+        cache_key,
+        lambda: render_template_list(db, page, per_page, sort_by, sort_order, category_id, tag, search),
+        ttl=300,
+        stale_ttl=TEMPLATE_LIST_STALE_TTL,
+        raw=True
+    )
+    return json_response(body)
 
 
 @public_router.get("/categories", response_model=TemplateCategoryListResponse)
 def list_categories(db: Session = Depends(get_db)):
     """List all template categories (public)."""
-    # Try cache first
-    cache_key = "template_categories:all"
-    cached = get_cache(cache_key)
-    if cached:
-        return json.loads(cached)
-    
-    categories = db.query(TemplateCategory).order_by(TemplateCategory.name).all()
+    def render() -> str:
+        categories = db.query(TemplateCategory).order_by(TemplateCategory.name).all()
+        logger.info({"event": "list_categories", "count": len(categories)})
+        return TemplateCategoryListResponse(categories=categories).model_dump_json()
     
-    result = {"categories": categories}
-    
-    # Cache for 1 hour
-    set_cache(cache_key, json.dumps(result, default=str), ttl=3600)
-    
-    logger.info({"event": "list_categories", "count": len(categories)})
-    
-    return result
+    # Cache the serialized response for 1 hour
+    cache_key = versioned_cache_key("template_categories", "all")
+    return json_response(get_or_compute(cache_key, render, ttl=3600, raw=True))
 
 
 @public_router.get("/{template_id}", response_model=TemplateSchema)
 def get_template(template_id: UUID, db: Session = Depends(get_db)):
     """Get template by ID (public, only if published)."""
-    template = db.query(Template).filter(
+    template = db.query(Template).options(
+        joinedload(Template.category), selectinload(Template.assets)
+    ).filter(
         Template.id == template_id,
         Template.is_published == True
     ).first()
@@ -282,7 +292,9 @@ def admin_list_templates(
     
     # Paginate
     offset = (page - 1) * per_page
-    templates = query.offset(offset).limit(per_page).all()
+    templates = query.options(
+        joinedload(Template.category), selectinload(Template.assets)
+    ).offset(offset).limit(per_page).all()
     
     logger.info({
         "event": "admin_list_templates",
@@ -326,7 +338,7 @@ def admin_create_template(
     db.refresh(new_template)
     
     # Invalidate cache
-    delete_cache("templates:*")
+    bump_cache_generation("templates")
     
     logger.info({
         "event": "admin_create_template",
@@ -347,7 +359,9 @@ def admin_get_template(
     """Get template by ID (admin, includes unpublished)."""
     check_admin_role(user)
     
-    template = db.query(Template).filter(Template.id == template_id).first()
+    template = db.query(Template).options(
+        joinedload(Template.category), selectinload(Template.assets)
+    ).filter(Template.id == template_id).first()
     
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
@@ -394,7 +408,7 @@ def admin_update_template(
     db.refresh(template)
     
     # Invalidate cache
-    delete_cache("templates:*")
+    bump_cache_generation("templates")
     
     logger.info({
         "event": "admin_update_template",
@@ -423,7 +437,7 @@ def admin_delete_template(
     db.commit()
     
     # Invalidate cache
-    delete_cache("templates:*")
+    bump_cache_generation("templates")
     
     logger.info({
         "event": "admin_delete_template",
@@ -451,7 +465,7 @@ def admin_publish_template(
     db.refresh(template)
     
     # Invalidate cache
-    delete_cache("templates:*")
+    bump_cache_generation("templates")
     
     logger.info({
         "event": "admin_publish_template",
@@ -481,7 +495,7 @@ def admin_unpublish_template(
     db.refresh(template)
     
     # Invalidate cache
-    delete_cache("templates:*")
+    bump_cache_generation("templates")
     
     logger.info({
         "event": "admin_unpublish_template",
@@ -530,6 +544,9 @@ async def admin_upload_asset(
     db.commit()
     db.refresh(asset)
     
+    # Invalidate cache (listed templates embed their assets)
+    bump_cache_generation("templates")
+    
     logger.info({
         "event": "admin_upload_asset",
         "user_id": user.get("sub"),
@@ -574,7 +591,7 @@ def admin_create_category(
     db.refresh(new_category)
     
     # Invalidate cache
-    delete_cache("template_categories:*")
+    bump_cache_generation("template_categories")
     
     logger.info({
         "event": "admin_create_category",
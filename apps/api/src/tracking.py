@@ -0,0 +1,482 @@
+"""Asynchronous scan tracking: bounded in-memory buffers and batched event writes."""
+import io
+import json
+import os
+import threading
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from typing import Callable, List, Optional
+from uuid import UUID
+
+from sqlalchemy import func, insert, update, bindparam
+from sqlalchemy.orm import Session
+
+from .database import get_db_context
+from .models import QREvent, Shortlink
+from .rollups import apply_rollups, assign_event_owners, count_rollups, write_rollup_counts
+from .logging_config import setup_logging
+
+logger = setup_logging()
+
+# sync: write scan events inside the redirect request (default)
+# async: enqueue scans and let a background worker persist them in batches
+SCAN_TRACKING_MODE = os.getenv("SCAN_TRACKING_MODE", "sync")
+SCAN_BUFFER_SIZE = int(os.getenv("SCAN_BUFFER_SIZE", "10000"))
+SCAN_BATCH_SIZE = int(os.getenv("SCAN_BATCH_SIZE", "500"))
+SCAN_FLUSH_INTERVAL = float(os.getenv("SCAN_FLUSH_INTERVAL", "1.0"))
+# insert: multi-row INSERT ... VALUES; copy: COPY FROM STDIN (psycopg2 only)
+EVENT_WRITE_METHOD = os.getenv("EVENT_WRITE_METHOD", "insert")
+EVENT_INSERT_CHUNK = int(os.getenv("EVENT_INSERT_CHUNK", "1000"))
+SCAN_COUNTER_FLUSH_INTERVAL = float(os.getenv("SCAN_COUNTER_FLUSH_INTERVAL", "5.0"))
+
+EVENT_COLUMNS = ("id", "type", "user_id", "item_id", "owner_id", "meta", "ip_address", "user_agent", "created_at")
+
+
+class EventBuffer:
+    """Bounded, thread-safe FIFO buffer with drop accounting.
+
+    ``put`` never blocks the caller: when the buffer is full the item is
+    rejected and counted as dropped. Consumers wake early once the buffer
+    reaches ``flush_threshold`` so bursts are drained ahead of the timer.
+    """
+
+    def __init__(self, maxsize: int = 10000, flush_threshold: Optional[int] = None):
+        self.maxsize = maxsize
+        self.flush_threshold = flush_threshold or maxsize
+        self._items = deque()
+        self._cond = threading.Condition()
+        self.enqueued = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+        self.high_watermark = 0
+
+    def put(self, item) -> bool:
+        """Enqueue an item. Returns False (and counts a drop) if the buffer is full."""
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self.dropped += 1
+                return False
+            self._items.append(item)
+            self.enqueued += 1
+            depth = len(self._items)
+            self.high_watermark = max(self.high_watermark, depth)
+            if depth >= self.flush_threshold:
+                self._cond.notify()
+            return True
+
+    def drain(self, max_items: int, timeout: Optional[float] = None) -> list:
+        """Remove up to ``max_items`` items, waiting up to ``timeout`` for a full batch."""
+        with self._cond:
+            if len(self._items) < max_items and timeout:
+                self._cond.wait(timeout)
+            count = min(max_items, len(self._items))
+            return [self._items.popleft() for _ in range(count)]
+
+    def wake(self) -> None:
+        """Wake any consumer waiting in ``drain``."""
+        with self._cond:
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> dict:
+        """Return depth and throughput/drop counters."""
+        with self._cond:
+            return {
+                "depth": len(self._items),
+                "maxsize": self.maxsize,
+                "high_watermark": self.high_watermark,
+                "enqueued": self.enqueued,
+                "flushed": self.flushed,
+                "failed": self.failed,
+                "dropped": self.dropped,
+            }
+
+
+class BufferFlusher:
+    """Background thread that drains an ``EventBuffer`` in batches into a handler."""
+
+    def __init__(
+        self,
+        buffer: EventBuffer,
+        handler: Callable[[list], None],
+        batch_size: int = 500,
+        interval: float = 1.0,
+        name: str = "buffer-flusher"
+    ):
+        self.buffer = buffer
+        self.handler = handler
+        self.batch_size = batch_size
+        self.interval = interval
+        self.name = name
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        """Start the flusher thread (no-op if already running)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        logger.info({"event": "buffer_flusher_started", "name": self.name})
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the thread and flush whatever is still buffered."""
+        self._stop.set()
+        self.buffer.wake()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        while len(self.buffer):
+            self.flush_once()
+        logger.info({"event": "buffer_flusher_stopped", "name": self.name})
+
+    def flush_once(self, timeout: Optional[float] = None) -> int:
+        """Drain and handle a single batch. Returns the number of items handled."""
+        batch = self.buffer.drain(self.batch_size, timeout)
+        if not batch:
+            return 0
+        try:
+            self.handler(batch)
+            self.buffer.flushed += len(batch)
+        except Exception as e:
+            self.buffer.failed += len(batch)
+            logger.error({
+                "event": "buffer_flush_error",
+                "name": self.name,
+                "batch_size": len(batch),
+                "error": str(e)
+            })
+        return len(batch)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.flush_once(timeout=self.interval)
+
+
+def build_event_row(
+    event_type: str,
+    user_id: Optional[UUID] = None,
+    item_id: Optional[UUID] = None,
+    meta: dict = None,
+    ip_address: Optional[str] = None,
+    user_agent: Optional[str] = None,
+    created_at: Optional[datetime] = None,
+    owner_id: Optional[UUID] = None
+) -> dict:
+    """Build a complete ``qr_events`` row with client-side id and timestamp.
+
+    ``owner_id`` should be passed when already known (e.g. from the shortlink
+    cache); otherwise it is resolved in bulk when the row is written.
+    """
+    return {
+        "id": uuid.uuid4(),
+        "type": event_type,
+        "user_id": user_id,
+        "item_id": item_id,
+        "owner_id": owner_id,
+        "meta": meta or {},
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+        "created_at": created_at or datetime.utcnow()
+    }
+
+
+def _copy_field(value) -> str:
+    """Encode one value for ``COPY ... (FORMAT csv)``.
+
+    NULL is the unquoted empty field; every other value is quoted (embedded
+    quotes doubled), so empty strings and commas/newlines survive intact.
+    """
+    if value is None:
+        return ""
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _copy_events(db: Session, rows: List[dict]) -> None:
+    """Stream rows into qr_events with COPY FROM STDIN (CSV)."""
+    data = io.StringIO()
+    for row in rows:
+        data.write(",".join(
+            _copy_field(json.dumps(row["meta"]) if column == "meta" else row[column])
+            for column in EVENT_COLUMNS
+        ) + "\n")
+    data.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {QREvent.__tablename__} ({', '.join(EVENT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            data
+        )
+    finally:
+        cursor.close()
+
+
+def insert_events(db: Session, rows: List[dict], method: Optional[str] = None) -> int:
+    """Write event rows in the caller's transaction without per-row flush/refresh.
+
+    Uses one multi-row ``INSERT ... VALUES`` per ``EVENT_INSERT_CHUNK`` rows,
+    or ``COPY`` when ``method`` is ``"copy"`` and the driver is psycopg2.
+    Missing ``owner_id`` values are resolved first, and the analytics rollups
+    are updated in the same transaction.
+    """
+    if not rows:
+        return 0
+    assign_event_owners(db, rows)
+    method = method or EVENT_WRITE_METHOD
+    if method == "copy" and db.get_bind().dialect.driver == "psycopg2":
+        _copy_events(db, rows)
+    else:
+        for start in range(0, len(rows), EVENT_INSERT_CHUNK):
+            db.execute(insert(QREvent).values(rows[start:start + EVENT_INSERT_CHUNK]))
+    apply_rollups(db, rows)
+    return len(rows)
+
+
+class QREventBatchWriter:
+    """Buffers ``qr_events`` rows and writes each batch in a single statement.
+
+    Batches are flushed by a background thread once ``batch_size`` rows are
+    waiting or ``interval`` seconds have passed. ``on_written`` is called with
+    each batch after it has been committed.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 10000,
+        batch_size: int = 500,
+        interval: float = 1.0,
+        on_written: Optional[Callable[[List[dict]], None]] = None,
+        name: str = "event-writer"
+    ):
+        self.name = name
+        self.on_written = on_written
+        self.buffer = EventBuffer(maxsize=maxsize, flush_threshold=batch_size)
+        self.flusher = BufferFlusher(self.buffer, self.write, batch_size=batch_size, interval=interval, name=name)
+
+    def add(self, row: dict) -> bool:
+        """Queue a row built with ``build_event_row``. Returns False if it was dropped."""
+        return self.buffer.put(row)
+
+    def write(self, batch: List[dict]) -> None:
+        """Persist one batch in its own transaction."""
+        with get_db_context() as db:
+            insert_events(db, batch)
+            db.commit()
+        if self.on_written:
+            self.on_written(batch)
+        logger.info({"event": "event_batch_written", "writer": self.name, "count": len(batch)})
+
+    def start(self) -> None:
+        self.flusher.start()
+
+    def stop(self) -> None:
+        self.flusher.stop()
+
+    def stats(self) -> dict:
+        return self.buffer.stats()
+
+
+def write_scan_counts(db: Session, pending: dict) -> int:
+    """Apply accumulated ``{code: (count, last_scanned_at)}`` with one executemany UPDATE."""
+    if not pending:
+        return 0
+    shortlinks = Shortlink.__table__
+    stmt = update(shortlinks).where(shortlinks.c.code == bindparam("b_code")).values(
+        scan_count=shortlinks.c.scan_count + bindparam("b_count"),
+        last_scanned_at=func.greatest(
+            func.coalesce(shortlinks.c.last_scanned_at, bindparam("b_scanned_at")),
+            bindparam("b_scanned_at")
+        )
+    )
+    # Sorted codes keep row lock order stable across concurrent flushes
+    db.execute(stmt, [
+        {"b_code": code, "b_count": count, "b_scanned_at": scanned_at}
+        for code, (count, scanned_at) in sorted(pending.items())
+    ])
+    return len(pending)
+
+
+class ScanCounter:
+    """Per-worker accumulator of shortlink scan counts and analytics rollup increments.
+
+    Increments are coalesced in memory per code (and per rollup key and
+    bucket) and written by a background thread every ``interval`` seconds,
+    so a hot code costs about one row update per interval instead of one
+    per scan. Counts from a failed flush are merged back and retried on the
+    next one.
+    """
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self._pending = {}
+        self._hourly = Counter()
+        self._daily = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.increments = 0
+        self.rollup_events = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.failed_flushes = 0
+
+    def increment(self, code: str, scanned_at: Optional[datetime] = None, count: int = 1) -> None:
+        """Add scans for a code; ``scanned_at`` defaults to now."""
+        scanned_at = scanned_at or datetime.utcnow()
+        with self._lock:
+            pending_count, last_scanned_at = self._pending.get(code, (0, scanned_at))
+            self._pending[code] = (pending_count + count, max(last_scanned_at, scanned_at))
+            self.increments += count
+
+    def add_rollups(self, rows: List[dict]) -> None:
+        """Add committed event rows (with ``owner_id`` resolved) to the pending rollup counts."""
+        hourly, daily = count_rollups(rows)
+        with self._lock:
+            self._hourly.update(hourly)
+            self._daily.update(daily)
+            self.rollup_events += sum(daily.values())
+
+    def _merge(self, pending: dict, hourly: Counter, daily: Counter) -> None:
+        with self._lock:
+            for code, (count, scanned_at) in pending.items():
+                pending_count, last_scanned_at = self._pending.get(code, (0, scanned_at))
+                self._pending[code] = (pending_count + count, max(last_scanned_at, scanned_at))
+            self._hourly.update(hourly)
+            self._daily.update(daily)
+
+    def flush(self) -> int:
+        """Write all pending counts in one transaction. Returns the number of shortlinks updated."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            hourly, self._hourly = self._hourly, Counter()
+            daily, self._daily = self._daily, Counter()
+        if not pending and not daily:
+            return 0
+        try:
+            with get_db_context() as db:
+                written = write_scan_counts(db, pending)
+                write_rollup_counts(db, hourly, daily)
+                db.commit()
+        except Exception as e:
+            self._merge(pending, hourly, daily)
+            self.failed_flushes += 1
+            logger.error({
+                "event": "scan_counter_flush_error",
+                "codes": len(pending),
+                "rollup_keys": len(hourly) + len(daily),
+                "error": str(e)
+            })
+            return 0
+        self.flushes += 1
+        self.rows_written += written
+        return written
+
+    def start(self) -> None:
+        """Start the periodic flush thread (no-op if already running)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="scan-counter", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the thread and write any remaining counts."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending_codes": len(self._pending),
+                "pending_rollup_keys": len(self._hourly) + len(self._daily),
+                "increments": self.increments,
+                "rollup_events": self.rollup_events,
+                "flushes": self.flushes,
+                "rows_written": self.rows_written,
+                "failed_flushes": self.failed_flushes,
+            }
+
+
+scan_counter = ScanCounter(interval=SCAN_COUNTER_FLUSH_INTERVAL)
+
+
+def count_written_scans(batch: List[dict]) -> None:
+    """Feed committed scan events into the coalesced shortlink counters."""
+    for row in batch:
+        scan_counter.increment(row["meta"]["code"], row["created_at"])
+
+
+scan_writer = QREventBatchWriter(
+    maxsize=SCAN_BUFFER_SIZE,
+    batch_size=SCAN_BATCH_SIZE,
+    interval=SCAN_FLUSH_INTERVAL,
+    on_written=count_written_scans,
+    name="scan-writer"
+)
+
+
+def async_tracking_enabled() -> bool:
+    """Whether scans are buffered instead of written inside the request."""
+    return SCAN_TRACKING_MODE == "async"
+
+
+def enqueue_scan(
+    code: str,
+    item_id: UUID,
+    target_url: str,
+    ip_address: Optional[str] = None,
+    user_agent: Optional[str] = None,
+    owner_id: Optional[UUID] = None
+) -> bool:
+    """Buffer a scan for background persistence. Returns False if it was dropped."""
+    accepted = scan_writer.add(build_event_row(
+        "scan",
+        item_id=item_id,
+        owner_id=owner_id,
+        meta={"code": code, "target_url": target_url},
+        ip_address=ip_address,
+        user_agent=user_agent
+    ))
+    if not accepted and scan_writer.buffer.dropped % 1000 == 1:
+        logger.warning({
+            "event": "scan_buffer_full",
+            "code": code,
+            "dropped_total": scan_writer.buffer.dropped
+        })
+    return accepted
+
+
+def start_tracking() -> None:
+    """Start the scan counter flusher and, in async mode, background scan persistence."""
+    scan_counter.start()
+    if async_tracking_enabled():
+        scan_writer.start()
+
+
+def stop_tracking() -> None:
+    """Flush buffered scans and counters, then stop the background workers."""
+    if async_tracking_enabled():
+        scan_writer.stop()
+    scan_counter.stop()
+
+
+def get_scan_buffer_stats() -> dict:
+    """Buffer depth, throughput and drop counters for the scan pipeline."""
+    return {"mode": SCAN_TRACKING_MODE, **scan_writer.stats()}
+
+
+def get_scan_counter_stats() -> dict:
+    """Coalescing counters for shortlink scan_count updates."""
+    return scan_counter.stats()
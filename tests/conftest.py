@@ -4,3 +4,48 @@ from pathlib import Path
 # Add the root directory to Python path so tests can import apps module
 root_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(root_dir))
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+
+@compiles(JSONB, "sqlite")
+def _compile_jsonb_sqlite(type_, compiler, **kw):
+    return "JSON"
+
+
+@pytest.fixture
+def sqlite_db():
+    """In-memory SQLite session over the full schema, with a ``statements`` log of executed SQL."""
+    from apps.api.src.database import Base
+    from apps.api.src import models  # noqa
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+
+    db = sessionmaker(bind=engine, autoflush=False)()
+    db.statements = statements
+    try:
+        yield db
+    finally:
+        db.close()
+        engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def clear_local_caches():
+    """Keep per-worker caches (accounts, cache generations) from leaking between tests."""
+    from apps.api.src.accounts import account_cache
+    from apps.api.src.cache import _generation_cache
+
+    account_cache.clear()
+    _generation_cache.clear()
+    yield
+    account_cache.clear()
+    _generation_cache.clear()
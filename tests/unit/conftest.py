@@ -0,0 +1,88 @@
+"""Shared factories for unit tests that run against the ``sqlite_db`` session."""
+import pytest
+
+
+@pytest.fixture
+def make_account(sqlite_db):
+    """Factory committing an ``Account`` named ``auth0|<name>``; returns ``(account, user)``.
+
+    ``user`` is the matching token claims dict. With ``cached=True`` the
+    account is resolved once, so later calls hit the account cache instead
+    of issuing SQL.
+    """
+    from apps.api.src.accounts import resolve_account
+    from apps.api.src.models import Account
+
+    def make(name, cached=False, **fields):
+        account = Account(auth_sub=f"auth0|{name}", email=f"{name}@example.com", **fields)
+        sqlite_db.add(account)
+        sqlite_db.commit()
+        user = {"sub": account.auth_sub}
+        if cached:
+            resolve_account(sqlite_db, user)
+        return account, user
+
+    return make
+
+
+@pytest.fixture
+def make_qr_items(sqlite_db):
+    """Factory committing one URL ``QRItem`` per name for ``account``; returns the items.
+
+    Extra keyword arguments (``tags``, ``folder_id``, ...) apply to every item.
+    Items are linked by ``owner_id`` so the account is not marked dirty (which
+    would evict it from the account cache on commit).
+    """
+    from apps.api.src.models import QRItem
+
+    def make(account, names, **fields):
+        fields.setdefault("type", "url")
+        fields.setdefault("payload", {"url": "https://example.com"})
+        items = [QRItem(owner_id=account.id, name=name, **fields) for name in names]
+        sqlite_db.add_all(items)
+        sqlite_db.commit()
+        return items
+
+    return make
+
+
+@pytest.fixture
+def make_tags(sqlite_db):
+    """Factory committing ``count`` tags named ``tag-<i>`` for ``account``; returns the tags."""
+    from apps.api.src.models import Tag
+
+    def make(account, count):
+        tags = [Tag(owner_id=account.id, name=f"tag-{i}") for i in range(count)]
+        sqlite_db.add_all(tags)
+        sqlite_db.commit()
+        return tags
+
+    return make
+
+
+@pytest.fixture
+def make_templates(sqlite_db):
+    """Factory committing ``count`` published templates, each with its own category and ``assets`` assets."""
+    from apps.api.src.models import Template, TemplateCategory, TemplateAsset
+
+    def make(count=1, assets=1):
+        templates = []
+        for i in range(count):
+            template = Template(
+                name=f"Template {i}", type="url", payload_template={"url": "{{url}}"}, options_template={},
+                variables={}, tags=[f"tag-{i}"], is_published=True,
+                category=TemplateCategory(name=f"Category {i}", slug=f"category-{i}")
+            )
+            template.assets.extend(
+                TemplateAsset(
+                    asset_type="logo", file_name=f"logo-{i}-{j}.png", file_size="10", mime_type="image/png",
+                    s3_key=f"templates/{i}/{j}.png", s3_url=f"https://cdn.example.com/{i}/{j}.png"
+                )
+                for j in range(assets)
+            )
+            templates.append(template)
+        sqlite_db.add_all(templates)
+        sqlite_db.commit()
+        return templates
+
+    return make
@@ -0,0 +1,100 @@
+"""Unit tests for cached account resolution."""
+import pytest
+from fastapi import HTTPException
+from unittest.mock import patch
+
+from apps.api.src.accounts import account_cache, resolve_account, invalidate_account, _to_json
+from apps.api.src.models import Account
+
+
+class TestResolveAccount:
+    """Test account lookup through the per-worker cache, Redis and the database."""
+
+    def test_second_resolution_skips_the_database(self, sqlite_db, make_account):
+        """Test that a cached account is attached without issuing a SELECT."""
+        _, user = make_account("cached", plan="pro")
+        first = resolve_account(sqlite_db, user)
+        account_id = first.id
+        sqlite_db.expunge_all()
+
+        del sqlite_db.statements[:]
+        account = resolve_account(sqlite_db, user)
+
+        assert account.id == account_id
+        assert account.plan == "pro"
+        assert account in sqlite_db
+        assert sqlite_db.statements == []
+
+    def test_redis_entry_is_decoded(self, sqlite_db, make_account):
+        """Test that a Redis hit restores UUIDs and timestamps and warms the local cache."""
+        _, user = make_account("cached", plan="pro")
+        account = resolve_account(sqlite_db, user)
+        cached = _to_json(account_cache.get(user["sub"]))
+        account_cache.clear()
+        sqlite_db.expunge_all()
+
+        del sqlite_db.statements[:]
+        with patch("apps.api.src.accounts.get_cache", return_value=cached):
+            restored = resolve_account(sqlite_db, user)
+
+        assert restored.id == account.id
+        assert restored.created_at == account.created_at
+        assert account_cache.get(user["sub"]) is not None
+        assert sqlite_db.statements == []
+
+    def test_missing_account_is_created(self, sqlite_db):
+        """Test that a first request creates a free account once."""
+        user = {"sub": "auth0|new", "email": "new@example.com"}
+
+        account = resolve_account(sqlite_db, user)
+        account_cache.clear()
+        again = resolve_account(sqlite_db, user)
+
+        assert account.plan == "free"
+        assert again.id == account.id
+        assert sqlite_db.query(Account).count() == 1
+
+    def test_email_conflict_raises_409(self, sqlite_db, make_account):
+        """Test that a new subject with an existing email is rejected."""
+        make_account("cached")
+
+        with pytest.raises(HTTPException) as exc_info:
+            resolve_account(sqlite_db, {"sub": "auth0|other", "email": "cached@example.com"})
+
+        assert exc_info.value.status_code == 409
+
+    def test_missing_account_raises_404_without_create(self, sqlite_db):
+        """Test that lookups with create=False do not insert."""
+        with pytest.raises(HTTPException) as exc_info:
+            resolve_account(sqlite_db, {"sub": "auth0|missing"}, create=False)
+
+        assert exc_info.value.status_code == 404
+        assert sqlite_db.query(Account).count() == 0
+
+
+class TestAccountInvalidation:
+    """Test that account writes evict cached copies."""
+
+    def test_plan_change_invalidates_on_commit(self, sqlite_db):
+        """Test that updating a cached account drops it from the cache."""
+        user = {"sub": "auth0|upgrade"}
+        account = resolve_account(sqlite_db, user)
+        assert account_cache.get(user["sub"]) is not None
+
+        with patch("apps.api.src.accounts.delete_cache") as mock_delete:
+            account.plan = "pro"
+            sqlite_db.commit()
+
+        assert account_cache.get(user["sub"]) is None
+        mock_delete.assert_called_with("account:auth0|upgrade")
+        assert resolve_account(sqlite_db, user).plan == "pro"
+
+    def test_invalidate_account_clears_both_tiers(self):
+        """Test that explicit invalidation removes local and Redis entries."""
+        account_cache.set("auth0|x", {"plan": "free"})
+
+        with patch("apps.api.src.accounts.delete_cache") as mock_delete:
+            invalidate_account("auth0|x")
+
+        assert account_cache.get("auth0|x") is None
+        mock_delete.assert_called_once_with("account:auth0|x")
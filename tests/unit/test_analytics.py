@@ -1,7 +1,7 @@
 """Unit tests for analytics and event tracking endpoints."""
 import pytest
 from datetime import datetime, timedelta
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock, patch, MagicMock, AsyncMock
 from uuid import uuid4
 from fastapi.testclient import TestClient
 
@@ -58,6 +58,229 @@ class TestShortlinkRedirect:
         assert len(event_id) == 16
 
 
+class TestShortlinkResolution:
+    """Test the tiered shortlink resolution cache."""
+    
+    def setup_method(self):
+        from apps.api.src.analytics import shortlink_cache
+        shortlink_cache.clear()
+    
+    def test_db_result_is_cached_locally(self):
+        """Test that a database hit populates the local cache."""
+        from apps.api.src.analytics import resolve_shortlink
+        
+        item_id = uuid4()
+        owner_id = uuid4()
+        db = Mock()
+        db.query.return_value.join.return_value.filter.return_value.first.return_value = Mock(
+            target_url="https://example.com", qr_item_id=item_id, owner_id=owner_id
+        )
+        
+        with patch("apps.api.src.analytics.get_cache", return_value=None), \
+             patch("apps.api.src.analytics.set_cache") as mock_set:
+            first = resolve_shortlink(db, "abc123")
+            second = resolve_shortlink(db, "abc123")
+        
+        assert first == {
+            "target_url": "https://example.com",
+            "qr_item_id": str(item_id),
+            "owner_id": str(owner_id)
+        }
+        assert second == first
+        assert db.query.call_count == 1
+        mock_set.assert_called_once()
+    
+    def test_redis_hit_skips_database(self):
+        """Test that a Redis hit does not query the database."""
+        from apps.api.src.analytics import resolve_shortlink
+        
+        entry = {"target_url": "https://example.com", "qr_item_id": str(uuid4())}
+        db = Mock()
+        
+        with patch("apps.api.src.analytics.get_cache", return_value=entry):
+            assert resolve_shortlink(db, "hot") == entry
+        
+        db.query.assert_not_called()
+    
+    def test_unknown_code_returns_none(self):
+        """Test that unknown codes resolve to None and are not cached."""
+        from apps.api.src.analytics import resolve_shortlink, shortlink_cache
+        
+        db = Mock()
+        db.query.return_value.join.return_value.filter.return_value.first.return_value = None
+        
+        with patch("apps.api.src.analytics.get_cache", return_value=None):
+            assert resolve_shortlink(db, "nope") is None
+        assert shortlink_cache.stats()["size"] == 0
+    
+    def test_invalidate_drops_local_entry(self):
+        """Test that invalidation clears the local tier and Redis."""
+        from apps.api.src.analytics import invalidate_shortlinks, shortlink_cache
+        
+        shortlink_cache.set("abc", {"target_url": "x", "qr_item_id": "y"})
+        with patch("apps.api.src.analytics.delete_cache") as mock_delete:
+            invalidate_shortlinks(["abc"])
+        
+        assert shortlink_cache.get("abc") is None
+        mock_delete.assert_called_once_with("shortlink:abc")
+
+
+class TestRollups:
+    """Test incremental rollup maintenance."""
+    
+    def test_apply_rollups_aggregates_per_bucket(self):
+        """Test that events collapse into one upsert row per key and bucket."""
+        from apps.api.src import rollups
+        
+        owner_id = uuid4()
+        item_id = uuid4()
+        base = datetime(2025, 10, 27, 14, 5)
+        rows = [
+            {"type": "scan", "item_id": item_id, "owner_id": owner_id, "created_at": base},
+            {"type": "scan", "item_id": item_id, "owner_id": owner_id, "created_at": base + timedelta(minutes=30)},
+            {"type": "scan", "item_id": item_id, "owner_id": owner_id, "created_at": base + timedelta(hours=1)},
+            {"type": "create", "item_id": None, "owner_id": owner_id, "created_at": base},
+        ]
+        db = Mock()
+        
+        with patch.object(rollups, "_upsert_counts") as mock_upsert:
+            assert rollups.apply_rollups(db, rows) == 4
+        
+        hourly = mock_upsert.call_args_list[0][0][2]
+        daily = mock_upsert.call_args_list[1][0][2]
+        assert hourly[(owner_id, item_id, "scan", datetime(2025, 10, 27, 14))] == 2
+        assert hourly[(owner_id, item_id, "scan", datetime(2025, 10, 27, 15))] == 1
+        assert daily[(owner_id, item_id, "scan", datetime(2025, 10, 27))] == 3
+        assert daily[(owner_id, rollups.NO_ITEM, "create", datetime(2025, 10, 27))] == 1
+    
+    def test_apply_rollups_skips_unattributed_events(self):
+        """Test that events without an owner are not rolled up."""
+        from apps.api.src import rollups
+        
+        db = Mock()
+        rows = [{"type": "scan", "item_id": None, "owner_id": None, "created_at": datetime.utcnow()}]
+        
+        with patch.object(rollups, "_upsert_counts"):
+            assert rollups.apply_rollups(db, rows) == 0
+    
+    def test_assign_event_owners_resolves_items_in_one_query(self):
+        """Test that missing owners come from one item lookup, else the acting user."""
+        from apps.api.src.rollups import assign_event_owners
+        
+        item_a, item_b, owner, user, known = uuid4(), uuid4(), uuid4(), uuid4(), uuid4()
+        rows = [
+            {"item_id": item_a, "user_id": None, "owner_id": None},
+            {"item_id": item_b, "user_id": None, "owner_id": known},
+            {"item_id": None, "user_id": user, "owner_id": None},
+        ]
+        db = Mock()
+        db.query.return_value.filter.return_value.all.return_value = [(item_a, owner)]
+        
+        assign_event_owners(db, rows)
+        
+        assert [row["owner_id"] for row in rows] == [owner, known, user]
+        assert db.query.call_count == 1
+
+
+class TestConditionalAggregation:
+    """Test the single-scan aggregation primitive."""
+    
+    def test_window_columns_use_filter_clauses(self):
+        """Test that every window/type pair is one FILTER aggregate in one SELECT."""
+        from sqlalchemy import select
+        from sqlalchemy.dialects import postgresql
+        from apps.api.src.aggregation import window_count_columns
+        from apps.api.src.models import QREvent
+        
+        now = datetime.utcnow()
+        columns = window_count_columns(
+            QREvent.type, QREvent.created_at,
+            {"total": None, "week": now - timedelta(days=7), "month": now - timedelta(days=30)}
+        )
+        sql = str(select(*columns).compile(dialect=postgresql.dialect()))
+        
+        assert len(columns) == 9
+        assert sql.count("FILTER (WHERE") == 9
+    
+    def test_summary_from_events_is_one_aggregate_query(self):
+        """Test that the raw summary path issues a single counting query."""
+        from apps.api.src.analytics import summary_from_events
+        
+        row = Mock()
+        row._mapping = {
+            f"{window}__{event_type}": 1
+            for window in ("total", "week", "month")
+            for event_type in ("create", "export", "scan")
+        }
+        row._mapping["total__scan"] = 42
+        db = Mock()
+        db.query.return_value.filter.return_value.one.return_value = row
+        
+        now = datetime.utcnow()
+        summary = summary_from_events(db, uuid4(), now - timedelta(days=7), now - timedelta(days=30))
+        
+        assert summary.total_scans == 42
+        assert summary.creates_this_week == 1
+        # one query for all nine counts, filtered by the denormalized owner_id
+        assert db.query.call_count == 1
+
+
+class TestAsyncSessions:
+    """Test that async routes run on the non-blocking session."""
+    
+    def _client(self, db):
+        from apps.api.src.main import app
+        from apps.api.src.auth import require_auth
+        from apps.api.src.database import get_async_db, get_async_read_db
+        
+        async def override_db():
+            yield db
+        
+        app.dependency_overrides[get_async_db] = override_db
+        app.dependency_overrides[get_async_read_db] = override_db
+        app.dependency_overrides[require_auth] = lambda: {"sub": str(uuid4())}
+        return app
+    
+    def teardown_method(self):
+        from apps.api.src.main import app
+        app.dependency_overrides.clear()
+    
+    def test_summary_awaits_async_session(self):
+        """Test that the summary is computed through run_sync on the async session."""
+        from apps.api.src.analytics import AnalyticsSummary, summary_from_rollups, summary_from_events
+        
+        db = AsyncMock()
+        db.scalar.return_value = Mock(id=uuid4())
+        db.run_sync.return_value = AnalyticsSummary(total_scans=7)
+        
+        async def miss(key, compute, **kwargs):
+            return await compute()
+        
+        with patch("apps.api.src.analytics.get_or_compute_async", side_effect=miss) as mock_cache:
+            response = TestClient(self._client(db)).get("/analytics/summary")
+        
+        assert response.status_code == 200
+        assert response.json()["total_scans"] == 7
+        assert db.run_sync.await_args.args[0] in (summary_from_rollups, summary_from_events)
+        mock_cache.assert_called_once()
+    
+    def test_redirect_resolves_on_async_session(self):
+        """Test that the redirect resolves the code via run_sync and records the scan asynchronously."""
+        from apps.api.src.analytics import resolve_shortlink
+        
+        db = AsyncMock()
+        db.run_sync.return_value = {"target_url": "https://example.com", "qr_item_id": str(uuid4()), "owner_id": None}
+        
+        with patch("apps.api.src.analytics.tracking.async_tracking_enabled", return_value=True), \
+                patch("apps.api.src.analytics.tracking.enqueue_scan") as mock_enqueue:
+            response = TestClient(self._client(db)).get("/r/abc", follow_redirects=False)
+        
+        assert response.status_code == 302
+        assert response.headers["location"] == "https://example.com"
+        db.run_sync.assert_awaited_once_with(resolve_shortlink, "abc")
+        mock_enqueue.assert_called_once()
+
+
 class TestAnalyticsEndpoints:
     """Test analytics endpoint logic without database."""
     
@@ -113,3 +336,144 @@ class TestAnalyticsEndpoints:
         
         assert event.type == "scan"
         assert "code" in event.meta
+
+
+class TestEventCursors:
+    """Test keyset cursors for the events endpoint."""
+    
+    def test_cursor_round_trip(self):
+        """Test that a (created_at, id) cursor decodes to the same values."""
+        from apps.api.src.pagination import encode_cursor, decode_timestamp_cursor
+        
+        created_at = datetime(2025, 10, 27, 12, 30, 15, 123456)
+        event_id = uuid4()
+        
+        cursor = encode_cursor(created_at, event_id)
+        
+        assert "=" not in cursor
+        assert decode_timestamp_cursor(cursor) == (created_at, event_id)
+    
+    def test_malformed_cursor_rejected(self):
+        """Test that tampered cursors raise a 400."""
+        from fastapi import HTTPException
+        from apps.api.src.pagination import encode_cursor, decode_timestamp_cursor
+        
+        for cursor in ("not-base64!", encode_cursor("x"), encode_cursor("not-a-date", "not-a-uuid")):
+            with pytest.raises(HTTPException) as exc:
+                decode_timestamp_cursor(cursor)
+            assert exc.value.status_code == 400
+    
+    def test_events_endpoint_accepts_cursor(self):
+        """Test that the cursor parameter is accepted (auth still required)."""
+        from apps.api.src.main import app
+        
+        client = TestClient(app)
+        response = client.get("/analytics/events?cursor=abc&limit=10")
+        assert response.status_code == 401
+    
+    def _client(self, db, user):
+        """Serve the events endpoint from the sync ``sqlite_db`` session behind an async facade."""
+        from apps.api.src.main import app
+        from apps.api.src.auth import require_auth
+        from apps.api.src.database import get_async_read_db
+        
+        session = AsyncMock()
+        session.scalar.side_effect = db.scalar
+        session.scalars.side_effect = db.scalars
+        session.merge.side_effect = db.merge
+        
+        async def override_db():
+            yield session
+        
+        app.dependency_overrides[get_async_read_db] = override_db
+        app.dependency_overrides[require_auth] = lambda: user
+        return TestClient(app)
+    
+    def teardown_method(self):
+        from apps.api.src.main import app
+        app.dependency_overrides.clear()
+    
+    def test_cursor_pages_cover_tied_timestamps(self, sqlite_db, make_account):
+        """Test that following X-Next-Cursor visits every event once, even across tied created_at."""
+        from apps.api.src.models import QREvent
+        from apps.api.src.tracking import build_event_row
+        
+        account, user = make_account("cursor")
+        tied = datetime(2025, 10, 27, 12, 0)
+        sqlite_db.add_all(
+            QREvent(**build_event_row("scan", owner_id=account.id, created_at=tied - timedelta(minutes=i // 3)))
+            for i in range(7)
+        )
+        sqlite_db.commit()
+        expected = [str(event_id) for event_id, in sqlite_db.query(QREvent.id).all()]
+        
+        client = self._client(sqlite_db, user)
+        seen, pages, cursor = [], 0, None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            response = client.get("/analytics/events", params=params)
+            assert response.status_code == 200
+            seen.extend(event["id"] for event in response.json())
+            pages += 1
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        
+        assert pages >= 3
+        assert len(seen) == len(set(seen))
+        assert sorted(seen) == sorted(expected)
+    
+    def test_events_endpoint_rejects_malformed_cursor(self, sqlite_db, make_account):
+        """Test that a tampered cursor is a 400, not a server error."""
+        _, user = make_account("cursor")
+        
+        response = self._client(sqlite_db, user).get("/analytics/events", params={"cursor": "not-base64!"})
+        
+        assert response.status_code == 400
+
+
+class TestEventExport:
+    """Test streaming event export."""
+    
+    def _rows(self, count):
+        return [
+            (uuid4(), "scan", None, uuid4(), {"code": "abc"}, datetime(2025, 10, 27, 12, 0))
+            for _ in range(count)
+        ]
+    
+    def _stream(self, rows, export_format):
+        from apps.api.src import analytics
+        
+        db = MagicMock()
+        db.query.return_value.filter.return_value.order_by.return_value.execution_options.return_value = rows
+        with patch.object(analytics, "get_read_db_context") as mock_ctx:
+            mock_ctx.return_value.__enter__.return_value = db
+            return list(analytics.iter_event_export(uuid4(), export_format))
+    
+    def test_ndjson_export_chunks_rows(self):
+        """Test that NDJSON output is one object per line, emitted in chunks."""
+        import json
+        from apps.api.src import analytics
+        
+        chunks = self._stream(self._rows(analytics.EXPORT_CHUNK_ROWS + 1), "ndjson")
+        
+        assert len(chunks) == 2
+        lines = "".join(chunks).splitlines()
+        assert len(lines) == analytics.EXPORT_CHUNK_ROWS + 1
+        assert json.loads(lines[0])["meta"] == {"code": "abc"}
+    
+    def test_csv_export_has_header(self):
+        """Test that CSV output starts with the header row."""
+        chunks = self._stream(self._rows(2), "csv")
+        
+        lines = "".join(chunks).splitlines()
+        assert lines[0] == "id,type,user_id,item_id,meta,created_at"
+        assert len(lines) == 3
+    
+    def test_gzip_chunks_round_trip(self):
+        """Test that compressed output decompresses to the original text."""
+        import gzip
+        from apps.api.src.analytics import gzip_chunks
+        
+        data = b"".join(gzip_chunks(["a\n", "b\n"]))
+        assert gzip.decompress(data) == b"a\nb\n"
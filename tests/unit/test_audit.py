@@ -0,0 +1,84 @@
+"""Unit tests for transactional and outbox audit logging."""
+from unittest.mock import patch
+from uuid import uuid4
+
+from apps.api.src import audit
+from apps.api.src.models import Account, AuditLog, Tag
+
+
+class TestTransactionalAudit:
+    """Test that audit rows share the caller's transaction."""
+
+    def test_rows_commit_with_the_change(self, sqlite_db, make_account):
+        """Test that a staged row is written by the caller's single commit."""
+        account, _ = make_account("audit")
+
+        tag = Tag(owner_id=account.id, name="tag")
+        sqlite_db.add(tag)
+        sqlite_db.flush()
+        audit.stage_audit(sqlite_db, account.id, "create", "tag", tag.id, {"name": "tag"})
+        sqlite_db.commit()
+
+        row = sqlite_db.query(AuditLog).one()
+        assert (row.action, row.resource_id, row.extra_data) == ("create", tag.id, {"name": "tag"})
+
+    def test_rows_roll_back_with_the_change(self, sqlite_db):
+        """Test that a rolled-back change leaves no audit row behind."""
+        audit.stage_audit(sqlite_db, None, "delete", "qr_item", uuid4())
+        sqlite_db.rollback()
+
+        assert sqlite_db.query(AuditLog).count() == 0
+
+    def test_create_endpoint_commits_once(self, sqlite_db):
+        """Test that a library write and its audit entry cost one commit."""
+        from apps.api.src.library import create_tag, TagCreate
+
+        user = {"sub": "auth0|commits"}
+        with patch.object(sqlite_db, "commit", wraps=sqlite_db.commit) as mock_commit:
+            create_tag(tag=TagCreate(name="once"), user=user, db=sqlite_db)
+            writes = mock_commit.call_count
+
+        assert writes == 2  # account creation + the tag with its audit row
+        assert sqlite_db.query(AuditLog).filter(AuditLog.action == "create").count() == 1
+
+
+class TestAuditOutbox:
+    """Test that outbox mode queues rows only once the change commits."""
+
+    def test_commit_enqueues_staged_rows(self, sqlite_db):
+        """Test that rows are handed to the outbox after commit, not inserted inline."""
+        with patch.object(audit, "AUDIT_MODE", "outbox"), \
+                patch.object(audit.audit_outbox, "add") as mock_add:
+            audit.stage_audit(sqlite_db, None, "delete", "qr_item", uuid4())
+            assert not mock_add.called
+            sqlite_db.commit()
+
+        assert mock_add.call_count == 1
+        assert sqlite_db.query(AuditLog).count() == 0
+
+    def test_rollback_discards_staged_rows(self, sqlite_db):
+        """Test that rows staged by a rolled-back transaction are never queued."""
+        with patch.object(audit, "AUDIT_MODE", "outbox"), \
+                patch.object(audit.audit_outbox, "add") as mock_add:
+            sqlite_db.add(Account(auth_sub="auth0|rollback", email="rollback@example.com"))
+            sqlite_db.flush()
+            audit.stage_audit(sqlite_db, None, "delete", "qr_item", uuid4())
+            sqlite_db.rollback()
+            sqlite_db.commit()
+
+        assert not mock_add.called
+
+    def test_batch_is_written_in_one_insert(self, sqlite_db):
+        """Test that the outbox writer inserts a whole batch with a single statement."""
+        outbox = audit.AuditOutbox(maxsize=10, batch_size=10)
+        for _ in range(3):
+            outbox.add(audit.audit_row(None, "export", "qr_item", uuid4()))
+
+        del sqlite_db.statements[:]
+        with patch("apps.api.src.audit.get_db_context") as mock_context:
+            mock_context.return_value.__enter__.return_value = sqlite_db
+            assert outbox.flusher.flush_once() == 3
+
+        assert sqlite_db.query(AuditLog).count() == 3
+        assert sum(statement.startswith("INSERT") for statement in sqlite_db.statements) == 1
+        assert outbox.stats()["flushed"] == 3
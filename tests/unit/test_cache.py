@@ -0,0 +1,240 @@
+"""Unit tests for cache utilities."""
+import pytest
+from unittest.mock import Mock, patch
+
+from apps.api.src.cache import LocalTTLCache
+
+
+class TestLocalTTLCache:
+    """Test the in-process LRU/TTL cache."""
+    
+    def test_get_returns_cached_value(self):
+        """Test that stored values are returned and counted as hits."""
+        cache = LocalTTLCache(maxsize=10, ttl=60)
+        cache.set("a", {"x": 1})
+        
+        assert cache.get("a") == {"x": 1}
+        assert cache.get("missing") is None
+        assert cache.hits == 1
+        assert cache.misses == 1
+    
+    def test_evicts_least_recently_used(self):
+        """Test that the oldest unused entry is evicted when full."""
+        cache = LocalTTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+        assert cache.stats()["evictions"] == 1
+    
+    def test_entries_expire(self):
+        """Test that entries older than the TTL are treated as missing."""
+        cache = LocalTTLCache(maxsize=10, ttl=5)
+        with patch("apps.api.src.cache.time.monotonic", return_value=100.0):
+            cache.set("a", 1)
+        with patch("apps.api.src.cache.time.monotonic", return_value=106.0):
+            assert cache.get("a") is None
+        assert cache.stats()["size"] == 0
+    
+    def test_delete(self):
+        """Test that delete removes the entry."""
+        cache = LocalTTLCache()
+        cache.set("a", 1)
+        
+        assert cache.delete("a") is True
+        assert cache.delete("a") is False
+        assert cache.get("a") is None
+
+
+class TestCacheGenerations:
+    """Test generation-namespaced cache keys."""
+    
+    def test_key_embeds_current_generation(self):
+        """Test that keys are built from the namespace's generation counter."""
+        from apps.api.src.cache import versioned_cache_key
+        
+        client = Mock()
+        client.get.return_value = "7"
+        with patch("apps.api.src.cache.get_redis_client", return_value=client):
+            assert versioned_cache_key("templates", "page=1") == "templates:v7:page=1"
+        client.get.assert_called_once_with("cachegen:templates")
+    
+    def test_bump_is_a_single_incr(self):
+        """Test that invalidation increments the counter without scanning keys."""
+        from apps.api.src.cache import bump_cache_generation
+        
+        client = Mock()
+        client.incr.return_value = 8
+        with patch("apps.api.src.cache.get_redis_client", return_value=client):
+            assert bump_cache_generation("templates") == 8
+        client.incr.assert_called_once_with("cachegen:templates")
+        client.scan_iter.assert_not_called()
+    
+    def test_generation_defaults_without_redis(self):
+        """Test that a missing Redis yields generation 0 and a no-op bump."""
+        from apps.api.src.cache import versioned_cache_key, bump_cache_generation
+        
+        with patch("apps.api.src.cache.get_redis_client", return_value=None):
+            assert versioned_cache_key("templates", "all") == "templates:v0:all"
+            assert bump_cache_generation("templates") is None
+    
+    def test_generation_is_reused_within_ttl(self):
+        """Test that repeated key builds read the generation from Redis once per TTL."""
+        from apps.api.src import cache
+        
+        client = Mock()
+        client.get.return_value = "3"
+        with patch("apps.api.src.cache.get_redis_client", return_value=client):
+            assert cache.versioned_cache_key("templates", "a") == "templates:v3:a"
+            assert cache.versioned_cache_key("templates", "b") == "templates:v3:b"
+            assert client.get.call_count == 1
+            
+            cache._generation_cache.clear()  # TTL elapsed
+            client.get.return_value = "4"
+            assert cache.versioned_cache_key("templates", "a") == "templates:v4:a"
+    
+    def test_bump_updates_local_generation(self):
+        """Test that the bumping worker sees its new generation immediately."""
+        from apps.api.src.cache import versioned_cache_key, bump_cache_generation
+        
+        client = Mock()
+        client.get.return_value = "3"
+        client.incr.return_value = 4
+        with patch("apps.api.src.cache.get_redis_client", return_value=client):
+            versioned_cache_key("templates", "a")
+            bump_cache_generation("templates")
+            assert versioned_cache_key("templates", "a") == "templates:v4:a"
+        assert client.get.call_count == 1
+
+
+class TestSingleFlight:
+    """Test cache-miss coalescing and stale-while-revalidate."""
+    
+    def _client(self, value=None, fresh=None, lock=True):
+        client = Mock()
+        client.mget.return_value = [value, fresh]
+        client.set.return_value = lock
+        return client
+    
+    def test_fresh_hit_skips_compute(self):
+        """Test that a fresh entry is returned without computing or locking."""
+        from apps.api.src.cache import get_or_compute
+        
+        client = self._client('{"a": 1}', "1")
+        compute = Mock()
+        with patch("apps.api.src.cache.get_redis_client", return_value=client):
+            assert get_or_compute("k", compute) == {"a": 1}
+        compute.assert_not_called()
+        client.set.assert_not_called()
+    
+    def test_miss_computes_once_under_lock(self):
+        """Test that the lock holder computes, stores value and marker, then releases."""
+        from apps.api.src.cache import get_or_compute
+        
+        client = self._client()
+        compute = Mock(return_value="body")
+        with patch("apps.api.src.cache.get_redis_client", return_value=client):
+            assert get_or_compute("k", compute, ttl=300, stale_ttl=60, raw=True) == "body"
+        
+        compute.assert_called_once()
+        assert client.set.call_args.kwargs["nx"] is True
+        pipe = client.pipeline.return_value
+        pipe.set.assert_any_call("k", "body", ex=360)
+        pipe.set.assert_any_call("k:fresh", 1, ex=300)
+        client.eval.assert_called_once()
+    
+    def test_waiter_uses_the_lock_holders_result(self):
+        """Test that a miss without the lock polls for the value instead of computing."""
+        from apps.api.src.cache import get_or_compute
+        
+        client = self._client(lock=False)
+        client.mget.side_effect = [[None, None], [None, None], ["body", "1"]]
+        compute = Mock()
+        with patch("apps.api.src.cache.get_redis_client", return_value=client), \
+                patch("apps.api.src.cache.CACHE_LOCK_POLL", 0):
+            assert get_or_compute("k", compute, raw=True) == "body"
+        compute.assert_not_called()
+    
+    def test_stale_value_served_while_another_refreshes(self):
+        """Test that an expired entry is returned as-is when the refresh lock is taken."""
+        from apps.api.src.cache import get_or_compute
+        
+        client = self._client("old", None, lock=False)
+        compute = Mock()
+        with patch("apps.api.src.cache.get_redis_client", return_value=client):
+            assert get_or_compute("k", compute, stale_ttl=60, raw=True) == "old"
+        compute.assert_not_called()
+    
+    def test_async_miss_computes(self):
+        """Test that the async variant awaits compute on a miss."""
+        import asyncio
+        from apps.api.src.cache import get_or_compute_async
+        
+        async def compute():
+            return {"total": 3}
+        
+        client = self._client()
+        with patch("apps.api.src.cache.get_redis_client", return_value=client):
+            assert asyncio.run(get_or_compute_async("k", compute)) == {"total": 3}
+        client.pipeline.return_value.set.assert_any_call("k", '{"total": 3}', ex=300)
+    
+    def test_async_redis_calls_run_off_the_event_loop(self):
+        """Test that the async variant does not block the loop on synchronous Redis calls."""
+        import asyncio
+        import threading
+        from apps.api.src.cache import get_or_compute_async
+        
+        async def compute():
+            return {"total": 3}
+        
+        client = self._client()
+        threads = []
+        
+        def on_thread(result):
+            def call(*args, **kwargs):
+                threads.append(threading.current_thread())
+                return result
+            return call
+        
+        client.mget.side_effect = on_thread([None, None])
+        client.set.side_effect = on_thread(True)
+        client.eval.side_effect = on_thread(1)
+        client.pipeline.side_effect = on_thread(client.pipeline.return_value)
+        
+        with patch("apps.api.src.cache.get_redis_client", return_value=client):
+            asyncio.run(get_or_compute_async("k", compute))
+        
+        assert len(threads) == 5  # read, re-read, lock, write, release
+        assert threading.main_thread() not in threads
+    
+    def test_no_redis_computes_directly(self):
+        """Test that caching degrades to plain computation without Redis."""
+        from apps.api.src.cache import get_or_compute
+        
+        with patch("apps.api.src.cache.get_redis_client", return_value=None):
+            assert get_or_compute("k", lambda: 5) == 5
+    
+    def test_counters_are_exact_under_threads(self):
+        """Test that concurrent request threads do not lose counter increments."""
+        import threading
+        from apps.api.src.cache import get_or_compute, get_single_flight_stats
+        
+        client = self._client('"v"', "1")
+        before = get_single_flight_stats()["hits"]
+        
+        def hit():
+            for _ in range(500):
+                get_or_compute("k", Mock())
+        
+        with patch("apps.api.src.cache.get_redis_client", return_value=client):
+            threads = [threading.Thread(target=hit) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        
+        assert get_single_flight_stats()["hits"] - before == 4000
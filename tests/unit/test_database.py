@@ -0,0 +1,173 @@
+"""Unit tests for database engine configuration."""
+import sqlite3
+import pytest
+from unittest.mock import Mock, patch
+from sqlalchemy import select, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool
+
+from apps.api.src import database
+from apps.api.src.database import InstrumentedQueuePool, ReplicaSet, RoutingSession, pool_options, pool_stats
+from apps.api.src.models import Account
+
+
+class TestConnectionPool:
+    """Test pool configuration and telemetry."""
+    
+    def _pool(self, **kwargs):
+        return InstrumentedQueuePool(lambda: sqlite3.connect(":memory:"), **kwargs)
+    
+    def test_stats_track_checked_out_connections(self):
+        """Test that occupancy and checkout counts are reported."""
+        pool = self._pool(pool_size=2, max_overflow=1)
+        first = pool.connect()
+        second = pool.connect()
+        
+        stats = pool_stats(pool)
+        assert stats["checked_out"] == 2
+        assert stats["checkouts"] == 2
+        assert stats["overflow"] == 0
+        
+        first.close()
+        second.close()
+        assert pool_stats(pool)["checked_out"] == 0
+    
+    def test_exhausted_pool_counts_timeouts(self):
+        """Test that checkouts that time out are counted with their wait."""
+        pool = self._pool(pool_size=1, max_overflow=0, timeout=0.05)
+        held = pool.connect()
+        
+        with pytest.raises(PoolTimeoutError):
+            pool.connect()
+        
+        stats = pool_stats(pool)
+        assert stats["timeouts"] == 1
+        assert stats["max_wait_ms"] >= 50
+        held.close()
+    
+    def test_queue_mode_options(self):
+        """Test that queue mode passes the configured pool parameters."""
+        options = pool_options()
+        
+        assert options["poolclass"] is InstrumentedQueuePool
+        assert options["pool_size"] == database.DB_POOL_SIZE
+        assert options["pool_pre_ping"] == database.DB_POOL_PRE_PING
+    
+    def test_null_mode_for_pgbouncer(self):
+        """Test that null mode disables pooling and asyncpg statement caching."""
+        with patch.object(database, "DB_POOL_MODE", "null"):
+            assert pool_options() == {"poolclass": NullPool}
+            assert pool_options(is_async=True)["connect_args"] == {"statement_cache_size": 0}
+        
+        assert pool_stats(NullPool(lambda: sqlite3.connect(":memory:"))) == {"mode": "null"}
+
+
+class TestReplicaRouting:
+    """Test read-replica selection and session routing."""
+    
+    def _session(self, replica, read_only=True):
+        session = RoutingSession(info={"read_only": read_only})
+        session.primary = "primary"
+        session.replica_set = Mock(choose=Mock(return_value=replica))
+        return session
+    
+    def test_read_only_selects_use_replica(self):
+        """Test that SELECTs on a read-only session go to a replica."""
+        session = self._session("replica")
+        
+        assert session.get_bind(clause=select(Account)) == "replica"
+        assert session.get_bind(clause=text("SELECT 1")) == "primary"
+    
+    def test_writes_and_regular_sessions_use_primary(self):
+        """Test that non-read-only sessions and pinned sessions stay on the primary."""
+        assert self._session("replica", read_only=False).get_bind(clause=select(Account)) == "primary"
+        
+        session = self._session("replica")
+        session.info["pinned_primary"] = True
+        assert session.get_bind(clause=select(Account)) == "primary"
+    
+    def test_no_healthy_replica_falls_back(self):
+        """Test that the primary serves reads when no replica is eligible."""
+        assert self._session(None).get_bind(clause=select(Account)) == "primary"
+    
+    def test_session_reuses_its_first_replica(self):
+        """Test that all reads of one session go to the replica picked for the first one."""
+        session = self._session("replica-a")
+        session.replica_set.choose.side_effect = ["replica-a", "replica-b"]
+        
+        assert session.get_bind(clause=select(Account)) == "replica-a"
+        assert session.get_bind(clause=select(Account)) == "replica-a"
+        session.replica_set.choose.assert_called_once()
+    
+    def test_unhealthy_session_replica_moves_to_primary(self):
+        """Test that a session whose replica turns unhealthy finishes on the primary."""
+        session = self._session("replica")
+        assert session.get_bind(clause=select(Account)) == "replica"
+        
+        session.replica_set.healthy.return_value = False
+        assert session.get_bind(clause=select(Account)) == "primary"
+        session.replica_set.healthy.return_value = True
+        assert session.get_bind(clause=select(Account)) == "primary"
+        session.replica_set.choose.assert_called_once()
+    
+    def test_lagging_and_unreachable_replicas_are_skipped(self):
+        """Test lag-aware replica choice with a fallback counter."""
+        replicas = ReplicaSet(["lagging", "down", "healthy"], max_lag=5, check_interval=60)
+        lags = {"lagging": 30.0, "healthy": 0.5}
+        
+        def measure(replica):
+            if replica == "down":
+                raise ConnectionError("refused")
+            return lags[replica]
+        
+        with patch.object(replicas, "measure_lag", side_effect=measure) as mock_measure:
+            replicas.refresh()
+            assert replicas.choose() == "healthy"
+            assert replicas.choose() == "healthy"
+            # Choosing only reads the monitor's last measurements
+            assert mock_measure.call_count == 3
+            
+            lags["healthy"] = 10.0
+            replicas.refresh()
+            assert replicas.choose() is None
+        
+        assert replicas.stats()["fallbacks"] == 1
+    
+    def test_unmeasured_or_stale_health_uses_primary(self):
+        """Test that replicas are skipped until measured and once measurements go stale."""
+        replicas = ReplicaSet(["replica"], max_lag=5, check_interval=10)
+        assert replicas.choose() is None
+        
+        with patch.object(replicas, "measure_lag", return_value=0.1):
+            replicas.refresh()
+        assert replicas.choose() == "replica"
+        
+        with patch("apps.api.src.database.time.monotonic", return_value=replicas._health[0][0] + 31):
+            assert replicas.choose() is None
+    
+    def test_monitor_measures_in_the_background(self):
+        """Test that the monitor thread refreshes lag and stops cleanly."""
+        replicas = ReplicaSet(["replica"], check_interval=60)
+        
+        with patch.object(replicas, "measure_lag", return_value=0.2) as mock_measure:
+            replicas.start()
+            replicas.stop()
+        
+        mock_measure.assert_called_with("replica")
+        assert replicas.healthy("replica")
+    
+    def test_async_set_reads_the_sync_monitor(self):
+        """Test that an async set reuses the sync set's measurements instead of probing again."""
+        replicas = ReplicaSet(["sync-a", "sync-b"], max_lag=5, check_interval=60)
+        async_replicas = ReplicaSet(["async-a", "async-b"], max_lag=5, check_interval=60, monitor=replicas)
+        
+        with patch.object(replicas, "measure_lag", side_effect=[0.1, 30.0]), \
+                patch.object(async_replicas, "measure_lag") as mock_async_measure:
+            async_replicas.start()
+            replicas.refresh()
+        
+        assert async_replicas._thread is None
+        mock_async_measure.assert_not_called()
+        assert async_replicas.healthy("async-a")
+        assert not async_replicas.healthy("async-b")
+        assert async_replicas.stats()["lag_seconds"] == {"0": 0.1, "1": 30.0}
@@ -1,5 +1,6 @@
 """Unit tests for library endpoints."""
 import pytest
+from datetime import datetime
 from uuid import uuid4
 from fastapi.testclient import TestClient
 from apps.api.src.main import app
@@ -145,3 +146,484 @@ class TestAPIRoutes:
         assert "/library/folders/{folder_id}" in routes
         assert "/library/tags" in routes
 
+
+
+class TestQRItemQueryCount:
+    """Test that QR item responses load tags in batches, not per item."""
+    
+    @pytest.fixture
+    def seed(self, make_account, make_tags, make_qr_items):
+        """Commit ``count`` items with three tags each; measured calls all hit the account cache."""
+        def seed(count):
+            account, user = make_account("query-count", cached=True)
+            make_qr_items(account, [f"item-{i}" for i in range(count)], tags=make_tags(account, 3))
+            return user
+        return seed
+    
+    def _list_queries(self, db, per_page):
+        from apps.api.src.library import list_qr_items, QRItemListResponse
+        
+        user = {"sub": "auth0|query-count"}
+        db.expunge_all()
+        del db.statements[:]
+        response = list_qr_items(
+            page=1, per_page=per_page, sort_by="created_at", sort_order="desc",
+            folder_id=None, tag_id=None, search=None, deleted=False,
+            cursor=None, count="exact", user=user, db=db
+        )
+        page = QRItemListResponse.model_validate(response)
+        assert len(page.items) == per_page
+        assert all(len(item.tags) == 3 for item in page.items)
+        return len(db.statements)
+    
+    def test_list_page_costs_constant_queries(self, sqlite_db, seed):
+        """Test that a page of 50 items costs as many queries as a page of 2."""
+        seed(50)
+        
+        small = self._list_queries(sqlite_db, 2)
+        large = self._list_queries(sqlite_db, 50)
+        
+        assert small == large
+    
+    def test_get_item_loads_tags_eagerly(self, sqlite_db, seed):
+        """Test that fetching a single item loads its tags in the same round of queries."""
+        from apps.api.src.library import get_qr_item, QRItemSchema
+        from apps.api.src.models import QRItem
+        
+        user = seed(1)
+        item_id = sqlite_db.query(QRItem.id).scalar()
+        sqlite_db.expunge_all()
+        del sqlite_db.statements[:]
+        
+        item = get_qr_item(item_id=item_id, user=user, db=sqlite_db)
+        queries = len(sqlite_db.statements)
+        
+        assert len(QRItemSchema.model_validate(item).tags) == 3
+        assert len(sqlite_db.statements) == queries
+
+
+class TestQRItemSearch:
+    """Test library search backends."""
+    
+    @pytest.fixture
+    def user(self, make_account, make_qr_items):
+        account, user = make_account("search")
+        make_qr_items(account, ["Spring Menu"], payload={"url": "https://cafe.example.com/menu"})
+        make_qr_items(account, ["Wifi"], type="text", payload={"text": "guest network menu"})
+        make_qr_items(account, ["Flyer"], payload={"url": "https://example.com/flyer"})
+        return user
+    
+    def test_search_text_covers_name_and_payload(self, sqlite_db, user):
+        """Test that the generated search column indexes name, URL and text payloads."""
+        from apps.api.src.models import QRItem
+        
+        values = {name: text for name, text in sqlite_db.query(QRItem.name, QRItem.search_text)}
+        
+        assert values["Spring Menu"] == "spring menu https://cafe.example.com/menu "
+        assert values["Wifi"] == "wifi  guest network menu"
+    
+    def test_fallback_matches_name_only(self, sqlite_db, user):
+        """Test that non-Postgres databases keep the name ILIKE behaviour."""
+        from apps.api.src.library import list_qr_items
+        
+        result = list_qr_items(
+            page=1, per_page=20, sort_by=None, sort_order="desc",
+            folder_id=None, tag_id=None, search="MENU", deleted=False,
+            cursor=None, count="exact", user=user, db=sqlite_db
+        )
+        
+        assert [item.name for item in result["items"]] == ["Spring Menu"]
+    
+    def test_postgres_search_uses_trigram_column_and_rank(self):
+        """Test that Postgres searches filter on search_text and rank by word similarity."""
+        from unittest.mock import Mock
+        from sqlalchemy.dialects import postgresql
+        from sqlalchemy import desc
+        from sqlalchemy.orm import Query
+        from apps.api.src.models import QRItem
+        from apps.api.src.search import apply_item_search
+        
+        db = Mock()
+        db.get_bind.return_value.dialect.name = "postgresql"
+        query, rank = apply_item_search(db, Query(QRItem), "Menu")
+        
+        sql = str(query.order_by(desc(rank)).statement.compile(dialect=postgresql.dialect()))
+        assert "qr_items.search_text LIKE" in sql
+        assert "word_similarity" in sql
+
+
+class TestQRItemKeysetPagination:
+    """Test cursor pagination and count modes for the QR item listing."""
+    
+    @pytest.fixture
+    def seed(self, make_account, make_qr_items):
+        """Commit ``count`` items whose names repeat every three (duplicate sort values)."""
+        def seed(count):
+            account, user = make_account("keyset")
+            make_qr_items(account, [f"item-{i % 3}" for i in range(count)])
+            return user
+        return seed
+    
+    def _list(self, db, user, **params):
+        from apps.api.src.library import list_qr_items
+        
+        defaults = dict(
+            page=1, per_page=4, sort_by="name", sort_order="asc", folder_id=None, tag_id=None,
+            search=None, deleted=False, cursor=None, count="exact"
+        )
+        defaults.update(params)
+        return list_qr_items(user=user, db=db, **defaults)
+    
+    def test_cursor_walks_every_item_once(self, sqlite_db, seed):
+        """Test that following next_cursor visits all rows in order despite duplicate sort values."""
+        user = seed(10)
+        
+        seen, cursor = [], None
+        for _ in range(5):
+            page = self._list(sqlite_db, user, cursor=cursor, count="none")
+            seen.extend(page["items"])
+            cursor = page["next_cursor"]
+            assert page["total"] is None
+            if cursor is None:
+                break
+        
+        assert len({item.id for item in seen}) == 10
+        assert [item.name for item in seen] == sorted(item.name for item in seen)
+    
+    def test_offset_and_cursor_pages_agree(self, sqlite_db, seed):
+        """Test that the cursor page equals the offset page it replaces."""
+        user = seed(10)
+        
+        first = self._list(sqlite_db, user, sort_order="desc")
+        by_cursor = self._list(sqlite_db, user, sort_order="desc", cursor=first["next_cursor"])
+        by_offset = self._list(sqlite_db, user, sort_order="desc", page=2)
+        
+        assert [item.id for item in by_cursor["items"]] == [item.id for item in by_offset["items"]]
+        assert first["total"] == 10
+    
+    def test_estimate_falls_back_to_exact_count(self, sqlite_db, seed):
+        """Test that count=estimate returns an exact count off Postgres."""
+        user = seed(5)
+        
+        assert self._list(sqlite_db, user, count="estimate")["total"] == 5
+    
+    def test_cursor_for_other_sort_rejected(self, sqlite_db, seed):
+        """Test that a cursor cannot be replayed under a different ordering."""
+        from fastapi import HTTPException
+        
+        user = seed(5)
+        cursor = self._list(sqlite_db, user)["next_cursor"]
+        
+        with pytest.raises(HTTPException) as exc:
+            self._list(sqlite_db, user, sort_by="type", cursor=cursor)
+        assert exc.value.status_code == 400
+
+
+class TestQRItemBulk:
+    """Test the bulk create/update/delete endpoint."""
+    
+    @pytest.fixture
+    def owner(self, make_account, make_tags):
+        """Claims and tag ids of a cached account, so measured calls skip account SQL."""
+        account, user = make_account("bulk", cached=True)
+        return user, [tag.id for tag in make_tags(account, 2)]
+    
+    def _create_request(self, count, tag_ids):
+        from apps.api.src.library import QRItemBulkRequest
+        
+        return QRItemBulkRequest(create=[
+            {"name": f"item-{i}", "type": "url", "payload": {"url": f"https://example.com/{i}"}, "tag_ids": tag_ids + [uuid4()]}
+            for i in range(count)
+        ])
+    
+    def test_bulk_create_writes_items_links_and_audit(self, sqlite_db, owner):
+        """Test that creates insert items, owned tag links and audit rows."""
+        from apps.api.src.library import bulk_qr_items
+        from apps.api.src.models import QRItem, QRItemTag, AuditLog
+        
+        user, tag_ids = owner
+        response = bulk_qr_items(request=self._create_request(3, tag_ids), user=user, db=sqlite_db)
+        
+        assert response.created == 3
+        assert [result.status for result in response.results] == ["created"] * 3
+        assert sqlite_db.query(QRItem).count() == 3
+        assert sqlite_db.query(QRItemTag).count() == 6
+        assert sqlite_db.query(AuditLog).filter(AuditLog.action == "create").count() == 3
+    
+    def test_bulk_statement_count_is_independent_of_size(self, sqlite_db, owner):
+        """Test that 40 creates cost the same number of statements as 2."""
+        from apps.api.src.library import bulk_qr_items
+        
+        user, tag_ids = owner
+        
+        del sqlite_db.statements[:]
+        bulk_qr_items(request=self._create_request(2, tag_ids), user=user, db=sqlite_db)
+        small = len(sqlite_db.statements)
+        
+        del sqlite_db.statements[:]
+        bulk_qr_items(request=self._create_request(40, tag_ids), user=user, db=sqlite_db)
+        
+        assert len(sqlite_db.statements) == small
+    
+    def test_bulk_update_and_delete_report_per_item(self, sqlite_db, owner):
+        """Test mixed updates and deletes, including unknown ids."""
+        from apps.api.src.library import bulk_qr_items, QRItemBulkRequest
+        from apps.api.src.models import QRItem, QRItemTag
+        
+        user, tag_ids = owner
+        created = bulk_qr_items(request=self._create_request(2, tag_ids), user=user, db=sqlite_db)
+        first, second = [result.id for result in created.results]
+        missing = uuid4()
+        
+        response = bulk_qr_items(request=QRItemBulkRequest(
+            update=[{"id": first, "name": "renamed", "tag_ids": tag_ids[:1]}, {"id": missing, "name": "x"}],
+            delete=[second, missing]
+        ), user=user, db=sqlite_db)
+        
+        assert [(result.op, result.status) for result in response.results] == [
+            ("update", "updated"), ("update", "not_found"), ("delete", "deleted"), ("delete", "not_found")
+        ]
+        assert (response.updated, response.deleted, response.failed) == (1, 1, 2)
+        sqlite_db.expire_all()
+        assert sqlite_db.get(QRItem, first).name == "renamed"
+        assert sqlite_db.get(QRItem, second).deleted_at is not None
+        assert sqlite_db.query(QRItemTag).filter(QRItemTag.qr_item_id == first).count() == 1
+    
+    def test_bulk_limit_enforced(self):
+        """Test that oversized requests are rejected before touching the database."""
+        from fastapi import HTTPException
+        from unittest.mock import Mock, patch
+        from apps.api.src.library import bulk_qr_items, QRItemBulkRequest
+        
+        with patch("apps.api.src.library.BULK_MAX_ITEMS", 1):
+            with pytest.raises(HTTPException) as exc:
+                bulk_qr_items(request=QRItemBulkRequest(delete=[uuid4(), uuid4()]), user={"sub": "x"}, db=Mock())
+        assert exc.value.status_code == 400
+
+
+class TestTagSync:
+    """Test tag-set diffing for QR items."""
+    
+    @pytest.fixture
+    def tagged_item(self, make_account, make_tags, make_qr_items):
+        """An item carrying the first two of four tags: ``(account, item, tag_ids)``."""
+        account, _ = make_account("tags")
+        tags = make_tags(account, 4)
+        item, = make_qr_items(account, ["item"], tags=tags[:2])
+        return account, item, [tag.id for tag in tags]
+    
+    def _links(self, db, item_id):
+        from apps.api.src.models import QRItemTag
+        
+        return {tag_id for (tag_id,) in db.query(QRItemTag.tag_id).filter(QRItemTag.qr_item_id == item_id)}
+    
+    def test_only_changed_links_are_written(self, sqlite_db, tagged_item):
+        """Test that a retag inserts added links and deletes removed ones in one statement each."""
+        from apps.api.src.library import sync_item_tags
+        
+        account, item, tag_ids = tagged_item
+        account_id, item_id = account.id, item.id
+        del sqlite_db.statements[:]
+        
+        added, removed = sync_item_tags(sqlite_db, account_id, {item_id: [tag_ids[1], tag_ids[2], uuid4()]})
+        
+        assert (added, removed) == (1, 1)
+        assert len(sqlite_db.statements) == 4  # resolve tags, read links, insert, delete
+        assert self._links(sqlite_db, item_id) == {tag_ids[1], tag_ids[2]}
+    
+    def test_unchanged_tags_write_nothing(self, sqlite_db, tagged_item):
+        """Test that re-sending the current tags issues no writes."""
+        from apps.api.src.library import sync_item_tags
+        
+        account, item, tag_ids = tagged_item
+        account_id, item_id = account.id, item.id
+        del sqlite_db.statements[:]
+        
+        assert sync_item_tags(sqlite_db, account_id, {item_id: tag_ids[:2]}) == (0, 0)
+        assert not any(statement.startswith(("INSERT", "DELETE")) for statement in sqlite_db.statements)
+    
+    def test_update_handler_applies_diff(self, sqlite_db, tagged_item):
+        """Test that update_qr_item replaces tags through the diff."""
+        from apps.api.src.library import update_qr_item, QRItemUpdate, QRItemSchema
+        
+        account, item, tag_ids = tagged_item
+        
+        updated = update_qr_item(
+            item_id=item.id, item_update=QRItemUpdate(tag_ids=tag_ids[2:]),
+            user={"sub": account.auth_sub}, db=sqlite_db
+        )
+        
+        assert {tag.id for tag in QRItemSchema.model_validate(updated).tags} == set(tag_ids[2:])
+
+
+class TestFolderTree:
+    """Test the nested folder tree and materialized folder paths."""
+    
+    @pytest.fixture
+    def folders(self, sqlite_db, make_account, make_qr_items):
+        """docs/reports/archive and media with 1/2/3 and 1 live items: ``(user, ids)``."""
+        from apps.api.src.library import create_folder, FolderCreate
+        
+        account, user = make_account("tree")
+        
+        def folder(name, parent=None):
+            return create_folder(folder=FolderCreate(name=name, parent_id=parent), user=user, db=sqlite_db).id
+        
+        docs = folder("docs")
+        reports = folder("reports", docs)
+        archive = folder("archive", reports)
+        media = folder("media")
+        for folder_id, count in ((docs, 1), (reports, 2), (archive, 3), (media, 1)):
+            make_qr_items(account, [f"item-{i}" for i in range(count)], folder_id=folder_id)
+        make_qr_items(account, ["gone"], folder_id=archive, deleted_at=datetime.utcnow())
+        return user, {"docs": docs, "reports": reports, "archive": archive, "media": media}
+    
+    def _tree(self, db, user, root_id=None, max_depth=32):
+        from apps.api.src.library import get_folder_tree, FolderTreeResponse
+        
+        return FolderTreeResponse.model_validate(get_folder_tree(root_id=root_id, max_depth=max_depth, user=user, db=db)).folders
+    
+    def test_tree_nests_folders_with_subtree_counts(self, sqlite_db, folders):
+        """Test that the full tree nests children and rolls item counts up to ancestors."""
+        user, ids = folders
+        
+        del sqlite_db.statements[:]
+        roots = self._tree(sqlite_db, user)
+        
+        assert len(sqlite_db.statements) == 1
+        assert [node.name for node in roots] == ["docs", "media"]
+        docs = roots[0]
+        reports = docs.children[0]
+        assert (docs.item_count, docs.subtree_item_count) == (1, 6)
+        assert (reports.item_count, reports.subtree_item_count) == (2, 5)
+        assert reports.children[0].id == ids["archive"]
+        assert reports.children[0].subtree_item_count == 3
+    
+    def test_subtree_uses_path_prefix(self, sqlite_db, folders):
+        """Test that a backfilled subtree is read by path prefix rather than recursion."""
+        user, ids = folders
+        
+        del sqlite_db.statements[:]
+        roots = self._tree(sqlite_db, user, root_id=ids["reports"], max_depth=1)
+        
+        assert [node.id for node in roots] == [ids["reports"]]
+        assert roots[0].subtree_item_count == 5
+        assert not any("RECURSIVE" in statement for statement in sqlite_db.statements)
+    
+    def test_subtree_without_paths_falls_back_to_recursion(self, sqlite_db, folders):
+        """Test that folders created before paths existed are walked with a recursive CTE."""
+        from apps.api.src.models import Folder
+        
+        user, ids = folders
+        sqlite_db.query(Folder).update({Folder.path: None})
+        sqlite_db.commit()
+        
+        del sqlite_db.statements[:]
+        roots = self._tree(sqlite_db, user, root_id=ids["docs"])
+        
+        assert roots[0].subtree_item_count == 6
+        assert any("RECURSIVE" in statement for statement in sqlite_db.statements)
+    
+    def test_move_rewrites_subtree_paths(self, sqlite_db, folders):
+        """Test that moving a folder updates its descendants' paths."""
+        from apps.api.src.library import update_folder, FolderUpdate
+        from apps.api.src.models import Folder
+        
+        user, ids = folders
+        update_folder(folder_id=ids["reports"], folder_update=FolderUpdate(parent_id=ids["media"]), user=user, db=sqlite_db)
+        
+        archive = sqlite_db.get(Folder, ids["archive"])
+        sqlite_db.refresh(archive)
+        assert archive.path == f"/{ids['media']}/{ids['reports']}/{ids['archive']}/"
+        assert [node.subtree_item_count for node in self._tree(sqlite_db, user)] == [1, 6]
+    
+    def test_move_into_own_subtree_rejected(self, sqlite_db, folders):
+        """Test that a folder cannot become its own descendant."""
+        from fastapi import HTTPException
+        from apps.api.src.library import update_folder, FolderUpdate
+        
+        user, ids = folders
+        
+        with pytest.raises(HTTPException) as exc_info:
+            update_folder(folder_id=ids["docs"], folder_update=FolderUpdate(parent_id=ids["archive"]), user=user, db=sqlite_db)
+        
+        assert exc_info.value.status_code == 400
+    
+    def test_rebuild_backfills_missing_paths(self, sqlite_db, folders):
+        """Test that path backfill restores every folder's path."""
+        from apps.api.src.folders import rebuild_folder_paths
+        from apps.api.src.models import Folder
+        
+        _, ids = folders
+        expected = dict(sqlite_db.query(Folder.id, Folder.path).all())
+        sqlite_db.query(Folder).update({Folder.path: None})
+        
+        assert rebuild_folder_paths(sqlite_db) == 4
+        assert dict(sqlite_db.query(Folder.id, Folder.path).all()) == expected
+
+
+class TestAuditTrail:
+    """Test the keyset-paginated audit trail endpoint."""
+    
+    @pytest.fixture
+    def history(self, sqlite_db, make_account):
+        """Seven own entries (pairs share a timestamp) plus one of another account: ``(user, rows)``."""
+        from datetime import timedelta
+        from apps.api.src.audit import audit_row, stage_audit_rows
+        
+        account, user = make_account("audit-trail")
+        other, _ = make_account("audit-other")
+        
+        start = datetime(2026, 1, 1)
+        rows = []
+        for i in range(7):
+            row = audit_row(account.id, "update" if i % 2 else "create", "tag" if i == 3 else "qr_item", uuid4())
+            row["created_at"] = start + timedelta(hours=i // 2)  # pairs share a timestamp
+            rows.append(row)
+        rows.append(audit_row(other.id, "create", "qr_item", uuid4()))
+        stage_audit_rows(sqlite_db, rows)
+        sqlite_db.commit()
+        return user, rows[:7]
+    
+    def _list(self, db, user, **params):
+        from apps.api.src.library import list_audit_log, AuditLogListResponse
+        
+        args = {"resource_type": None, "resource_id": None, "action": None, "start": None, "end": None, "limit": 50, "cursor": None}
+        args.update(params)
+        return AuditLogListResponse.model_validate(list_audit_log(user=user, db=db, **args))
+    
+    def test_cursor_pages_cover_history_once(self, sqlite_db, history):
+        """Test that cursor pages return every own entry once, newest first."""
+        user, rows = history
+        
+        seen, cursor = [], None
+        while True:
+            page = self._list(sqlite_db, user, limit=3, cursor=cursor)
+            seen += page.entries
+            cursor = page.next_cursor
+            if not cursor:
+                break
+        
+        expected = sorted(rows, key=lambda row: (row["created_at"], row["id"]), reverse=True)
+        assert [entry.id for entry in seen] == [row["id"] for row in expected]
+    
+    def test_filters_narrow_entries(self, sqlite_db, history):
+        """Test resource, action and time-range filters."""
+        user, rows = history
+        
+        assert [entry.id for entry in self._list(sqlite_db, user, resource_type="tag").entries] == [rows[3]["id"]]
+        assert [entry.id for entry in self._list(sqlite_db, user, resource_id=rows[5]["resource_id"]).entries] == [rows[5]["id"]]
+        assert len(self._list(sqlite_db, user, action="update").entries) == 3
+        window = self._list(sqlite_db, user, start=rows[2]["created_at"], end=rows[4]["created_at"]).entries
+        assert {entry.id for entry in window} == {rows[2]["id"], rows[3]["id"]}
+    
+    def test_invalid_cursor_rejected(self, sqlite_db, history):
+        """Test that a malformed cursor is a 400."""
+        from fastapi import HTTPException
+        
+        user, _ = history
+        
+        with pytest.raises(HTTPException) as exc_info:
+            self._list(sqlite_db, user, cursor="not-a-cursor")
+        
+        assert exc_info.value.status_code == 400
@@ -0,0 +1,144 @@
+"""Unit tests for maintenance jobs."""
+from datetime import datetime
+from unittest.mock import Mock, patch
+
+from apps.api.src.maintenance import (
+    add_months, partition_name, ensure_monthly_partitions, drop_expired_partitions
+)
+
+
+def _executed_sql(db):
+    return [str(call.args[0]) for call in db.execute.call_args_list]
+
+
+class TestMonthlyPartitions:
+    """Test monthly partition creation and retention."""
+    
+    def test_add_months_wraps_years(self):
+        """Test month arithmetic across year boundaries."""
+        assert add_months(datetime(2024, 11, 17), 2) == datetime(2025, 1, 1)
+        assert add_months(datetime(2024, 1, 5), -1) == datetime(2023, 12, 1)
+        assert partition_name("qr_events", datetime(2024, 3, 1)) == "qr_events_p202403"
+    
+    @patch("apps.api.src.maintenance.datetime")
+    @patch("apps.api.src.maintenance.list_partitions")
+    @patch("apps.api.src.maintenance.is_partitioned", return_value=True)
+    def test_creates_missing_partitions(self, mock_partitioned, mock_list, mock_datetime):
+        """Test that only missing months and the default partition are created."""
+        mock_datetime.utcnow.return_value = datetime(2024, 12, 10)
+        mock_datetime.side_effect = datetime
+        mock_list.return_value = ["qr_events_p202412"]
+        db = Mock()
+        
+        created = ensure_monthly_partitions(db, "qr_events", months_ahead=2)
+        
+        assert created == ["qr_events_p202501", "qr_events_p202502"]
+        sql = _executed_sql(db)
+        assert "FROM ('2025-01-01') TO ('2025-02-01')" in sql[0]
+        assert "qr_events_default PARTITION OF qr_events DEFAULT" in sql[-1]
+        db.commit.assert_called_once()
+    
+    @patch("apps.api.src.maintenance.datetime")
+    @patch("apps.api.src.maintenance.list_partitions")
+    @patch("apps.api.src.maintenance.is_partitioned", return_value=True)
+    def test_moves_default_rows_into_new_partition(self, mock_partitioned, mock_list, mock_datetime):
+        """Test that a month with rows already in the default partition is created detached, filled, then attached."""
+        mock_datetime.utcnow.return_value = datetime(2024, 12, 10)
+        mock_datetime.side_effect = datetime
+        mock_list.return_value = ["qr_events_default", "qr_events_p202412"]
+        db = Mock()
+        # Only January has stray rows in the default partition
+        db.execute.side_effect = lambda statement, params=None: Mock(
+            scalar=Mock(return_value=bool(params) and params["start"] == datetime(2025, 1, 1)),
+            rowcount=7
+        )
+        
+        created = ensure_monthly_partitions(db, "qr_events", months_ahead=2)
+        
+        assert created == ["qr_events_p202501", "qr_events_p202502"]
+        sql = [statement for statement in _executed_sql(db) if "SELECT EXISTS" not in statement]
+        assert sql[0] == "CREATE TABLE qr_events_p202501 (LIKE qr_events INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        assert "DELETE FROM qr_events_default" in sql[1] and "INSERT INTO qr_events_p202501" in sql[1]
+        assert sql[2] == (
+            "ALTER TABLE qr_events ATTACH PARTITION qr_events_p202501 "
+            "FOR VALUES FROM ('2025-01-01') TO ('2025-02-01')"
+        )
+        assert "qr_events_p202502 PARTITION OF qr_events" in sql[3]
+        assert not any("qr_events_default PARTITION OF" in statement for statement in sql)
+    
+    @patch("apps.api.src.maintenance.is_partitioned", return_value=False)
+    def test_skips_unpartitioned_table(self, mock_partitioned):
+        """Test that legacy unpartitioned tables are left alone."""
+        db = Mock()
+        
+        assert ensure_monthly_partitions(db, "qr_events") == []
+        db.execute.assert_not_called()
+    
+    @patch("apps.api.src.maintenance.datetime")
+    @patch("apps.api.src.maintenance.list_partitions")
+    @patch("apps.api.src.maintenance.is_partitioned", return_value=True)
+    def test_drops_partitions_past_retention(self, mock_partitioned, mock_list, mock_datetime):
+        """Test that only whole months older than the retention window are dropped."""
+        mock_datetime.utcnow.return_value = datetime(2024, 6, 15)
+        mock_datetime.side_effect = datetime
+        mock_list.return_value = [
+            "qr_events_default", "qr_events_p202402", "qr_events_p202403", "qr_events_p202404"
+        ]
+        db = Mock()
+        db.execute.return_value.scalar.return_value = False  # default partition is empty
+        
+        expired = drop_expired_partitions(db, "qr_events", retain_months=3)
+        
+        assert expired == ["qr_events_p202402", "qr_events_p202403"]
+        sql = [statement for statement in _executed_sql(db) if "SELECT EXISTS" not in statement]
+        assert "DETACH PARTITION qr_events_p202402" in sql[0]
+        assert "DROP TABLE qr_events_p202402" in sql[1]
+    
+    @patch("apps.api.src.maintenance.datetime")
+    @patch("apps.api.src.maintenance.list_partitions")
+    @patch("apps.api.src.maintenance.is_partitioned", return_value=True)
+    def test_retention_sweeps_default_rows_first(self, mock_partitioned, mock_list, mock_datetime):
+        """Test that expired rows stranded in the default partition leave with their month."""
+        mock_datetime.utcnow.return_value = datetime(2024, 6, 15)
+        mock_datetime.side_effect = datetime
+        mock_list.return_value = ["qr_events_default", "qr_events_p202401"]
+        db = Mock()
+        db.execute.return_value.scalar.return_value = True
+        
+        assert drop_expired_partitions(db, "qr_events", retain_months=1) == ["qr_events_p202401"]
+        
+        sql = [statement for statement in _executed_sql(db) if "SELECT EXISTS" not in statement]
+        assert "INSERT INTO qr_events_p202401" in sql[0]
+        assert "DETACH PARTITION qr_events_p202401" in sql[1]
+        assert "DROP TABLE qr_events_p202401" in sql[2]
+    
+    @patch("apps.api.src.maintenance.datetime")
+    @patch("apps.api.src.maintenance.list_partitions")
+    @patch("apps.api.src.maintenance.is_partitioned", return_value=True)
+    def test_detach_only_keeps_tables(self, mock_partitioned, mock_list, mock_datetime):
+        """Test that detach-only mode never drops tables."""
+        mock_datetime.utcnow.return_value = datetime(2024, 6, 15)
+        mock_datetime.side_effect = datetime
+        mock_list.return_value = ["qr_events_p202401"]
+        db = Mock()
+        
+        assert drop_expired_partitions(db, "qr_events", retain_months=1, detach_only=True) == ["qr_events_p202401"]
+        assert not any("DROP TABLE" in sql for sql in _executed_sql(db))
+    
+    def test_retention_disabled(self):
+        """Test that a non-positive retention never touches the database."""
+        db = Mock()
+        
+        assert drop_expired_partitions(db, "qr_events", retain_months=0) == []
+        db.execute.assert_not_called()
+    
+    @patch("apps.api.src.maintenance.AUDIT_RETENTION_MONTHS", 12)
+    @patch("apps.api.src.maintenance.drop_expired_partitions", return_value=[])
+    def test_audit_retention_uses_its_own_window(self, mock_drop):
+        """Test that audit history is expired on audit_log with AUDIT_RETENTION_MONTHS."""
+        from apps.api.src.maintenance import apply_audit_retention
+        
+        db = Mock()
+        apply_audit_retention(db, detach_only=True)
+        
+        mock_drop.assert_called_once_with(db, "audit_log", 12, True)
@@ -1,6 +1,7 @@
 """Unit tests for template endpoints."""
 import pytest
 from uuid import uuid4
+from unittest.mock import patch
 from fastapi.testclient import TestClient
 from apps.api.src.main import app
 
@@ -162,3 +163,101 @@ class TestValidation:
         response = client.get("/templates?sort_order=invalid")
         # Should fail validation
         assert response.status_code == 422
+
+
+class TestTemplateListCache:
+    """Test that template listings are cached as serialized response bodies."""
+    
+    def _list(self, db):
+        from apps.api.src.templates import list_templates
+        
+        return list_templates(
+            page=1, per_page=20, sort_by="created_at", sort_order="desc",
+            category_id=None, tag=None, search=None, db=db
+        )
+    
+    def test_miss_caches_validated_body(self, sqlite_db, make_templates):
+        """Test that a miss stores and returns the serialized response model."""
+        from apps.api.src.templates import TemplateListResponse
+        
+        make_templates()
+        with patch("apps.api.src.templates.get_or_compute",
+                   side_effect=lambda key, compute, **kwargs: compute()) as mock_compute:
+            response = self._list(sqlite_db)
+        
+        assert mock_compute.call_args.kwargs["raw"] is True
+        body = response.body.decode()
+        page = TemplateListResponse.model_validate_json(body)
+        assert page.total == 1
+        assert page.templates[0].category.slug == "category-0"
+        assert page.templates[0].assets[0].file_name == "logo-0-0.png"
+    
+    def test_hit_returns_cached_bytes_without_queries(self, sqlite_db):
+        """Test that a hit serves the stored body as-is without touching the database."""
+        cached = '{"templates":[],"total":0,"page":1,"per_page":20}'
+        
+        del sqlite_db.statements[:]
+        with patch("apps.api.src.templates.get_or_compute", return_value=cached):
+            response = self._list(sqlite_db)
+        
+        assert response.body.decode() == cached
+        assert response.media_type == "application/json"
+        assert sqlite_db.statements == []
+
+
+class TestTemplateQueryCount:
+    """Test that gallery pages load categories and assets eagerly, not per template."""
+    
+    ADMIN = {"sub": "auth0|admin", "https://qr-cloner.local/roles": ["admin"]}
+    
+    def _count(self, db, call):
+        from apps.api.src.templates import TemplateListResponse
+        
+        db.expunge_all()
+        del db.statements[:]
+        result = call()
+        if isinstance(result, str):
+            result = TemplateListResponse.model_validate_json(result)
+        else:
+            result = TemplateListResponse.model_validate(result)
+        assert all(t.category is not None and len(t.assets) == 2 for t in result.templates)
+        return len(db.statements)
+    
+    def test_public_page_costs_three_queries(self, sqlite_db, make_templates):
+        """Test that a public page is count + page with categories + one asset batch."""
+        from apps.api.src.templates import render_template_list
+        
+        make_templates(30, assets=2)
+        
+        for per_page in (2, 30):
+            queries = self._count(sqlite_db, lambda: render_template_list(
+                sqlite_db, 1, per_page, "created_at", "desc", None, None, None
+            ))
+            assert queries == 3
+    
+    def test_admin_page_costs_three_queries(self, sqlite_db, make_templates):
+        """Test that the admin listing loads relationships the same way."""
+        from apps.api.src.templates import admin_list_templates
+        
+        make_templates(30, assets=2)
+        
+        for per_page in (2, 30):
+            queries = self._count(sqlite_db, lambda: admin_list_templates(
+                page=1, per_page=per_page, sort_by="created_at", sort_order="desc",
+                category_id=None, is_published=None, user=self.ADMIN, db=sqlite_db
+            ))
+            assert queries == 3
+    
+    def test_get_template_costs_two_queries(self, sqlite_db, make_templates):
+        """Test that a single template is fetched with its category joined and assets batched."""
+        from apps.api.src.templates import get_template, TemplateSchema
+        
+        template_id = make_templates(assets=2)[0].id
+        
+        sqlite_db.expunge_all()
+        del sqlite_db.statements[:]
+        template = TemplateSchema.model_validate(get_template(template_id=template_id, db=sqlite_db))
+        
+        assert template.category.slug == "category-0"
+        assert len(template.assets) == 2
+        assert len(sqlite_db.statements) == 2
@@ -0,0 +1,255 @@
+"""Unit tests for buffered scan tracking."""
+import pytest
+from unittest.mock import Mock, patch
+from uuid import uuid4
+
+from apps.api.src.tracking import EventBuffer, BufferFlusher, QREventBatchWriter, build_event_row, insert_events
+
+
+class TestEventBuffer:
+    """Test the bounded event buffer."""
+    
+    def test_put_and_drain_in_order(self):
+        """Test that items are drained FIFO in batches."""
+        buffer = EventBuffer(maxsize=10)
+        for i in range(5):
+            assert buffer.put(i) is True
+        
+        assert buffer.drain(3) == [0, 1, 2]
+        assert buffer.drain(3) == [3, 4]
+        assert buffer.drain(3) == []
+    
+    def test_full_buffer_drops_and_counts(self):
+        """Test that a full buffer rejects items and accounts for drops."""
+        buffer = EventBuffer(maxsize=2)
+        buffer.put("a")
+        buffer.put("b")
+        
+        assert buffer.put("c") is False
+        stats = buffer.stats()
+        assert stats["dropped"] == 1
+        assert stats["enqueued"] == 2
+        assert stats["high_watermark"] == 2
+
+
+class TestBufferFlusher:
+    """Test batch draining into a handler."""
+    
+    def test_flush_once_hands_batch_to_handler(self):
+        """Test that a batch is passed to the handler and counted."""
+        buffer = EventBuffer(maxsize=10)
+        handler = Mock()
+        flusher = BufferFlusher(buffer, handler, batch_size=2)
+        for i in range(3):
+            buffer.put(i)
+        
+        assert flusher.flush_once() == 2
+        handler.assert_called_once_with([0, 1])
+        assert buffer.stats()["flushed"] == 2
+    
+    def test_handler_failure_is_accounted(self):
+        """Test that failed batches are counted, not silently lost."""
+        buffer = EventBuffer(maxsize=10)
+        flusher = BufferFlusher(buffer, Mock(side_effect=RuntimeError("db down")), batch_size=10)
+        buffer.put(1)
+        
+        flusher.flush_once()
+        assert buffer.stats()["failed"] == 1
+    
+    def test_stop_flushes_remaining(self):
+        """Test that stopping drains everything still buffered."""
+        buffer = EventBuffer(maxsize=10)
+        handled = []
+        flusher = BufferFlusher(buffer, handled.extend, batch_size=2, interval=0.01)
+        flusher.start()
+        for i in range(5):
+            buffer.put(i)
+        flusher.stop()
+        
+        assert sorted(handled) == [0, 1, 2, 3, 4]
+
+
+class TestEnqueueScan:
+    """Test scan enqueueing."""
+    
+    def test_enqueue_scan_records_timestamp(self):
+        """Test that enqueued scans carry their scan time."""
+        from apps.api.src import tracking
+        
+        writer = QREventBatchWriter(maxsize=1)
+        with patch.object(tracking, "scan_writer", writer):
+            assert tracking.enqueue_scan("abc", uuid4(), "https://example.com") is True
+            assert tracking.enqueue_scan("abc", uuid4(), "https://example.com") is False
+        
+        scan = writer.buffer.drain(1)[0]
+        assert scan["type"] == "scan"
+        assert scan["meta"]["code"] == "abc"
+        assert scan["created_at"] is not None
+
+
+class TestBatchInsert:
+    """Test multi-row event inserts."""
+    
+    def test_build_event_row_assigns_id_and_timestamp(self):
+        """Test that rows are complete without a database round-trip."""
+        row = build_event_row("export", user_id=uuid4())
+        
+        assert row["id"] is not None
+        assert row["created_at"] is not None
+        assert row["meta"] == {}
+    
+    def test_insert_events_uses_one_statement_per_chunk(self):
+        """Test that rows are written as multi-row INSERTs, not one per row."""
+        db = Mock()
+        rows = [build_event_row("scan", item_id=uuid4()) for _ in range(2500)]
+        
+        with patch("apps.api.src.tracking.EVENT_INSERT_CHUNK", 1000), \
+             patch("apps.api.src.tracking.assign_event_owners"), \
+             patch("apps.api.src.tracking.apply_rollups") as mock_rollups:
+            assert insert_events(db, rows, method="insert") == 2500
+        
+        assert db.execute.call_count == 3
+        mock_rollups.assert_called_once_with(db, rows)
+        db.add.assert_not_called()
+        db.refresh.assert_not_called()
+    
+    def test_insert_events_empty_batch(self):
+        """Test that an empty batch issues no statements."""
+        db = Mock()
+        
+        assert insert_events(db, []) == 0
+        db.execute.assert_not_called()
+    
+    def test_copy_buffer_encoding(self):
+        """Test COPY rows: column order, unquoted NULLs, quoted empty strings and escaping."""
+        import csv
+        import io
+        import json
+        from datetime import datetime
+        from apps.api.src.tracking import EVENT_COLUMNS
+        
+        db = Mock()
+        db.get_bind.return_value.dialect.driver = "psycopg2"
+        cursor = db.connection.return_value.connection.cursor.return_value
+        copied = {}
+        cursor.copy_expert.side_effect = lambda sql, data: copied.update(sql=sql, data=data.getvalue())
+        row = build_event_row(
+            "scan",
+            item_id=uuid4(),
+            owner_id=uuid4(),
+            meta={"code": "a,b", "note": 'say "hi"\nthere'},
+            user_agent="",
+            created_at=datetime(2025, 1, 2, 3, 4, 5)
+        )
+        
+        with patch("apps.api.src.tracking.assign_event_owners"), \
+             patch("apps.api.src.tracking.apply_rollups"):
+            assert insert_events(db, [row], method="copy") == 1
+        
+        assert copied["sql"] == f"COPY qr_events ({', '.join(EVENT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+        line = copied["data"]
+        # user_id and ip_address are NULL (bare empty fields); user_agent is an empty string
+        assert f'"{row["id"]}","scan",,"{row["item_id"]}","{row["owner_id"]}",' in line
+        assert line.endswith(',,"","2025-01-02 03:04:05"\n')
+        fields = next(csv.reader(io.StringIO(line)))
+        assert len(fields) == len(EVENT_COLUMNS)
+        assert json.loads(fields[EVENT_COLUMNS.index("meta")]) == row["meta"]
+        db.execute.assert_not_called()
+        cursor.close.assert_called_once()
+
+
+class TestScanCounter:
+    """Test coalesced shortlink scan counters."""
+    
+    def test_increments_are_coalesced_per_code(self):
+        """Test that many scans of one code become a single pending update."""
+        from datetime import datetime, timedelta
+        from apps.api.src.tracking import ScanCounter
+        
+        counter = ScanCounter()
+        early = datetime(2025, 1, 1, 12, 0)
+        late = early + timedelta(minutes=5)
+        counter.increment("hot", late)
+        counter.increment("hot", early)
+        counter.increment("cold", early)
+        
+        with patch("apps.api.src.tracking.get_db_context") as mock_ctx, \
+             patch("apps.api.src.tracking.write_scan_counts", return_value=2) as mock_write:
+            assert counter.flush() == 2
+        
+        pending = mock_write.call_args[0][1]
+        assert pending == {"hot": (2, late), "cold": (1, early)}
+        assert counter.stats()["pending_codes"] == 0
+    
+    def test_failed_flush_keeps_counts(self):
+        """Test that counts survive a failed flush and are retried."""
+        from apps.api.src.tracking import ScanCounter
+        
+        counter = ScanCounter()
+        counter.increment("abc")
+        
+        with patch("apps.api.src.tracking.get_db_context", side_effect=RuntimeError("db down")):
+            assert counter.flush() == 0
+        
+        assert counter.stats()["pending_codes"] == 1
+        assert counter.stats()["failed_flushes"] == 1
+    
+    def test_hot_code_rollups_upsert_once_per_bucket(self, sqlite_db):
+        """Test that N recorded scans of one code cost one upsert per rollup table, not N."""
+        from apps.api.src import analytics, tracking
+        from apps.api.src.tracking import ScanCounter
+        
+        counter = ScanCounter()
+        owner_id, item_id = uuid4(), uuid4()
+        with patch.object(tracking, "scan_counter", counter), \
+             patch("apps.api.src.rollups._upsert_counts") as mock_upsert:
+            for _ in range(25):
+                analytics.record_event(sqlite_db, "scan", item_id=item_id, owner_id=owner_id, meta={"code": "hot"})
+            assert not mock_upsert.called
+            
+            with patch("apps.api.src.tracking.get_db_context") as mock_ctx:
+                mock_ctx.return_value.__enter__.return_value = sqlite_db
+                counter.flush()
+        
+        assert mock_upsert.call_count == 2  # hourly + daily
+        for call in mock_upsert.call_args_list:
+            counts = call.args[2]
+            assert len(counts) == 1
+            assert sum(counts.values()) == 25
+        assert counter.stats()["pending_rollup_keys"] == 0
+    
+    def test_failed_flush_keeps_rollups(self):
+        """Test that rollup counts survive a failed flush."""
+        from apps.api.src.tracking import ScanCounter
+        
+        counter = ScanCounter()
+        counter.add_rollups([build_event_row("scan", item_id=uuid4(), owner_id=uuid4())])
+        
+        with patch("apps.api.src.tracking.get_db_context", side_effect=RuntimeError("db down")):
+            counter.flush()
+        
+        assert counter.stats()["pending_rollup_keys"] == 2
+    
+    def test_write_scan_counts_issues_one_executemany(self):
+        """Test that all codes are written with a single executemany UPDATE."""
+        from datetime import datetime
+        from apps.api.src.tracking import write_scan_counts
+        
+        db = Mock()
+        now = datetime.utcnow()
+        
+        assert write_scan_counts(db, {"a": (3, now), "b": (1, now)}) == 2
+        assert db.execute.call_count == 1
+        assert len(db.execute.call_args[0][1]) == 2
+    
+    def test_write_scan_counts_orders_rows_by_code(self):
+        """Test that rows are updated in code order regardless of insertion order."""
+        from datetime import datetime
+        from apps.api.src.tracking import write_scan_counts
+        
+        db = Mock()
+        now = datetime.utcnow()
+        
+        write_scan_counts(db, {"c": (1, now), "a": (2, now), "b": (3, now)})
+        params = db.execute.call_args[0][1]
+        assert [row["b_code"] for row in params] == ["a", "b", "c"]